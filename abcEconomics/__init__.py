@@ -46,11 +46,14 @@ Furthermore, every round needs to be announced using simulation.advance_round(ti
 where time is any representation of time.
 
 """
+import os
 import re
+import pickle
 import time
 import random
 import queue
 import logging
+import traceback
 import multiprocessing as mp
 from collections import OrderedDict
 from .logger import ThreadingDatabase, MultiprocessingDatabase
@@ -58,7 +61,11 @@ from .agent import Agent  # noqa: F401
 from .group import Group
 from .notenoughgoods import NotEnoughGoods  # noqa: F401
 from .agents import Firm, Household  # noqa: F401
+from .market import Market  # noqa: F401
+from .sweep import sweep  # noqa: F401
 from .scheduler import SingleProcess, MultiProcess
+from .scheduler.profiler import profile_tables
+from .scheduler.conditional import conditional  # noqa: F401
 
 
 class Simulation(object):
@@ -99,6 +106,32 @@ class Simulation(object):
         dbplugin, dbpluginargs:
             database plugin, see :ref:`Database Plugins`
 
+        placement:
+            how agents are distributed over the processes, the default for
+            :meth:`build_agents`. 'round_robin' (default), 'weighted',
+            'hash', 'communication' or a function,
+            see :mod:`abcEconomics.scheduler.placement`
+
+        offer_book:
+            if True, the offers are kept in NumPy arrays, one offer book
+            per process, instead of one object per offer. Requires NumPy,
+            see :mod:`abcEconomics.agents.offerbook`
+
+        compact_inventory:
+            if True, the goods of the agents of a process are kept in one
+            table, a row per agent and a column per good, instead of two
+            dictionaries per agent. A list of goods can be passed, that are
+            interned in advance, so that they have the same column in every
+            process. :meth:`Group.total <abcEconomics.group.Group.total>` sums
+            a good over a group with NumPy, see :class:`abcEconomics.inventory.InventoryTable`
+
+        profile:
+            if True, the time of every action and of the phases of the
+            scheduler, the messages per topic, the length of the database
+            queue and the imbalance between the processes are recorded
+            every round, in profile.csv and profile_round.csv, see
+            :mod:`abcEconomics.scheduler.profiler`
+
         Example::
 
             simulation = Simulation(name='abcEconomics',
@@ -139,7 +172,8 @@ class Simulation(object):
     """
 
     def __init__(self, name='abcEconomics', random_seed=None, trade_logging='off', processes=1, dbplugin=None,
-                 dbpluginargs=[], path='auto', multiprocessing_database=False):
+                 dbpluginargs=[], path='auto', multiprocessing_database=False, placement='round_robin',
+                 offer_book=False, compact_inventory=False, profile=False):
         """
         """
         try:
@@ -157,45 +191,59 @@ class Simulation(object):
                       ">" + self.trade_logging_mode + "< not accepted")
 
         self.processes = mp.cpu_count() * 2 if processes is None else processes
+        self.placement = placement
+
+        self._multiprocessing_database = multiprocessing_database
+        self.database_queue = self._new_database_queue()
 
-        if processes == 1:
-            self.scheduler = SingleProcess()
+        if self.processes == 1:
+            self.scheduler = SingleProcess(offer_book, compact_inventory, self.database_queue, profile)
         else:
-            self.scheduler = MultiProcess(processes)
+            self.scheduler = MultiProcess(self.processes, offer_book, compact_inventory, self.database_queue,
+                                          profile)
+        self._profile = profile
+        self._profile_clock = time.perf_counter()
+
+        self._database_arguments = (name, dbplugin, dbpluginargs)
+        self._start_database(path)
+
+        if random_seed is None or random_seed == 0:
+            random_seed = time.time()
+        random.seed(random_seed)
+
+        self.sim_parameters = OrderedDict(
+            {'name': name, 'random_seed': random_seed})
+        self.clock = time.time()
+        self._time = None
+        """ The current time set with simulation.advance_round(time)"""
+        self._groups = {}
+        """ A list of all agent names in the simulation """
 
-        if processes == 1 and not multiprocessing_database:
-            self.database_queue = queue.Queue()
+    def _new_database_queue(self):
+        if self.processes == 1 and not self._multiprocessing_database:
+            return queue.Queue()
         else:
             manager = mp.Manager()
-            self.database_queue = manager.Queue()
+            return manager.Queue()
 
-        if multiprocessing_database:
+    def _start_database(self, path):
+        if self._multiprocessing_database:
             Database = MultiprocessingDatabase
         else:
             Database = ThreadingDatabase
 
+        name, dbplugin, dbpluginargs = self._database_arguments
         self._db = Database(
             path,
             name,
             self.database_queue,
             trade_log=self.trade_logging_mode != 'off',
             plugin=dbplugin,
-            pluginargs=dbpluginargs)
+            pluginargs=dbpluginargs,
+            shards=self.processes)
         self.path = self._db.directory
         self._db.start()
 
-        if random_seed is None or random_seed == 0:
-            random_seed = time.time()
-        random.seed(random_seed)
-
-        self.sim_parameters = OrderedDict(
-            {'name': name, 'random_seed': random_seed})
-        self.clock = time.time()
-        self._time = None
-        """ The current time set with simulation.advance_round(time)"""
-        self._groups = {}
-        """ A list of all agent names in the simulation """
-
     @property
     def time(self):
         """ Set and get time for simulation and all agents """
@@ -207,11 +255,24 @@ class Simulation(object):
         self.advance_round(time)
 
     def advance_round(self, time):
+        if self._profile:
+            self._write_profile()
         self._time = time
         logging.debug("\rRound" + str(time))
         str_time = re.sub('[^0-9a-zA-Z_]', '', str(time))
         self.scheduler.advance_round(time, str_time)
 
+    def _write_profile(self):
+        """ sends the profile of the round, that ends, to the database """
+        shards = self.scheduler.profile()
+        now = time.perf_counter()
+        if self._time is not None:
+            rows, round_row = profile_tables(self._time, shards)
+            round_row['seconds'] = now - self._profile_clock
+            round_row['queue_depth'] = self.database_queue.qsize()
+            self.database_queue.put(['profile', rows, round_row])
+        self._profile_clock = now
+
     def finalize(self):
         """ simulation.finalize() must be run after each simulation. It will
         write all data to disk
@@ -231,20 +292,18 @@ class Simulation(object):
         print("time only simulation %6.2f" %
               (time.time() - self.clock))
 
+        if self._profile:
+            self._write_profile()
+        self.scheduler.close()
         self._db.finalize(self.sim_parameters)
 
-        try:
-            self.pool.close()
-            self.pool.join()
-        except AttributeError:
-            pass
-
         print("time with data %6.2f" %
               (time.time() - self.clock))
 
     def build_agents(self, AgentClass, group_name,
                      number=None,
                      agent_parameters=None,
+                     placement=None,
                      **parameters):
         """ This method creates agents.
 
@@ -265,6 +324,31 @@ class Simulation(object):
                 a list of dictionaries, where each agent gets one dictionary.
                 The number of agents is the length of the list
 
+            placement (optional):
+                how the agents are distributed over the processes, when the
+                simulation runs with several processes:
+
+                'round_robin':
+                    the agents are dealt to the processes in turn
+
+                'weighted':
+                    every agent goes to the process with the smallest load. The load
+                    of an agent is the class attribute :code:`placement_cost` of
+                    the AgentClass (default 1). Use it to spread heavy agents.
+
+                'communication':
+                    like 'round_robin', but the messages of the agents are counted
+                    and :meth:`rebalance` moves the agents to the process they
+                    communicate most with.
+
+                'hash':
+                    by the hash of the agent's name
+
+                a function:
+                    see :mod:`abcEconomics.scheduler.placement`
+
+                Defaults to the placement of the simulation.
+
             any other parameters:
                 are directly passed to the agent
 
@@ -300,12 +384,195 @@ class Simulation(object):
         group = Group(self, self.scheduler, None,
                       agent_arguments={'group': group_name,
                                        'trade_logging': self.trade_logging_mode,
-                                       'database': self.database_queue})
+                                       'database': self.database_queue},
+                      placement=self.placement if placement is None else placement)
         group.create_agents(AgentClass, agent_parameters=agent_parameters, **parameters)
         self.agents_created = True
         self._groups[group_name] = group
         return group
 
+    def rebalance(self, slack=0.1):
+        """ Moves the agents of groups that have been build with
+        placement='communication' to the process they exchanged most messages
+        with since the last rebalance. This reduces the messages that are sent
+        between processes. Call it between rounds. No process gets more than
+        (1 + slack) times the average load.
+
+        Returns:
+            a dictionary of the moved agents and their new process
+
+        Example::
+
+            traders = simulation.build_agents(Trader, 'trader', 1000, placement='communication')
+            for r in range(100):
+                simulation.advance_round(r)
+                traders.trade()
+                if r % 10 == 0:
+                    simulation.rebalance()
+        """
+        return self.scheduler.rebalance(slack)
+
+    def checkpoint(self, path):
+        """ Writes the state of the simulation to the directory path: the
+        agents with their goods, offers, messages and contracts, the
+        groups build with :meth:`build_agents` and the state of the random
+        number generators. Every process writes its agents in parallel.
+        Call it between rounds. The logged data is not part of the checkpoint.
+
+        Example::
+
+            for r in range(1000):
+                simulation.advance_round(r)
+                ...
+                if r % 100 == 0:
+                    simulation.checkpoint('checkpoint')
+        """
+        os.makedirs(path, exist_ok=True)
+        state = {'processes': self.processes,
+                 'time': self._time,
+                 'sim_parameters': self.sim_parameters,
+                 'random': random.getstate(),
+                 'groups': [(group_name, group._gid, group._names,
+                             {key: value for key, value in group._agent_arguments.items() if key != 'database'},
+                             group._placement, group.num_agents)
+                            for group_name, group in self._groups.items()],
+                 'scheduler': self.scheduler.checkpoint(path)}
+        with open(os.path.join(path, 'simulation.pickle'), 'wb') as state_file:
+            pickle.dump(state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, path):
+        """ Restores a simulation from a :meth:`checkpoint` in path. The
+        simulation must be new and have the same number of processes.
+        simulation.time is the time of the checkpoint, the data is logged
+        into the new simulation's directory.
+
+        Returns:
+            a dictionary of the groups, by group name
+
+        Example::
+
+            simulation = Simulation(processes=4)
+            groups = simulation.restore('checkpoint')
+            firms, households = groups['firm'], groups['household']
+            for r in range(simulation.time + 1, 1000):
+                simulation.advance_round(r)
+                ...
+        """
+        assert not self.agents_created, 'restore must be called before agents are build'
+        with open(os.path.join(path, 'simulation.pickle'), 'rb') as state_file:
+            state = pickle.load(state_file)
+        assert state['processes'] == self.processes, (
+            'the checkpoint has %i processes, the simulation %i' % (state['processes'], self.processes))
+        self.scheduler.restore(path, state['scheduler'])
+        random.setstate(state['random'])
+        self._time = state['time']
+        self.sim_parameters.update((key, value) for key, value in state['sim_parameters'].items()
+                                   if key not in ('name', 'random_seed'))
+        for group_name, gid, names, agent_arguments, placement, num_agents in state['groups']:
+            group = Group(self, self.scheduler, names,
+                          agent_arguments={**agent_arguments, 'database': self.database_queue},
+                          placement=placement, gid=gid)
+            group.num_agents = num_agents
+            self._groups[group_name] = group
+        self.agents_created = True
+        return dict(self._groups)
+
+    def branch(self, n, scenario, parallel=None):
+        """ Forks the simulation n times and continues every copy with
+        scenario(simulation, branch), branch is 0 ... n - 1. Use it to test
+        several interventions after one burn-in. The forked simulations
+        share the memory of the simulation until they change it. The copies
+        are finalized after the scenario, each writes its data to the
+        directory branch_<branch> in the simulation's directory. All copies
+        continue with the same random numbers.
+
+        With several processes the agents are restored in new processes
+        from a :meth:`checkpoint` instead, as the processes of the
+        simulation can not be forked.
+
+        Args:
+            n:
+                the number of branches
+
+            scenario:
+                a function scenario(simulation, branch), that runs the rest
+                of the simulation. Do not call simulation.finalize() in the
+                scenario.
+
+            parallel (optional):
+                the number of branches that run at the same time, by
+                default the number of processor cores.
+
+        Returns:
+            a list of the return values of the scenario of each branch
+
+        Example::
+
+            taxes = [0.1, 0.2, 0.3]
+
+            def policy(simulation, branch):
+                government.set_tax(taxes[branch])
+                for r in range(200, 300):
+                    simulation.advance_round(r)
+                    firms.production()
+                    households.consumption()
+                return households.total('money')
+
+            for r in range(200):
+                simulation.advance_round(r)
+                firms.production()
+                households.consumption()
+            money = simulation.branch(len(taxes), policy)
+            simulation.finalize()
+        """
+        parallel = mp.cpu_count() if parallel is None else parallel
+        context = mp.get_context('fork')
+        state = self.scheduler.prepare_branch()
+        results = []
+        try:
+            for first in range(0, n, parallel):
+                running = []
+                for branch in range(first, min(first + parallel, n)):
+                    connection, child_connection = context.Pipe(duplex=False)
+                    process = context.Process(target=self._run_branch,
+                                              args=(branch, scenario, state, child_connection))
+                    process.start()
+                    child_connection.close()
+                    running.append((process, connection))
+                for process, connection in running:
+                    try:
+                        results.append(connection.recv())
+                    except EOFError:
+                        results.append(('error', Exception('branch %i exited with %s'
+                                                           % (len(results), process.exitcode))))
+                    process.join()
+        finally:
+            self.scheduler.release_branch(state)
+        for status, ret in results:
+            if status == 'error':
+                raise ret
+        return [ret for _, ret in results]
+
+    def _run_branch(self, branch, scenario, state, connection):
+        """ continues the simulation in the forked process with a new database """
+        try:
+            self.database_queue = self._new_database_queue()
+            self.scheduler.branch(self.database_queue, state)
+            for group in self._groups.values():
+                group._agent_arguments['database'] = self.database_queue
+            self._start_database(None if self.path is None else os.path.join(self.path, 'branch_%i' % branch))
+            self.sim_parameters['branch'] = branch
+            ret = scenario(self, branch)
+            self.finalize()
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                connection.send(('error', e))
+            except Exception:
+                connection.send(('error', Exception(repr(e))))
+        else:
+            connection.send(('ok', ret))
+
     def create_agents(self, AgentClass, group_name, simulation_parameters=None, agent_parameters=None, number=1):
 
         raise Exception("create_agents is depreciated for Group.create_agents")
@@ -32,6 +32,7 @@ from .logger import Logger
 from .agents.trader import Trader
 from .agents.messenger import Messenger
 from .agents.goods import Goods
+from .agents.clock import Clock
 
 
 class Agent(Logger, Trader, Messenger, Goods):
@@ -100,10 +101,7 @@ class Agent(Logger, Trader, Messenger, Goods):
         # TODO should be group_address(group), but it would not work
         # when fired manual + ':' and manual group_address need to be removed
 
-        self.time = start_round
-        """ self.time, contains the time set with simulation.advance_round(time)
-            you can set time to anything you want an integer or
-            (12, 30, 21, 09, 1979) or 'monday' """
+        self._clock = Clock(start_round)
 
     def init(self):
         """ This method is called when the agents are build.
@@ -138,19 +136,49 @@ class Agent(Logger, Trader, Messenger, Goods):
         """
         print("Warning: agent %s has no init function" % self.group)
 
-    def _advance_round(self, time, str_time):
-        super()._advance_round(time)
-        self._str_round = str_time
-        self.time = time
+    @property
+    def time(self):
+        """ self.time, contains the time set with simulation.advance_round(time)
+            you can set time to anything you want an integer or
+            (12, 30, 21, 09, 1979) or 'monday', until the next round """
+        return self._clock.time
+
+    @time.setter
+    def time(self, time):
+        self._own_clock().time = time
+
+    @property
+    def _str_round(self):
+        return self._clock.str_time
 
-        if self.conditional_logging:
-            if self.time in self.log_rounds:
-                self.log_this_round = True
-            else:
-                self.log_this_round = False
+    @_str_round.setter
+    def _str_round(self, str_time):
+        self._own_clock().str_time = str_time
+
+    @property
+    def log_this_round(self):
+        return self._clock.log_this_round
+
+    @log_this_round.setter
+    def log_this_round(self, log_this_round):
+        self._own_clock().log_this_round = log_this_round
+
+    def _own_clock(self):
+        """ returns the agent's clock, a shared clock is forked first """
+        if self._clock.forked is not None:
+            self._clock = self._clock.fork(self)
+        return self._clock
+
+    def _advance_round(self, time, str_time):
+        """ is called at the beginning of every round, but only for the
+        agents, whose class overrides it. The time, the trade log and the
+        expiring and perishable goods of all agents are advanced by the
+        scheduler. """
+        pass
 
     def _execute(self, command, args, kwargs):
-        self._do_message_clearing()
+        if self.inbox:
+            self._do_message_clearing()
         self._begin_subround()
         ret = getattr(self, command)(*args, **kwargs)
         self._end_subround()
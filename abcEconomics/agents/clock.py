@@ -0,0 +1,54 @@
+""" Copyright 2012 Davoud Taghawi-Nejad
+
+ Module Author: Davoud Taghawi-Nejad
+
+ abcEconomics is open-source software. If you are using abcEconomics for your research you are
+ requested the quote the use of this software.
+
+ Licensed under the Apache License, Version 2.0 (the "License"); you may not
+ use this file except in compliance with the License and quotation of the
+ author. You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+ WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+ License for the specific language governing permissions and limitations under
+ the License.
+
+The agents of a shard share one :class:`Clock`. self.time,
+self._str_round and self.log_this_round of an agent are read from it, so
+that advancing a round sets them once per shard instead of once per
+agent. The clock also collects the agents, that logged trades in the
+current round, their trade logs are sent to the database, when the round
+is advanced.
+
+An agent, that sets its own time, gets a clock of its own with
+:meth:`Clock.fork`, until the next round gives it the shared clock back.
+"""
+
+
+class Clock:
+    __slots__ = ['time', 'str_time', 'log_this_round', 'traders', 'forked']
+
+    def __init__(self, time=None, str_time=None, log_this_round=True, shared=False):
+        self.time = time
+        self.str_time = str_time
+        self.log_this_round = log_this_round
+        self.traders = {}
+        self.forked = {} if shared else None
+
+    def copy(self):
+        """ returns a clock with the same time and no traders, for an agent,
+        that leaves the shard """
+        return Clock(self.time, self.str_time, self.log_this_round)
+
+    def fork(self, agent):
+        """ returns a clock of agent's own with the time and the traders of
+        this shared clock, the agent is entered in forked """
+        clock = self.copy()
+        clock.traders = self.traders
+        self.forked[agent.name] = agent
+        return clock
+
+    def __reduce__(self):
+        return (Clock, (self.time, self.str_time, self.log_this_round, self.forked is not None))
@@ -23,12 +23,24 @@ technologies manually.
 The create_* functions allow you to create a technology and assign it to
 a variable. :meth:`abcEconomics.Firm.produce` and similar
 methods use this variable to produce with the according technology.
+
+The production functions of the create_* functions are objects of
+:mod:`abcEconomics.agents.functions`, they can be evaluated for arrays of
+inputs and return their gradient. They also have a batch form, with which
+:meth:`Group.produce_all <abcEconomics.Group.produce_all>` lets all firms
+of a group produce in one NumPy expression per process.
 """
-import operator
-from functools import reduce
-from collections import ChainMap
+from operator import attrgetter, itemgetter
+from collections import ChainMap, OrderedDict
 from ..notenoughgoods import NotEnoughGoods
 from .trader import get_epsilon
+from .functions import ProductionFunction, CobbDouglas, CES, Leontief
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 epsilon = get_epsilon()
 
 
@@ -123,7 +135,10 @@ class Firm:
         if not isinstance(input_goods, dict):
             input_goods = {good: self[good] for good in input_goods}
 
-        result = production_function(**input_goods)
+        if isinstance(production_function, ProductionFunction):
+            result = {production_function.output: production_function.quantity(input_goods)}
+        else:
+            result = production_function(**input_goods)
 
         for good, quantity in input_goods.items():
             if self._inventory.haves[good] - quantity + result.get(good, 0) < -epsilon:
@@ -161,7 +176,8 @@ class Firm:
 
         Returns:
 
-            A production_function that can be used in produce etc.
+            A :class:`~abcEconomics.agents.functions.CobbDouglas` production_function
+            that can be used in produce etc.
 
         Example:
 
@@ -174,12 +190,7 @@ class Firm:
                 self.produce(self.plastic_production_function, {'oil' : 20, 'labor' : 1})
 
         """
-        def production_function(**goods):
-            ret = multiplier * reduce(operator.mul,
-                                      [goods[name] ** exponent
-                                       for name, exponent in exponents.items()])
-            return {output: ret}
-        return production_function
+        return CobbDouglas(output, multiplier, exponents)
 
     def create_ces(self, output, gamma, multiplier=1, shares=None):
         """ creates a CES production function
@@ -213,7 +224,8 @@ class Firm:
 
         Returns:
 
-            A production_function that can be used in produce etc.
+            A :class:`~abcEconomics.agents.functions.CES` production_function
+            that can be used in produce etc.
 
         Example::
 
@@ -222,19 +234,7 @@ class Firm:
             self.produce(self.stuff_production_function, {'stone' : 20, 'labor' : 1, 'wood': 12})
 
         """
-        if shares is None:
-            def production_function(**goods):
-                a = 1 / len(goods)
-                ret = multiplier * sum([a * goods[name] ** gamma
-                                        for name in goods]) ** (1 / gamma)
-                return {output: ret}
-        else:
-            def production_function(**goods):
-                ret = multiplier * sum([share * goods[name] ** gamma
-                                        for name, share in shares.items()]) ** (1 / gamma)
-                return {output: ret}
-
-        return production_function
+        return CES(output, gamma, multiplier, shares)
 
     def create_leontief(self, output, utilization_quantities):
         """ creates a Leontief production function
@@ -258,15 +258,152 @@ class Firm:
 
         Returns:
 
-            A production_function that can be used in produce etc.
+            A :class:`~abcEconomics.agents.functions.Leontief` production_function
+            that can be used in produce etc.
 
         Example:
         self.car_production_function = create_leontief('car', {'wheel' : 4, 'chassi' : 1})
         self.produce(self.car_production_function, {'wheel' : 20, 'chassi' : 5})
 
         """
-        def production_function(**goods):
-            ret = min([goods[name] * factor for name, factor in utilization_quantities.items()])
-            return {output: ret}
+        return Leontief(output, utilization_quantities)
 
-        return production_function
+
+def produce_all(agents, slots, table, production_function, input_goods, results=False):
+    """ lets the firms agents produce, like :meth:`Firm.produce` but in
+    bulk, see :meth:`Group.produce_all <abcEconomics.Group.produce_all>`.
+    slots are the rows of the agents in the
+    :class:`~abcEconomics.inventory.InventoryTable` table or table is None.
+    """
+    for agent in agents:
+        if agent.inbox:
+            agent._do_message_clearing()
+    shared = not isinstance(production_function, str)
+    if shared:
+        functions = [production_function] * len(agents)
+    else:
+        functions = list(map(attrgetter(production_function), agents))
+    goods = list(input_goods)
+
+    batches = OrderedDict()
+    one_by_one = []
+    if np is None:
+        one_by_one = range(len(agents))
+    else:
+        for i, (agent, function) in enumerate(zip(agents, functions)):
+            try:
+                key = function._batch[0]
+            except AttributeError:
+                one_by_one.append(i)
+                continue
+            try:
+                batches[key].append(i)
+            except KeyError:
+                batches[key] = [i]
+
+    rets = [None] * len(agents)
+    if batches:
+        _produce_batches(agents, slots, table, batches, functions, shared, goods, input_goods, rets, results)
+    for i in one_by_one:
+        rets[i] = agents[i].produce(functions[i], input_goods, results)
+    if results:
+        return rets
+
+
+def _produce_batches(agents, slots, table, batches, functions, shared, goods, input_goods, rets, results):
+    outputs = list(OrderedDict.fromkeys(key[1] for key in batches))
+    columns = goods + [output for output in outputs if output not in goods]
+    if len(batches) == 1:
+        indices, = batches.values()
+        rows_of = [slice(None)]
+    else:
+        indices = sorted(i for members in batches.values() for i in members)
+        position = {i: row for row, i in enumerate(indices)}
+        rows_of = [np.array([position[i] for i in members], dtype=np.intp) for members in batches.values()]
+
+    if table is None:
+        # column by column, a tuple per agent would make the garbage
+        # collector scan all agents
+        haves = [agents[i]._inventory.haves for i in indices]
+        available = np.column_stack([np.fromiter(map(itemgetter(good), haves), dtype=float, count=len(haves))
+                                     for good in columns])
+    else:
+        cols = np.array([table.intern(good) for good in columns], dtype=np.intp)
+        rows = np.array([slots[i] for i in indices], dtype=np.intp)
+        matrix = table.matrix()
+        available = matrix[np.ix_(rows, cols)]
+    expiring = [(row, column, agents[i]._inventory.haves[good])
+                for row, i in enumerate(indices) if agents[i]._inventory._expiring_goods
+                for column, good in enumerate(columns) if good in agents[i]._inventory._expiring_goods]
+    for row, column, expiring_good in expiring:
+        available[row, column] = float(expiring_good)
+    if isinstance(input_goods, dict):
+        used = np.tile(np.array([input_goods[good] for good in goods], dtype=float), (len(indices), 1))
+    else:
+        used = available[:, :len(goods)].copy()
+
+    change = np.zeros_like(available)
+    change[:, :len(goods)] -= used
+    produced = []
+    for ((function, output, function_goods), members), at in zip(batches.items(), rows_of):
+        inputs = used[at]
+        if function_goods is not None:
+            inputs = inputs[:, [goods.index(good) for good in function_goods]]
+        if shared:
+            parameters = np.array([functions[0]._batch[1]], dtype=float)
+        else:
+            parameters = np.array([functions[i]._batch[1] for i in members], dtype=float)
+        quantity = function(parameters, inputs)
+        change[at, columns.index(output)] += quantity
+        produced.append(quantity)
+
+    short = available[:, :len(goods)] + change[:, :len(goods)] < -epsilon
+    if short.any():
+        row, column = np.argwhere(short)[0]
+        agent = agents[indices[row]]
+        raise NotEnoughGoods(agent.name, goods[column], used[row, column] - available[row, column])
+
+    if expiring:
+        _change_expiring(expiring, used, change, len(goods))
+
+    if table is None:
+        for good, column in zip(columns, change.T):
+            if column.any():
+                for have, quantity in zip(haves, column.tolist()):
+                    have[good] += quantity
+    else:
+        matrix[np.ix_(rows, cols)] += change
+
+    if results:
+        row_of = {i: row for row, i in enumerate(indices)}
+        for (_, output, _), members, quantities in zip(batches, batches.values(), produced):
+            for i, quantity in zip(members, quantities.tolist()):
+                row = row_of[i]
+                ret = {good: -float(used[row, j]) for j, good in enumerate(goods)}
+                ret[output] = ret.get(output, 0) + quantity
+                rets[i] = ret
+
+
+def _change_expiring(expiring, used, change, num_goods):
+    """ takes the expiring inputs from the oldest cohorts, with one
+    vectorised :meth:`~abcEconomics.expiringgood.CohortTable.consume` per
+    CohortTable, and adds the outputs to the newest cohorts. Their changes
+    are cleared, so that they are not applied a second time. """
+    tables = OrderedDict()
+    for row, column, expiring_good in expiring:
+        table = expiring_good._table
+        try:
+            rows, takes, adds = tables[table]
+        except KeyError:
+            rows, takes, adds = tables[table] = ([], [], [])
+        taken = used[row, column] if column < num_goods else 0.0
+        rows.append(expiring_good._row)
+        takes.append(taken)
+        adds.append(change[row, column] + taken)
+        change[row, column] = 0
+    for table, (rows, takes, adds) in tables.items():
+        rows = np.array(rows, dtype=np.intp)
+        if any(takes):
+            table.consume(rows, np.array(takes))
+        if any(adds):
+            table.add_rows(rows, np.array(adds))
@@ -0,0 +1,341 @@
+# Copyright 2012 Davoud Taghawi-Nejad
+#
+# Module Author: Davoud Taghawi-Nejad
+#
+# abcEconomics is open-source software. If you are using abcEconomics for your research you are
+# requested the quote the use of this software.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License and quotation of the
+# author. You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+""" The production and utility functions, that
+:meth:`~abcEconomics.Firm.create_cobb_douglas`,
+:meth:`~abcEconomics.Firm.create_ces`,
+:meth:`~abcEconomics.Firm.create_leontief` and
+:meth:`~abcEconomics.Household.create_cobb_douglas_utility_function` return.
+
+They are callable objects, that work like the functions a modeller writes
+by hand: production_function(**goods) returns a dictionary with the
+output. The order of the goods and the exponents and shares are computed
+once, when the function is created.
+
+:meth:`quantity` evaluates the function for numbers, for a dictionary of
+NumPy arrays or for a NumPy array with the goods in the order of
+:attr:`goods` in its last axis. :meth:`gradient` returns the marginal
+products (or utilities) analytically, in the same form as the goods.
+
+The optimal demand is solved in closed form:
+:meth:`~ProductionFunction.cost_minimizing_demand` and
+:meth:`~ProductionFunction.cost` for a given output,
+:meth:`~ProductionFunction.budget_demand` for a given budget (for a
+utility function the utility maximizing consumption) and
+:meth:`~ProductionFunction.profit_maximizing_demand` for a given output
+price. The prices can be arrays, with a row per agent, so that a group's
+demand is computed in one call::
+
+    prices = np.column_stack([wages, rents])
+    inputs = production_function.budget_demand(budgets, prices)
+
+The objects can be pickled, so that they can be passed to
+:meth:`Group.produce_all <abcEconomics.Group.produce_all>` with several
+processes.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ProductionFunction:
+    """ The base of the production functions, output is the name of the
+    produced good, goods the names of the inputs in the order of the
+    parameters. """
+    def __call__(self, **goods):
+        return {self.output: self.quantity(goods)}
+
+    def quantity(self, goods):
+        """ returns the output for goods, a dictionary of quantities (numbers
+        or arrays) or an array with the goods in the order of
+        :attr:`goods` in its last axis """
+        if isinstance(goods, dict):
+            return self._quantity([goods[good] for good in self.goods])
+        return self.batch(self._parameters, np.asarray(goods, dtype=float))
+
+    def gradient(self, goods):
+        """ returns the marginal products of the goods, for a dictionary of
+        goods a dictionary, for an array an array of the same shape. The
+        quantities must be positive. """
+        return self._apply(self._gradient, goods)
+
+    def cost_minimizing_demand(self, quantity, prices):
+        """ returns the inputs, that produce quantity at the lowest cost.
+
+        Args:
+            quantity:
+                the output, a number or an array
+            prices:
+                the prices of the inputs, a dictionary of numbers or arrays
+                or an array with the goods in the order of :attr:`goods` in
+                its last axis; the inputs are returned in the same form.
+        """
+        return self._apply(self._cost_minimizing_demand, prices, quantity)
+
+    def cost(self, quantity, prices):
+        """ returns the lowest cost of producing quantity """
+        _, prices = self._columns(prices)
+        return _dot(prices, self._cost_minimizing_demand(prices, quantity))
+
+    def budget_demand(self, budget, prices):
+        """ returns the inputs, that produce the most with budget, in the
+        form of prices, see :meth:`cost_minimizing_demand` """
+        return self._apply(self._budget_demand, prices, budget)
+
+    def profit_maximizing_demand(self, output_price, prices):
+        """ returns the inputs, that maximize output_price * output - cost,
+        in the form of prices, see :meth:`cost_minimizing_demand`. Only
+        defined for decreasing returns to scale.
+
+        Example::
+
+            inputs = self.production_function.profit_maximizing_demand(
+                self.price, {'labor': wage, 'capital': rent})
+        """
+        return self._apply(self._profit_maximizing_demand, prices, output_price)
+
+    def _budget_demand(self, prices, budget):
+        # constant returns to scale: the cost is proportional to the output
+        unit = self._cost_minimizing_demand(prices, 1)
+        scale = budget / _dot(prices, unit)
+        return [scale * quantity for quantity in unit]
+
+    def _profit_maximizing_demand(self, prices, output_price):
+        raise ValueError('%s has constant returns to scale, the profit maximizing demand is not defined'
+                         % type(self).__name__)
+
+    def _columns(self, goods):
+        """ returns the names of the goods, None for an array, and the list
+        of the quantities or prices of every good """
+        if isinstance(goods, dict):
+            names = tuple(goods) if self.goods is None else self.goods
+            return names, [goods[good] for good in names]
+        goods = np.asarray(goods, dtype=float)
+        return None, [goods[..., i] for i in range(goods.shape[-1])]
+
+    def _apply(self, solve, goods, *args):
+        """ applies solve, which maps the list of the columns of goods to a
+        list with a column per good, and returns the result in the form of
+        goods """
+        names, columns = self._columns(goods)
+        ret = solve(columns, *args)
+        if names is None:
+            return np.stack(np.broadcast_arrays(*ret, *columns)[:len(ret)], axis=-1)
+        return dict(zip(names, ret))
+
+    def _set_batch(self, parameters):
+        """ sets _batch = ((batch form, output, goods), parameters).
+        :func:`abcEconomics.agents.firm.produce_all` evaluates the firms with
+        the same (batch form, output, goods) together, the batch form gets
+        a matrix of the parameters and a matrix of the inputs with a row per
+        firm and returns the output of every firm. """
+        self._batch = ((type(self).batch, self.output, self.goods), parameters)
+        self._parameters = None if np is None else np.array(parameters, dtype=float)
+
+
+class CobbDouglas(ProductionFunction):
+    """ :math:`Q = F \\cdot \\prod_i X_i^{e_i}` """
+    def __init__(self, output, multiplier, exponents):
+        self.output = output
+        self.multiplier = multiplier
+        self.goods = tuple(exponents)
+        self.exponents = tuple(exponents.values())
+        self._terms = tuple(exponents.items())
+        self._set_batch((multiplier,) + self.exponents)
+
+    def __reduce__(self):
+        return (CobbDouglas, (self.output, self.multiplier, dict(zip(self.goods, self.exponents))))
+
+    def quantity(self, goods):
+        if isinstance(goods, dict):
+            ret = 1
+            for good, exponent in self._terms:
+                ret = ret * goods[good] ** exponent
+            return self.multiplier * ret
+        return ProductionFunction.quantity(self, goods)
+
+    def _quantity(self, quantities):
+        ret = 1
+        for quantity, exponent in zip(quantities, self.exponents):
+            ret = ret * quantity ** exponent
+        return self.multiplier * ret
+
+    def _gradient(self, quantities):
+        output = self._quantity(quantities)
+        return [output * exponent / quantity for quantity, exponent in zip(quantities, self.exponents)]
+
+    @staticmethod
+    def batch(parameters, inputs):
+        return parameters[..., 0] * np.prod(inputs ** parameters[..., 1:], axis=-1)
+
+    def _cost_minimizing_demand(self, prices, quantity):
+        returns = sum(self.exponents)
+        scale = (quantity / self.multiplier) ** (1 / returns)
+        for price, exponent in zip(prices, self.exponents):
+            scale = scale * (price / exponent) ** (exponent / returns)
+        return [scale * exponent / price for price, exponent in zip(prices, self.exponents)]
+
+    def _budget_demand(self, prices, budget):
+        returns = sum(self.exponents)
+        return [exponent / returns * budget / price for price, exponent in zip(prices, self.exponents)]
+
+    def _profit_maximizing_demand(self, prices, output_price):
+        returns = sum(self.exponents)
+        if returns >= 1:
+            raise ValueError('the profit maximizing demand requires exponents, that sum to less than 1')
+        output = self.multiplier
+        for price, exponent in zip(prices, self.exponents):
+            output = output * (exponent * output_price / price) ** exponent
+        output = output ** (1 / (1 - returns))
+        return [exponent * output_price * output / price for price, exponent in zip(prices, self.exponents)]
+
+
+class CES(ProductionFunction):
+    """ :math:`Q = F \\cdot \\left[\\sum_i a_i X_i^{\\gamma}\\right]^{\\frac{1}{\\gamma}}`
+
+    Without shares all inputs have the same share and the function takes
+    any goods, then :attr:`goods` is None and :meth:`quantity` and
+    :meth:`gradient` need a dictionary.
+    """
+    def __init__(self, output, gamma, multiplier=1, shares=None):
+        self.output = output
+        self.gamma = gamma
+        self.multiplier = multiplier
+        if shares is None:
+            self.goods = None
+            self.shares = None
+            self._batch = ((CES.batch_equal_shares, output, None), (multiplier, gamma))
+            self._parameters = None if np is None else np.array([multiplier, gamma], dtype=float)
+        else:
+            self.goods = tuple(shares)
+            self.shares = tuple(shares.values())
+            self._set_batch((multiplier, gamma) + self.shares)
+
+    def __reduce__(self):
+        shares = None if self.shares is None else dict(zip(self.goods, self.shares))
+        return (CES, (self.output, self.gamma, self.multiplier, shares))
+
+    def quantity(self, goods):
+        if self.goods is None:
+            goods = dict(goods)
+            return self._quantity(list(goods.values()))
+        return ProductionFunction.quantity(self, goods)
+
+    def _shares(self, quantities):
+        if self.shares is None:
+            return [1 / len(quantities)] * len(quantities)
+        return self.shares
+
+    def _sum(self, quantities):
+        gamma = self.gamma
+        ret = 0
+        for quantity, share in zip(quantities, self._shares(quantities)):
+            ret = ret + share * quantity ** gamma
+        return ret
+
+    def _quantity(self, quantities):
+        return self.multiplier * self._sum(quantities) ** (1 / self.gamma)
+
+    def _gradient(self, quantities):
+        gamma = self.gamma
+        output_per_sum = self._quantity(quantities) / self._sum(quantities)
+        return [output_per_sum * share * quantity ** (gamma - 1)
+                for quantity, share in zip(quantities, self._shares(quantities))]
+
+    @staticmethod
+    def batch(parameters, inputs):
+        gamma = parameters[..., 1]
+        return (parameters[..., 0] *
+                (parameters[..., 2:] * inputs ** gamma[..., None]).sum(axis=-1) ** (1 / gamma))
+
+    @staticmethod
+    def batch_equal_shares(parameters, inputs):
+        gamma = parameters[..., 1]
+        return parameters[..., 0] * (inputs ** gamma[..., None]).mean(axis=-1) ** (1 / gamma)
+
+    def _cost_minimizing_demand(self, prices, quantity):
+        if not self.gamma < 1:
+            raise ValueError('the cost minimizing demand requires gamma < 1')
+        sigma = 1 / (1 - self.gamma)
+        shares = self._shares(prices)
+        total = 0
+        for price, share in zip(prices, shares):
+            total = total + share ** sigma * price ** (1 - sigma)
+        scale = quantity / (self.multiplier * total ** (1 / self.gamma))
+        return [scale * (share / price) ** sigma for price, share in zip(prices, shares)]
+
+
+class Leontief(ProductionFunction):
+    """ :math:`Q = \\min_i(X_i \\cdot f_i)`, the gradient is the factor of
+    the input, that limits the production and 0 for the other inputs """
+    def __init__(self, output, utilization_quantities):
+        self.output = output
+        self.goods = tuple(utilization_quantities)
+        self.factors = tuple(utilization_quantities.values())
+        self._set_batch(self.factors)
+
+    def __reduce__(self):
+        return (Leontief, (self.output, dict(zip(self.goods, self.factors))))
+
+    def _quantity(self, quantities):
+        return min([quantity * factor for quantity, factor in zip(quantities, self.factors)])
+
+    def _gradient(self, quantities):
+        if np is not None and isinstance(quantities[0], np.ndarray):
+            limiting = np.argmin(np.stack([quantity * factor
+                                           for quantity, factor in zip(quantities, self.factors)]), axis=0)
+            return [np.where(limiting == i, factor, 0.0) for i, factor in enumerate(self.factors)]
+        products = [quantity * factor for quantity, factor in zip(quantities, self.factors)]
+        limiting = products.index(min(products))
+        return [factor if i == limiting else 0 for i, factor in enumerate(self.factors)]
+
+    def quantity(self, goods):
+        if isinstance(goods, dict):
+            quantities = [goods[good] for good in self.goods]
+            if np is not None and isinstance(quantities[0], np.ndarray):
+                return np.min(np.stack([quantity * factor
+                                        for quantity, factor in zip(quantities, self.factors)]), axis=0)
+            return self._quantity(quantities)
+        return ProductionFunction.quantity(self, goods)
+
+    @staticmethod
+    def batch(parameters, inputs):
+        return (inputs * parameters).min(axis=-1)
+
+    def _cost_minimizing_demand(self, prices, quantity):
+        return [quantity / factor for factor in self.factors]
+
+
+class CobbDouglasUtility(CobbDouglas):
+    """ :math:`U = \\prod_i X_i^{e_i}`, calling it returns the utility.
+    :meth:`budget_demand` returns the consumption, that maximizes the
+    utility with a budget. """
+    def __init__(self, exponents):
+        CobbDouglas.__init__(self, None, 1, exponents)
+
+    def __reduce__(self):
+        return (CobbDouglasUtility, (dict(zip(self.goods, self.exponents)),))
+
+    def __call__(self, **goods):
+        return self.quantity(goods)
+
+
+def _dot(prices, quantities):
+    ret = 0
+    for price, quantity in zip(prices, quantities):
+        ret = ret + price * quantity
+    return ret
@@ -55,6 +55,23 @@ class Goods:
         """
         self._inventory.create(good, quantity)
 
+    def declare_perishable(self, good):
+        """ declares a good as perishable, the agent's quantity of the good
+        is destroyed, when the next round begins.
+
+        Args:
+            'good': is the name of the good
+
+        Example::
+
+            def init(self):
+                self.declare_perishable('bread')
+
+            def bake(self):
+                self.create('bread', 10)  # what is not sold this round, perishes
+        """
+        self._inventory._declare_perishable(good)
+
     def not_reserved(self, good):
         """ Returns the amount of goods that are not reserved for a trade
 
@@ -18,10 +18,9 @@
 The Household class extends the agent by giving him utility functions and the ability to consume goods.
 """
 
-import operator
-from functools import reduce
 from ..notenoughgoods import NotEnoughGoods
 from .trader import get_epsilon
+from .functions import CobbDouglasUtility
 epsilon = get_epsilon()
 
 
@@ -74,13 +73,17 @@ class Household:
         if not isinstance(input_goods, dict):
             input_goods = {good: self[good] for good in input_goods}
 
-        utility_and_result = utility_function(**input_goods)
-
-        try:
-            utility, result = utility_and_result
-        except TypeError:
+        if isinstance(utility_function, CobbDouglasUtility):
+            utility = utility_function.quantity(input_goods)
             result = {}
-            utility = utility_and_result
+        else:
+            utility_and_result = utility_function(**input_goods)
+
+            try:
+                utility, result = utility_and_result
+            except TypeError:
+                result = {}
+                utility = utility_and_result
 
         for good, quantity in input_goods.items():
             if self._inventory.haves[good] - quantity + result.get(good, 0) < -epsilon:
@@ -104,15 +107,13 @@ class Household:
             {'input1': exponent1, 'input2': exponent2 ...}: dictionary
             containing good names 'input' and correstponding exponents
         Returns:
-            A utility_function that can be used in consume_with_utility etc.
+            A :class:`~abcEconomics.agents.functions.CobbDouglasUtility`
+            utility_function that can be used in consume_with_utility etc.
+            It also returns the marginal utilities with
+            :meth:`~abcEconomics.agents.functions.ProductionFunction.gradient`.
 
         Example:
         self._utility_function = self.create_cobb_douglas({'bread' : 10, 'milk' : 1})
         self.produce(self.plastic_utility_function, {'bread' : 20, 'milk' : 1})
         """
-        def utility_function(**goods):
-            utility = reduce(operator.mul,
-                             [goods[name] ** exponent
-                              for name, exponent in exponents.items()])
-            return utility
-        return utility_function
+        return CobbDouglasUtility(exponents)
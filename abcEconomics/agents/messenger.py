@@ -23,6 +23,7 @@ with  :meth:`messenger.Messenger.get_messages_all` or messages with a specific t
 from collections import defaultdict
 from pprint import pprint
 from random import shuffle
+from itertools import repeat
 
 
 class Message(object):
@@ -34,6 +35,9 @@ class Message(object):
         self.topic = topic
         self.content = content
 
+    def __reduce__(self):
+        return (Message, (self.sender, self.receiver, self.topic, self.content))
+
     def __getitem__(self, item):
         return self.content[item]
 
@@ -46,7 +50,7 @@ class Messenger:
     def __init__(self, id, agent_parameters, simulation_parameters):
         super(Messenger, self).__init__(id, agent_parameters, simulation_parameters)
         self._msgs = {}
-        self.inbox = []
+        self.inbox = defaultdict(list)
         self._out = []
 
     def send_envelope(self, receiver, topic, content):
@@ -165,45 +169,115 @@ class Messenger:
         """ agent receives all messages and objects that have been send in this
         subround and deletes the offers that where retracted, but not executed.
 
-        '_d': delete received that the issuing agent retract
+        The inbox holds the messages by topic, the system topics are
+        dispatched by :attr:`_clearing` in bulk, all other topics go to
+        :meth:`get_messages`:
+
+        'abcEconomics_propose_buy'/'_sell': an offer from another agent
         'abcEconomics_receive_accept': clears a made offer that was accepted by the other agent
         'abcEconomics_receive_reject': deletes an offer that the other agent rejected
         'abcEconomics_receive_good': recive a 'free' good from another party
+        'abcEconomics_fill': a market filled an order (partially)
+        'abcEconomics_order_cancelled': a market cancelled the rest of an order
+        'abcEconomics_receive_quote': a quote
+        '!d': delete a contract
+        'abcEconomics_forceexecute': calls a method of the agent
         """
-        for typ, msg in self.inbox:
-            if typ == 'abcEconomics_propose_buy':
-                self._open_offers_buy[msg.good][msg.id] = msg
-            elif typ == 'abcEconomics_propose_sell':
-                self._open_offers_sell[msg.good][msg.id] = msg
-            elif typ == 'abcEconomics_receive_accept':
-                offer = self._receive_accept(msg)
-                if self.trade_logging == 2:
-                    self._log_receive_accept_group(offer)
-                elif self.trade_logging == 1:
-                    self._log_receive_accept_agent(offer)
-            elif typ == 'abcEconomics_receive_reject':
-                self._receive_reject(msg)
-            elif typ == 'abcEconomics_receive_good':
-                self._inventory.haves[msg[0]] += msg[1]
-            elif typ == 'abcEconomics_receive_quote':
-                self._quotes[msg.id] = msg
-            elif typ == '!d':
-                if msg[0] == 'r':
-                    del self._contracts_pay[msg[1]][msg[2]]
-                if msg[0] == 'd':
-                    del self._contracts_deliver[msg[1]][msg[2]]
-            elif typ == 'abcEconomics_forceexecute':
-                getattr(self, msg[0])(*msg[1:])
+        clearing = self._clearing
+        msgs = self._msgs
+        for typ, messages in self.inbox.items():
+            try:
+                clear = clearing[typ]
+            except KeyError:
+                try:
+                    msgs[typ].extend(messages)
+                except KeyError:
+                    msgs[typ] = messages
             else:
-                self._msgs.setdefault(typ, []).append(msg)
+                clear(self, messages)
         self.inbox.clear()
 
+    def _clear_propose_buy(self, messages):
+        self._acquire_offers(self._open_offers_buy, messages)
+
+    def _clear_propose_sell(self, messages):
+        self._acquire_offers(self._open_offers_sell, messages)
+
+    def _acquire_offers(self, open_offers, messages):
+        book = self._offer_book
+        if book is None:
+            for msg in messages:
+                open_offers[msg.good][msg.id] = msg
+        else:
+            symbols, goods, ids = book.symbols, book.good, book.id
+            for msg in messages:
+                row = book.acquire(msg)
+                open_offers[symbols[goods[row]]][ids[row]] = row
+
+    def _clear_receive_accept(self, messages):
+        if self.trade_logging == 2:
+            log = self._log_receive_accept_group
+        elif self.trade_logging == 1:
+            log = self._log_receive_accept_agent
+        else:
+            log = None
+        if log is not None and not self._trade_log:
+            self._clock.traders[self.name] = self
+        for msg in messages:
+            offer = self._receive_accept(msg)
+            if log is not None:
+                log(offer)
+
+    def _clear_receive_reject(self, messages):
+        for msg in messages:
+            self._receive_reject(msg)
+
+    def _clear_receive_good(self, messages):
+        haves = self._inventory.haves
+        for good, quantity in messages:
+            haves[good] += quantity
+
+    def _clear_fill(self, messages):
+        for msg in messages:
+            self._receive_fill(msg)
+
+    def _clear_order_cancelled(self, messages):
+        for msg in messages:
+            self._receive_order_cancelled(msg)
+
+    def _clear_receive_quote(self, messages):
+        self._quotes.update((msg.id, msg) for msg in messages)
+
+    def _clear_delete_contract(self, messages):
+        for msg in messages:
+            if msg[0] == 'r':
+                del self._contracts_pay[msg[1]][msg[2]]
+            if msg[0] == 'd':
+                del self._contracts_deliver[msg[1]][msg[2]]
+
+    def _clear_forceexecute(self, messages):
+        for msg in messages:
+            getattr(self, msg[0])(*msg[1:])
+
+    # the handlers of the system topics in the inbox, a plugin can add its
+    # topics to a copy of this dictionary in its class
+    _clearing = {'abcEconomics_propose_buy': _clear_propose_buy,
+                 'abcEconomics_propose_sell': _clear_propose_sell,
+                 'abcEconomics_receive_accept': _clear_receive_accept,
+                 'abcEconomics_receive_reject': _clear_receive_reject,
+                 'abcEconomics_receive_good': _clear_receive_good,
+                 'abcEconomics_fill': _clear_fill,
+                 'abcEconomics_order_cancelled': _clear_order_cancelled,
+                 'abcEconomics_receive_quote': _clear_receive_quote,
+                 '!d': _clear_delete_contract,
+                 'abcEconomics_forceexecute': _clear_forceexecute}
+
     def _post_messages(self, agents):
-        for name, envelope in self._out:
+        for name, (typ, msg) in self._out:
             try:
-                agents[name].inbox.append(envelope)
+                agents[name].inbox[typ].append(msg)
             except KeyError:
-                print(envelope)
+                print((typ, msg))
                 raise KeyError("Receiver %s does not exist" % str(name))
         self._out.clear()
 
@@ -250,11 +324,31 @@ class Messenger:
         """
         self._out.append((receiver, (topic, msg)))
 
+    def _send_many(self, receivers, typ, msgs):
+        """ sends the message msgs[i] to receivers[i], used by batch operations
+        like :meth:`~abcEconomics.Trader.accept_many` """
+        self._out.extend(zip(receivers, zip(repeat(typ), msgs)))
+
+    def _send_many_multiprocessing(self, receivers, typ, msgs):
+        """ Is used to overwrite _send_many in multiprocessing mode """
+        directory = self._directory
+        out = self._out
+        for receiver, msg in zip(receivers, msgs):
+            try:
+                shard = directory[receiver]
+            except KeyError:
+                raise KeyError("Receiver %s does not exist" % str(receiver))
+            out[shard].append((receiver, (typ, msg)))
+
     def _send_multiprocessing(self, receiver, typ, msg):
         """ Is used to overwrite _send in multiprocessing mode.
-        Requires that self._out is overwritten with a defaultdict(list) """
-        self._out[hash(receiver) % self._processes].append(
-            (receiver, (typ, msg)))
+        Requires that self._out is overwritten with a defaultdict(list) and
+        self._directory with the shard of every agent """
+        try:
+            shard = self._directory[receiver]
+        except KeyError:
+            raise KeyError("Receiver %s does not exist" % str(receiver))
+        self._out[shard].append((receiver, (typ, msg)))
 
     def check_for_lost_messages(self):
         """ Checks whether there are any messages, or trade requests that have not been
@@ -0,0 +1,309 @@
+# Copyright 2012 Davoud Taghawi-Nejad
+#
+# Module Author: Davoud Taghawi-Nejad
+#
+# abcEconomics is open-source software. If you are using abcEconomics for your research you are
+# requested the quote the use of this software.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License and quotation of the
+# author. You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""
+The offer book keeps all offers of the agents of one process in columns
+(struct of arrays) instead of one :class:`~abcEconomics.agents.trader.Offer`
+object per offer. It is switched on with
+:class:`Simulation(offer_book=True) <abcEconomics.Simulation>`.
+
+Every offer is a row in the book. The agents keep the row numbers of the
+offers they received, the given offers are :class:`OfferView` objects, a
+light-weight view on a row, with the same attributes as an
+:class:`~abcEconomics.agents.trader.Offer` (offer.price, offer.status...).
+:meth:`~abcEconomics.agents.trader.Trader.get_offers` sorts the rows by
+their price column.
+
+The numerical columns are :mod:`array` buffers, so that reading and writing
+a single offer is cheap, :meth:`OfferBook.column` exposes them as NumPy
+arrays without copying them for vectorised operations.
+
+A row is referenced by the agent that made the offer and the agent that
+received it. When both are done with it, the row is retired. Retired rows
+are reused, when the book runs out of free rows, views that the user still
+holds are detached then: they keep a private copy of the final state of the
+offer.
+"""
+import random
+import weakref
+from array import array
+
+from .trader import Offer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+STATUS = ['new', 'accepted', 'rejected', 'pending', 'perished']
+NEW, ACCEPTED, REJECTED = 0, 1, 2
+_status_code = {status: code for code, status in enumerate(STATUS)}
+
+_columns = (('sender', None),
+            ('receiver', None),
+            ('good', 'l'),
+            ('currency', 'l'),
+            ('quantity', 'd'),
+            ('price', 'd'),
+            ('sell', 'b'),
+            ('status', 'b'),
+            ('final_quantity', 'd'),
+            ('id', 'q'),
+            ('made', None),
+            ('status_round', None),
+            ('refs', 'b'))
+""" name and array typecode of the columns, None for lists of objects """
+
+
+class OfferBook:
+    """ The offers of all agents of a process, one array per attribute.
+    Goods and currencies are stored as numbers, self.symbols translates
+    them back to their names. """
+
+    NEW, ACCEPTED, REJECTED = NEW, ACCEPTED, REJECTED
+
+    def __init__(self, capacity=1024):
+        self.symbols = []
+        self._symbol_of = {}
+        self.capacity = 0
+        for column, typecode in _columns:
+            setattr(self, column, [] if typecode is None else array(typecode))
+        self.views = []
+        self._free = []
+        self._retired = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        old = self.capacity
+        self.capacity = old + capacity
+        for column, typecode in _columns:
+            getattr(self, column).extend([None if typecode is None else 0] * capacity)
+        self.views.extend([None] * capacity)
+        self._free.extend(range(self.capacity - 1, old - 1, -1))
+
+    def column(self, name):
+        """ returns a numerical column as a NumPy array, that shares the
+        memory with the book. The array must not be kept, while offers are
+        made. """
+        return np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+
+    def symbol(self, name):
+        """ returns the number of a good or currency """
+        try:
+            return self._symbol_of[name]
+        except KeyError:
+            symbol = self._symbol_of[name] = len(self.symbols)
+            self.symbols.append(name)
+            return symbol
+
+    def new(self, sender, receiver, good, quantity, price, currency, sell, id, made):
+        """ adds a new offer and returns its row """
+        if not self._free:
+            self._recycle()
+        row = self._free.pop()
+        default = -2 if sell else -1
+        self.sender[row] = sender
+        self.receiver[row] = receiver
+        self.good[row] = self.symbol(good)
+        self.currency[row] = self.symbol(currency)
+        self.quantity[row] = quantity
+        self.price[row] = price
+        self.sell[row] = sell
+        self.status[row] = NEW
+        self.final_quantity[row] = default
+        self.id[row] = id
+        self.made[row] = made
+        self.status_round[row] = default
+        self.refs[row] = 1
+        return row
+
+    def add(self, offer):
+        """ copies an offer that is not in this book into a new row,
+        a view is re-bound to the new row """
+        row = self.new(offer.sender, offer.receiver, offer.good, offer.quantity, offer.price,
+                       offer.currency, offer.sell, offer.id, offer.made)
+        self.status[row] = _status_code[offer.status]
+        self.final_quantity[row] = offer.final_quantity
+        self.status_round[row] = offer.status_round
+        if type(offer) is OfferView:
+            offer._book = self
+            offer._row = row
+            self.views[row] = weakref.ref(offer)
+        return row
+
+    def row_of(self, offer):
+        """ returns the row of an offer the agent made, offers from other
+        processes are added to this book """
+        if type(offer) is OfferView and offer._book is self:
+            return offer._row
+        return self.add(offer)
+
+    def acquire(self, offer):
+        """ returns the row of an offer the agent received and adds a
+        reference to it """
+        if type(offer) is OfferView and offer._book is self:
+            self.refs[offer._row] += 1
+            return offer._row
+        return self.add(offer)
+
+    def release(self, row):
+        """ removes a reference, when the row is not referenced anymore
+        it is retired """
+        refs = self.refs[row] - 1
+        self.refs[row] = refs
+        if refs == 0:
+            self._retired.append(row)
+
+    def _recycle(self):
+        """ frees the retired rows, detaches their views, that are still
+        in use; grows the book, when less than half of it is freed """
+        views = self.views
+        for row in self._retired:
+            view = views[row]
+            if view is not None:
+                view = view()
+                if view is not None:
+                    view._book = _Detached(self.fields(row))
+                    view._row = 0
+                views[row] = None
+            self.sender[row] = self.receiver[row] = None
+            self.made[row] = self.status_round[row] = None
+        self._free, self._retired = self._retired, []
+        self._free.reverse()
+        if len(self._free) < self.capacity // 2:
+            self._grow(self.capacity)
+
+    def view(self, row):
+        """ returns the :class:`OfferView` of a row """
+        view = self.views[row]
+        if view is not None:
+            view = view()
+        if view is None:
+            view = OfferView(self, row)
+            self.views[row] = weakref.ref(view)
+        return view
+
+    def views_of(self, rows, sorted=True, descending=False, shuffled=True):
+        """ returns the views of rows, shuffled and (stable) sorted by price
+        just like a list of offers. rows is a list and shuffled in place """
+        if shuffled:
+            random.shuffle(rows)
+        if sorted:
+            rows.sort(key=self.price.__getitem__, reverse=descending)
+        view = self.view
+        return [view(row) for row in rows]
+
+    def fields(self, row):
+        """ returns the attributes of the offer in the order of
+        :class:`~abcEconomics.agents.trader.Offer`'s arguments """
+        return (self.sender[row], self.receiver[row],
+                self.symbols[self.good[row]], self.quantity[row],
+                self.price[row], self.symbols[self.currency[row]],
+                bool(self.sell[row]), STATUS[self.status[row]],
+                self.final_quantity[row], self.id[row],
+                self.made[row], self.status_round[row])
+
+
+class _Detached:
+    """ a one row book, that keeps the final state of an offer, whose row
+    has been reused """
+    def __init__(self, fields):
+        (sender, receiver, good, quantity, price, currency, sell, status,
+         final_quantity, id, made, status_round) = fields
+        self.symbols = [good, currency]
+        self.sender = [sender]
+        self.receiver = [receiver]
+        self.good = [0]
+        self.currency = [1]
+        self.quantity = [quantity]
+        self.price = [price]
+        self.sell = [sell]
+        self.status = [_status_code[status]]
+        self.final_quantity = [final_quantity]
+        self.id = [id]
+        self.made = [made]
+        self.status_round = [status_round]
+
+    def symbol(self, name):
+        self.symbols.append(name)
+        return len(self.symbols) - 1
+
+    def fields(self, row):
+        return OfferBook.fields(self, row)
+
+
+def _column(name):
+    def getter(self):
+        return getattr(self._book, name)[self._row]
+
+    def setter(self, value):
+        getattr(self._book, name)[self._row] = value
+    return property(getter, setter)
+
+
+def _symbol_column(name):
+    def getter(self):
+        book = self._book
+        return book.symbols[getattr(book, name)[self._row]]
+
+    def setter(self, value):
+        getattr(self._book, name)[self._row] = self._book.symbol(value)
+    return property(getter, setter)
+
+
+def _status_getter(self):
+    return STATUS[self._book.status[self._row]]
+
+
+def _status_setter(self, value):
+    self._book.status[self._row] = _status_code[value]
+
+
+def _sell_getter(self):
+    return bool(self._book.sell[self._row])
+
+
+class OfferView:
+    """ A view on an offer in the :class:`OfferBook`, it has the same
+    attributes as an :class:`~abcEconomics.agents.trader.Offer`. """
+    __slots__ = ('_book', '_row', '__weakref__')
+
+    def __init__(self, book, row):
+        self._book = book
+        self._row = row
+
+    sender = _column('sender')
+    receiver = _column('receiver')
+    good = _symbol_column('good')
+    currency = _symbol_column('currency')
+    quantity = _column('quantity')
+    price = _column('price')
+    sell = property(_sell_getter, _column('sell').fset)
+    status = property(_status_getter, _status_setter)
+    final_quantity = _column('final_quantity')
+    id = _column('id')
+    made = _column('made')
+    status_round = _column('status_round')
+
+    def __reduce__(self):
+        return (_rebuild_view, self._book.fields(self._row))
+
+    __repr__ = Offer.__repr__
+
+
+def _rebuild_view(*fields):
+    return OfferView(_Detached(fields), 0)
@@ -39,9 +39,15 @@ Messaging between agents:
 # Don't forget to commit it to git                                                         #
 #******************************************************************************************#
 import random
-from collections import defaultdict, OrderedDict
+from collections import defaultdict
+from itertools import chain
 from abcEconomics.notenoughgoods import NotEnoughGoods
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 epsilon = 0.00000000001
 
 
@@ -105,7 +111,13 @@ class Offer:
             bought or sold. (Equal to quantity if the offer was accepted fully)
         id:
             a unique identifier
+
+    Offers have slots instead of a __dict__ and are pickled as a tuple of
+    their fields.
     """
+    __slots__ = ('sender', 'receiver', 'good', 'currency', 'quantity', 'price', 'sell', 'status',
+                 'final_quantity', 'id', 'made', 'status_round')
+
     def __init__(self, sender, receiver, good, quantity, price, currency,
                  sell, status, final_quantity, id,
                  made, status_round):
@@ -123,9 +135,9 @@ class Offer:
         self.status_round = status_round
 
     def __reduce__(self):
-        return (rebuild_offer, (self.sender, self.receiver, self.good, self.quantity, self.price, self.currency,
-                self.sell, self.status, self.final_quantity, self.id,
-                self.made, self.status_round))
+        return (Offer, (self.sender, self.receiver, self.good, self.quantity, self.price, self.currency,
+                        self.sell, self.status, self.final_quantity, self.id,
+                        self.made, self.status_round))
 
     def __repr__(self):
         final_quantity = str(self.final_quantity)  # to anticipate for the case when it is None
@@ -139,12 +151,43 @@ class Offer:
             self.made, status_round)
 
 
-def rebuild_offer(sender, receiver, good, quantity, price,
-                  currency, sell, status, final_quantity,
-                  id, made, status_round):
-    return Offer(sender, receiver, good, quantity, price, currency,
-                 sell, status, final_quantity, id,
-                 made, status_round)
+rebuild_offer = Offer  # unpickles offers, that were pickled by earlier versions
+
+
+class Order:
+    """ A limit order, that an agent submitted to a :class:`abcEconomics.Market`
+    with :meth:`~Trader.limit_buy` or :meth:`~Trader.limit_sell`.
+
+    it has the following properties:
+        market:
+            the name of the market
+
+        good, currency, quantity, price, sell, id, made:
+            as in :class:`Offer`
+
+        filled:
+            the quantity that has been bought or sold so far
+
+        status:
+            'open', 'filled' or 'cancelled'
+    """
+    def __init__(self, market, good, quantity, price, currency, sell, id, made):
+        self.market = market
+        self.good = good
+        self.quantity = quantity
+        self.price = price
+        self.currency = currency
+        self.sell = sell
+        self.id = id
+        self.made = made
+        self.filled = 0
+        self.status = 'open'
+
+    def __repr__(self):
+        return ('<{market: %s, good: %s, quantity: %f, price: %f, currency: %s, sell: %r, '
+                'filled: %f, status: %s, id: %i}>' % (self.market, self.good, self.quantity, self.price,
+                                                      self.currency, self.sell, self.filled, self.status,
+                                                      self.id))
 
 
 class Trader:
@@ -216,12 +259,14 @@ class Trader:
 
     If we did not implement a barter class, but one can use this class as a barter class,
     """
+    _offer_book = None
+
     def __init__(self, id, agent_parameters, simulation_parameters):
         super(Trader, self).__init__(id, agent_parameters, simulation_parameters)
         # unpack simulation_parameters
         trade_logging = simulation_parameters['trade_logging']
 
-        self.given_offers = OrderedDict()
+        self.given_offers = {}
         self._open_offers_buy = defaultdict(dict)
         self._open_offers_sell = defaultdict(dict)
         self._polled_offers = {}
@@ -230,6 +275,7 @@ class Trader:
                               'group': 2, 'off': 0}[trade_logging]
         self._trade_log = defaultdict(int)
         self._quotes = {}
+        self._orders = {}
 
     def _offer_counter(self):
         """ returns a unique number for an offer (containing the agent's name)
@@ -237,11 +283,6 @@ class Trader:
         self._offer_count += 1
         return hash((self.name, self._offer_count))
 
-    def _advance_round(self, time):
-        if self.trade_logging > 0:
-            self.database_connection.put(["trade_log", self._trade_log, self.time])
-        self._trade_log = defaultdict(int)
-
     def get_buy_offers_all(self, descending=False, sorted=True):
         goods = list(self._open_offers_buy.keys())
         return {good: self.get_offers(good, descending, sorted) for good in goods}
@@ -287,10 +328,15 @@ class Trader:
         goods = list(self._open_offers_sell.keys()) + list(self._open_offers_buy.keys())
         return {good: self.get_offers(good, descending, sorted) for good in goods}
 
+    def _poll_offers(self, open_offers, good):
+        offers = open_offers.pop(good, {})
+        self._polled_offers.update(offers)
+        return list(offers.values())
+
     def get_buy_offers(self, good, sorted=True, descending=False, shuffled=True):
-        ret = list(self._open_offers_buy[good].values())
-        self._polled_offers.update(self._open_offers_buy[good])
-        del self._open_offers_buy[good]
+        ret = self._poll_offers(self._open_offers_buy, good)
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -298,9 +344,9 @@ class Trader:
         return ret
 
     def get_sell_offers(self, good, sorted=True, descending=False, shuffled=True):
-        ret = list(self._open_offers_sell[good].values())
-        self._polled_offers.update(self._open_offers_sell[good])
-        del self._open_offers_sell[good]
+        ret = self._poll_offers(self._open_offers_sell, good)
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -345,8 +391,10 @@ class Trader:
                 else:
                     self.reject(offer)  # optional
         """
-        ret = (self.get_buy_offers(good, descending=False, sorted=False, shuffled=False) +
-               self.get_sell_offers(good, descending=False, sorted=False, shuffled=False))
+        ret = (self._poll_offers(self._open_offers_buy, good) +
+               self._poll_offers(self._open_offers_sell, good))
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -354,9 +402,9 @@ class Trader:
         return ret
 
     def peak_buy_offers(self, good, sorted=True, descending=False, shuffled=True):
-        ret = []
-        for offer in self._open_offers_buy[good].values():
-            ret.append(offer)
+        ret = list(self._open_offers_buy.get(good, {}).values())
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -364,9 +412,9 @@ class Trader:
         return ret
 
     def peak_sell_offers(self, good, sorted=True, descending=False, shuffled=True):
-        ret = []
-        for offer in self._open_offers_sell[good].values():
-            ret.append(offer)
+        ret = list(self._open_offers_sell.get(good, {}).values())
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -398,8 +446,10 @@ class Trader:
                 else:
                     self.reject(offer)  # optional
         """
-        ret = (self.peak_buy_offers(good, sorted=False, descending=False, shuffled=False) +
-               self.peak_sell_offers(good, sorted=False, descending=False, shuffled=False))
+        ret = (list(self._open_offers_buy.get(good, {}).values()) +
+               list(self._open_offers_sell.get(good, {}).values()))
+        if self._offer_book is not None:
+            return self._offer_book.views_of(ret, sorted, descending, shuffled)
         if shuffled:
             random.shuffle(ret)
         if sorted:
@@ -472,18 +522,23 @@ class Trader:
 
         offer_id = self._offer_counter()
         self._inventory.reserve(good, quantity)
-        offer = Offer(self.name,
-                      receiver,
-                      good,
-                      quantity,
-                      price,
-                      currency,
-                      True,
-                      'new',
-                      -2,
-                      offer_id,
-                      self.time,
-                      -2)
+        if self._offer_book is None:
+            offer = Offer(self.name,
+                          receiver,
+                          good,
+                          quantity,
+                          price,
+                          currency,
+                          True,
+                          'new',
+                          -2,
+                          offer_id,
+                          self.time,
+                          -2)
+        else:
+            book = self._offer_book
+            offer = book.view(book.new(self.name, receiver, good, quantity, price, currency,
+                                       True, offer_id, self.time))
         self.given_offers[offer_id] = offer
         self.send(receiver, 'abcEconomics_propose_sell', offer)
         return offer
@@ -534,18 +589,23 @@ class Trader:
 
         offer_id = self._offer_counter()
         self._inventory.reserve(currency, money_amount)
-        offer = Offer(self.name,
-                      receiver,
-                      good,
-                      quantity,
-                      price,
-                      currency,
-                      False,
-                      'new',
-                      -1,
-                      offer_id,
-                      self.time,
-                      -1)
+        if self._offer_book is None:
+            offer = Offer(self.name,
+                          receiver,
+                          good,
+                          quantity,
+                          price,
+                          currency,
+                          False,
+                          'new',
+                          -1,
+                          offer_id,
+                          self.time,
+                          -1)
+        else:
+            book = self._offer_book
+            offer = book.view(book.new(self.name, receiver, good, quantity, price, currency,
+                                       False, offer_id, self.time))
         self.send(receiver, 'abcEconomics_propose_buy', offer)
         self.given_offers[offer_id] = offer
         return offer
@@ -570,7 +630,15 @@ class Trader:
         Return:
             Returns a dictionary with the good's quantity and the amount paid.
         """
-        offer_quantity = offer.quantity
+        book = self._offer_book
+        if book is None:
+            good, currency, price, sell = offer.good, offer.currency, offer.price, offer.sell
+            offer_quantity = offer.quantity
+        else:
+            row = self._polled_offers[offer.id]
+            good, currency = book.symbols[book.good[row]], book.symbols[book.currency[row]]
+            price, sell = book.price[row], book.sell[row]
+            offer_quantity = book.quantity[row]
 
         if quantity == -999:
             quantity = offer_quantity
@@ -579,49 +647,243 @@ class Trader:
             quantity = 0
         if quantity > offer_quantity + epsilon * fmax(quantity, offer_quantity):
             raise AssertionError('accepted more than offered %s: %.100f >= %.100f'
-                                 % (offer.good, quantity, offer_quantity))
+                                 % (good, quantity, offer_quantity))
         if quantity > offer_quantity:
             quantity = offer_quantity
 
         if quantity == 0:
             self.reject(offer)
-            return {offer.good: 0, offer.currency: 0}
+            return {good: 0, currency: 0}
 
-        money_amount = quantity * offer.price
-        if offer.sell:  # ord('s')
+        money_amount = quantity * price
+        if sell:  # ord('s')
             assert money_amount > - epsilon, 'money = quantity * offer.price %.30f is smaller than 0 - epsilon (%.30f)' % (money_amount, - epsilon)
             if money_amount < 0:
                 money_amount = 0
 
-            available = self._inventory[offer.currency]
+            available = self._inventory[currency]
             if money_amount > available + epsilon + epsilon * max(money_amount, available):
-                raise NotEnoughGoods(self.name, offer.currency, money_amount - available)
+                raise NotEnoughGoods(self.name, currency, money_amount - available)
             if money_amount > available:
                 money_amount = available
-            self._inventory.haves[offer.good] += quantity
-            self._inventory.haves[offer.currency] -= quantity * offer.price
+            self._inventory.haves[good] += quantity
+            self._inventory.haves[currency] -= quantity * price
         else:
             assert quantity > - epsilon, 'quantity %.30f is smaller than 0 - epsilon (%.30f)' % (quantity, - epsilon)
             if quantity < 0:
                 quantity = 0
-            available = self._inventory[offer.good]
+            available = self._inventory[good]
             if quantity > available + epsilon + epsilon * max(quantity, available):
-                raise NotEnoughGoods(self.name, offer.good, quantity - available)
+                raise NotEnoughGoods(self.name, good, quantity - available)
             if quantity > available:
                 quantity = available
-            self._inventory.haves[offer.good] -= quantity
-            self._inventory.haves[offer.currency] += quantity * offer.price
-        offer.final_quantity = quantity
-        self.send(offer.sender, 'abcEconomics_receive_accept', (offer.id, quantity))
-        del self._polled_offers[offer.id]
-        if offer.sell:  # ord('s')
-            return {offer.good: - quantity, offer.currency: money_amount}
+            self._inventory.haves[good] -= quantity
+            self._inventory.haves[currency] += quantity * price
+        if book is None:
+            offer.final_quantity = quantity
+            self.send(offer.sender, 'abcEconomics_receive_accept', (offer.id, quantity))
+            del self._polled_offers[offer.id]
+        else:
+            book.final_quantity[row] = quantity
+            self.send(book.sender[row], 'abcEconomics_receive_accept', (book.id[row], quantity))
+            del self._polled_offers[offer.id]
+            book.release(row)
+        if sell:  # ord('s')
+            return {good: - quantity, currency: money_amount}
+        else:
+            return {good: quantity, currency: - money_amount}
+
+    def accept_many(self, offers, quantities=None, epsilon=epsilon):
+        """ accepts several offers at once. The checks of :meth:`accept` are
+        done for all offers together in one vectorised pass. If the agent
+        has not enough goods or money for all offers, NotEnoughGoods is raised
+        and no offer is accepted. Requires NumPy.
+
+        Args:
+            offers:
+                a list of offers, retrieved with :meth:`get_offers`
+
+            quantities (optional):
+                the quantities to accept, by default all offers are fully
+                accepted
+
+            epsilon (optional):
+                if you have floating point errors, a quantity or prices is
+                a fraction of number to high or low. You can increase the
+                floating point tolerance. See troubleshooting -- floating point problems
+
+        Returns:
+            A dictionary with the change of the agent's goods and money.
+
+        Example::
+
+            offers = self.get_offers('bread')
+            self.accept_many([offer for offer in offers if offer.price < 1])
+        """
+        if np is None:
+            raise ImportError('accept_many requires numpy')
+        if self._offer_book is None:
+            items = list(offers)
+        else:
+            items = [self._polled_offers[offer.id] for offer in offers]
+        if not items:
+            return {}
+        table = self._offer_table(items)
+        if quantities is None:
+            quantities = table[3]
+        return self._accept_table(items, table, np.array(quantities, dtype=float), epsilon)
+
+    def clear_market(self, good, limit_price=None, max_quantity=None, rule=None, epsilon=epsilon):
+        """ accepts the best offers for good, sell offers starting with the
+        cheapest, buy offers starting with the most expensive, as long as the
+        agent has enough money (or goods); the last offer is accepted partially.
+        The remaining offers are rejected. Ties are broken randomly.
+        It works on all offers at once and can be called on a group:
+        `households.clear_market('bread', limit_price=2)`. Requires NumPy.
+
+        Args:
+            good:
+                the good which is traded
+
+            limit_price (optional):
+                sell offers above and buy offers below this price are not
+                accepted
+
+            max_quantity (optional):
+                maximum quantity of the good to buy and sell
+
+            rule (optional):
+                a function rule(prices, quantities, sell) that gets the
+                prices and quantities of the offers and a boolean array which
+                is True for sell offers and returns the quantities to accept.
+                It replaces limit_price; the money (goods) of the agent and
+                max_quantity are still respected.
+
+        Returns:
+            A dictionary with the change of the agent's goods and money.
+        """
+        if np is None:
+            raise ImportError('clear_market requires numpy')
+        items = (self._poll_offers(self._open_offers_sell, good) +
+                 self._poll_offers(self._open_offers_buy, good))
+        if not items:
+            return {}
+        table = self._offer_table(items)
+        symbols, goods, currencies, quantity, price, sell = table
+        if rule is None:
+            wanted = quantity.copy()
+            if limit_price is not None:
+                wanted[sell & (price > limit_price)] = 0
+                wanted[~sell & (price < limit_price)] = 0
+        else:
+            wanted = np.clip(np.array(rule(price, quantity, sell), dtype=float), 0, quantity)
+
+        ties = np.random.default_rng(random.getrandbits(64)).random(len(items))
+        order = np.lexsort((ties, np.where(sell, price, -price)))
+        paid_with = np.where(sell, currencies, goods)
+        unit_cost = np.where(sell, price, 1.0)
+        accepted = np.zeros(len(items))
+        for symbol in np.unique(paid_with):
+            members = order[paid_with[order] == symbol]
+            cost = wanted[members] * unit_cost[members]
+            affordable = np.clip(self._inventory[symbols[symbol]] - (np.cumsum(cost) - cost), 0, cost)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                accepted[members] = np.where(cost > 0, wanted[members] * affordable / cost, wanted[members])
+        if max_quantity is not None:
+            ordered = accepted[order]
+            accepted[order] = np.clip(max_quantity - (np.cumsum(ordered) - ordered), 0, ordered)
+        return self._accept_table(items, table, accepted, epsilon)
+
+    def _offer_table(self, items):
+        """ returns the symbols and the arrays of the goods, currencies,
+        quantities, prices and sell flags of polled offers, items are rows in
+        the offer book or offers """
+        book = self._offer_book
+        if book is None:
+            symbol_of = {}
+            n = len(items)
+            goods = np.fromiter((symbol_of.setdefault(offer.good, len(symbol_of)) for offer in items),
+                                dtype=np.intp, count=n)
+            currencies = np.fromiter((symbol_of.setdefault(offer.currency, len(symbol_of)) for offer in items),
+                                     dtype=np.intp, count=n)
+            return (list(symbol_of),
+                    goods,
+                    currencies,
+                    np.fromiter((offer.quantity for offer in items), dtype=float, count=n),
+                    np.fromiter((offer.price for offer in items), dtype=float, count=n),
+                    np.fromiter((offer.sell for offer in items), dtype=bool, count=n))
+        rows = np.array(items, dtype=np.intp)
+        return (book.symbols,
+                book.column('good')[rows].astype(np.intp),
+                book.column('currency')[rows].astype(np.intp),
+                book.column('quantity')[rows],
+                book.column('price')[rows],
+                book.column('sell')[rows].astype(bool))
+
+    def _accept_table(self, items, table, quantities, epsilon):
+        """ accepts the polled offers items with quantities, see :meth:`accept_many` """
+        symbols, goods, currencies, quantity, price, sell = table
+        if (quantities <= - epsilon).any():
+            raise AssertionError('quantity %.30f is smaller than 0 - epsilon (%.30f)'
+                                 % (quantities.min(), - epsilon))
+        quantities = np.maximum(quantities, 0)
+        over = quantities > quantity + epsilon * np.maximum(quantities, quantity)
+        if over.any():
+            i = np.flatnonzero(over)[0]
+            raise AssertionError('accepted more than offered %s: %.100f >= %.100f'
+                                 % (symbols[goods[i]], quantities[i], quantity[i]))
+        quantities = np.minimum(quantities, quantity)
+        money = quantities * price
+        paid = np.bincount(np.where(sell, currencies, goods), weights=np.where(sell, money, quantities),
+                           minlength=len(symbols))
+        received = np.bincount(np.where(sell, goods, currencies), weights=np.where(sell, quantities, money),
+                               minlength=len(symbols))
+        for symbol in np.flatnonzero(paid):
+            available = self._inventory[symbols[symbol]]
+            if paid[symbol] > available + epsilon + epsilon * max(paid[symbol], available):
+                raise NotEnoughGoods(self.name, symbols[symbol], paid[symbol] - available)
+
+        change = {}
+        haves = self._inventory.haves
+        for symbol in np.flatnonzero((paid != 0) | (received != 0)):
+            delta = float(received[symbol] - paid[symbol])
+            haves[symbols[symbol]] += delta
+            change[symbols[symbol]] = delta
+
+        accepted = np.flatnonzero(quantities > 0)
+        final_quantities = quantities[accepted].tolist()
+        polled = self._polled_offers
+        book = self._offer_book
+        if book is None:
+            offers = [items[i] for i in accepted.tolist()]
+            ids = [offer.id for offer in offers]
+            senders = [offer.sender for offer in offers]
+            for offer, final_quantity in zip(offers, final_quantities):
+                offer.final_quantity = final_quantity
         else:
-            return {offer.good: quantity, offer.currency: - money_amount}
+            rows = np.array(items, dtype=np.intp)[accepted]
+            book.column('final_quantity')[rows] = quantities[accepted]
+            rows = rows.tolist()
+            ids = [book.id[row] for row in rows]
+            senders = [book.sender[row] for row in rows]
+            for row in rows:
+                book.release(row)
+        self._send_many(senders, 'abcEconomics_receive_accept', zip(ids, final_quantities))
+        for offer_id in ids:
+            del polled[offer_id]
+        return change
 
     def _reject_polled_but_not_accepted_offers(self):
-        for offer in self._polled_offers.values():
-            self._reject(offer)
+        book = self._offer_book
+        if book is None:
+            for offer in self._polled_offers.values():
+                self._reject(offer)
+        elif self._polled_offers:
+            rows = list(self._polled_offers.values())
+            self._send_many([book.sender[row] for row in rows], 'abcEconomics_receive_reject',
+                            [book.id[row] for row in rows])
+            for row in rows:
+                book.release(row)
         self._polled_offers = {}
 
     def _reject(self, offer):
@@ -664,17 +926,31 @@ class Trader:
         received, remaining good or money is added back to haves and the offer
         is deleted
         """
-        offer = self.given_offers[offer_id_final_quantity[0]]
-        offer.final_quantity = offer_id_final_quantity[1]
-        if offer.sell:
-            self._inventory.commit(offer.good, offer.quantity, offer.final_quantity)
-            self._inventory.haves[offer.currency] += offer.final_quantity * offer.price
+        offer_id, final_quantity = offer_id_final_quantity
+        offer = self.given_offers.pop(offer_id)
+        book = self._offer_book
+        if book is None:
+            good, currency, quantity, price = offer.good, offer.currency, offer.quantity, offer.price
+            sell = offer.sell
+        else:
+            row = book.row_of(offer)
+            good, currency = book.symbols[book.good[row]], book.symbols[book.currency[row]]
+            quantity, price, sell = book.quantity[row], book.price[row], book.sell[row]
+        if sell:
+            self._inventory.commit(good, quantity, final_quantity)
+            self._inventory.haves[currency] += final_quantity * price
         else:
-            self._inventory.haves[offer.good] += offer.final_quantity
-            self._inventory.commit(offer.currency, offer.quantity * offer.price, offer.final_quantity * offer.price)
-        offer.status = "accepted"
-        offer.status_round = self.time
-        del self.given_offers[offer.id]
+            self._inventory.haves[good] += final_quantity
+            self._inventory.commit(currency, quantity * price, final_quantity * price)
+        if book is None:
+            offer.final_quantity = final_quantity
+            offer.status = "accepted"
+            offer.status_round = self.time
+        else:
+            book.final_quantity[row] = final_quantity
+            book.status[row] = book.ACCEPTED
+            book.status_round[row] = self.time
+            book.release(row)
         return offer
 
     def _log_receive_accept_group(self, offer):
@@ -698,22 +974,180 @@ class Trader:
         or at the end of the subround when agent retracted the offer
 
         """
-        offer = self.given_offers[offer_id]
-        if offer.sell:
-            self._inventory.rewind(offer.good, offer.quantity)
+        offer = self.given_offers.pop(offer_id)
+        row = self._rewind_offer(offer)
+        if row is None:
+            offer.status = "rejected"
+            offer.status_round = self.time
+            offer.final_quantity = 0
         else:
-            self._inventory.rewind(offer.currency, offer.quantity * offer.price)
-        offer.status = "rejected"
-        offer.status_round = self.time
-        offer.final_quantity = 0
-        del self.given_offers[offer_id]
+            book = self._offer_book
+            book.status[row] = book.REJECTED
+            book.status_round[row] = self.time
+            book.final_quantity[row] = 0
+            book.release(row)
 
     def _delete_given_offer(self, offer_id):
-        offer = self.given_offers.pop(offer_id)
-        if offer.sell:
-            self._inventory.rewind(offer.good, offer.quantity)
+        row = self._rewind_offer(self.given_offers.pop(offer_id))
+        if row is not None:
+            self._offer_book.release(row)
+
+    def _rewind_offer(self, offer):
+        """ unblocks the goods or money of a given offer and returns its row
+        in the offer book """
+        book = self._offer_book
+        if book is None:
+            row = None
+            good, currency, quantity, price, sell = offer.good, offer.currency, offer.quantity, offer.price, offer.sell
+        else:
+            row = book.row_of(offer)
+            good, currency = book.symbols[book.good[row]], book.symbols[book.currency[row]]
+            quantity, price, sell = book.quantity[row], book.price[row], book.sell[row]
+        if sell:
+            self._inventory.rewind(good, quantity)
+        else:
+            self._inventory.rewind(currency, quantity * price)
+        return row
+
+    def _attach_offer_book(self, book):
+        """ moves the offers of the agent into the offer book of its process """
+        for offer in self.given_offers.values():
+            book.row_of(offer)
+        for offers in chain(self._open_offers_buy.values(), self._open_offers_sell.values(),
+                            [self._polled_offers]):
+            for offer_id, offer in offers.items():
+                offers[offer_id] = book.acquire(offer)
+        self._offer_book = book
+
+    def _detach_offer_book(self):
+        """ replaces the rows of the agent's offers by detached views, before
+        the agent leaves the process """
+        book = self._offer_book
+        for offer in self.given_offers.values():
+            book.release(book.row_of(offer))
+        for offers in chain(self._open_offers_buy.values(), self._open_offers_sell.values(),
+                            [self._polled_offers]):
+            for offer_id, row in offers.items():
+                offers[offer_id] = book.view(row)
+                book.release(row)
+        del self._offer_book
+
+    def limit_sell(self, market, good, quantity, price, currency='money', epsilon=epsilon):
+        """ submits a limit order to sell quantity of good for at least price to a
+        :class:`abcEconomics.Market`. The good is reserved until the order is filled
+        or cancelled. The market matches the orders, when its `match` action
+        is called. Filled quantities are credited at the beginning of the agent's
+        next action, the order can be partially filled.
+
+        Args:
+            market:
+                The name of the market a tuple (group, id). e.G. ('market', 0)
+
+            good:
+                name of the good
+
+            quantity:
+                maximum units to sell
+
+            price:
+                minimum price per unit
+
+            currency:
+                is the currency of this transaction (defaults to 'money')
+
+            epsilon (optional):
+                if you have floating point errors, a quantity or prices is
+                a fraction of number to high or low. You can increase the
+                floating point tolerance. See troubleshooting -- floating point problems
+
+        Returns:
+            An :class:`Order`, order.filled and order.status show its progress.
+
+        Example::
+
+            def subround_1(self):
+                self.order = self.limit_sell(('market', 0), 'bread', quantity=5, price=1.2)
+
+            def subround_3(self):
+                if self.order.status == 'open':
+                    self.cancel_order(self.order)
+        """
+        assert price > - epsilon, 'price %.30f is smaller than 0 - epsilon (%.30f)' % (price, - epsilon)
+        if price < 0:
+            price = 0
+        available = self._inventory[good]
+        assert quantity > - epsilon, 'quantity %.30f is smaller than 0 - epsilon (%.30f)' % (quantity, - epsilon)
+        if quantity < 0:
+            quantity = 0
+        if quantity > available + epsilon + epsilon * fmax(quantity, available):
+            raise NotEnoughGoods(self.name, good, quantity - available)
+        if quantity > available:
+            quantity = available
+        self._inventory.reserve(good, quantity)
+        return self._submit_order(market, good, quantity, price, currency, True)
+
+    def limit_buy(self, market, good, quantity, price, currency='money', epsilon=epsilon):
+        """ submits a limit order to buy quantity of good for at most price to a
+        :class:`abcEconomics.Market`. The money (quantity * price) is reserved
+        until the order is filled or cancelled. The agent pays the price of the
+        order he is matched with, which can be lower than price.
+        See :meth:`limit_sell`. """
+        assert price > - epsilon, 'price %.30f is smaller than 0 - epsilon (%.30f)' % (price, - epsilon)
+        if price < 0:
+            price = 0
+        assert quantity > - epsilon, 'quantity %.30f is smaller than 0 - epsilon (%.30f)' % (quantity, - epsilon)
+        if quantity < 0:
+            quantity = 0
+        money_amount = quantity * price
+        available = self._inventory[currency]
+        if money_amount > available + epsilon + epsilon * fmax(money_amount, available):
+            raise NotEnoughGoods(self.name, currency, money_amount - available)
+        if money_amount > available and price > 0:
+            quantity = available / price
+            money_amount = available
+        if money_amount > 0:
+            self._inventory.reserve(currency, money_amount)
+        return self._submit_order(market, good, quantity, price, currency, False)
+
+    def _submit_order(self, market, good, quantity, price, currency, sell):
+        order = Order(market, good, quantity, price, currency, sell, self._offer_counter(), self.time)
+        self._orders[order.id] = order
+        self.send(market, 'abcEconomics_order', (self.name, order.id, good, currency, sell, quantity, price))
+        return order
+
+    def cancel_order(self, order):
+        """ cancels the unfilled part of an order. The reserved goods or money
+        are released, when the market has confirmed the cancellation. """
+        self.send(order.market, 'abcEconomics_cancel_order', (self.name, order.id))
+
+    def _receive_fill(self, fill):
+        """ a market has matched quantity of an order at price """
+        order_id, quantity, price = fill
+        order = self._orders[order_id]
+        if order.sell:
+            self._inventory.commit(order.good, quantity, quantity)
+            self._inventory.haves[order.currency] += quantity * price
+        else:
+            self._inventory.commit(order.currency, quantity * order.price, quantity * price)
+            self._inventory.haves[order.good] += quantity
+        order.filled += quantity
+        remaining = order.quantity - order.filled
+        if remaining <= epsilon:
+            if order.sell:
+                self._inventory.rewind(order.good, remaining)
+            else:
+                self._inventory.rewind(order.currency, remaining * order.price)
+            order.status = 'filled'
+            del self._orders[order_id]
+
+    def _receive_order_cancelled(self, cancellation):
+        order_id, remaining = cancellation
+        order = self._orders.pop(order_id)
+        if order.sell:
+            self._inventory.rewind(order.good, remaining)
         else:
-            self._inventory.rewind(offer.currency, offer.quantity * offer.price)
+            self._inventory.rewind(order.currency, remaining * order.price)
+        order.status = 'cancelled'
 
     def give(self, receiver, good, quantity, epsilon=epsilon):
         """ gives a good to another agent
@@ -3,23 +3,31 @@
 from __future__ import print_function
 from builtins import str
 from builtins import object
+from collections import defaultdict, deque
 from abcEconomics.notenoughgoods import NotEnoughGoods
 from random import shuffle
-from abcEconomics.trader import get_epsilon
+from abcEconomics.agents.trader import get_epsilon
 from .contracts import Contracts
 
 
 epsilon = get_epsilon()
 
+HISTORY = 2
+""" the number of rounds in Contract.delivered and Contract.paid, the
+contract's methods only look at this and the last round """
+
 
 class Contract(object):
+    """ A contract, delivered and paid are the last :data:`HISTORY` rounds
+    in which the good was delivered and paid. Contracts are pickled as a
+    tuple of their fields. """
     __slots__ = ['sender_group', 'sender_id', 'deliver_good_group',
                  'deliver_good_id', 'pay_group', 'pay_id', 'good', 'quantity',
                  'price', 'end_date', 'delivered', 'paid', 'id', 'round']
 
     def __init__(self, sender_group, sender_id, deliver_good_group,
                  deliver_good_id, pay_group, pay_id, good, quantity, price,
-                 end_date, id, round):
+                 end_date, id, round, delivered=(), paid=()):
         self.sender_group = sender_group
         self.sender_id = sender_id
         self.deliver_good_group = deliver_good_group
@@ -30,11 +38,17 @@ class Contract(object):
         self.quantity = quantity
         self.price = price
         self.end_date = end_date
-        self.delivered = []
-        self.paid = []
+        self.delivered = deque(delivered, maxlen=HISTORY)
+        self.paid = deque(paid, maxlen=HISTORY)
         self.id = id
         self.round = round
 
+    def __reduce__(self):
+        return (Contract, (self.sender_group, self.sender_id, self.deliver_good_group,
+                           self.deliver_good_id, self.pay_group, self.pay_id, self.good,
+                           self.quantity, self.price, self.end_date, self.id, self.round,
+                           tuple(self.delivered), tuple(self.paid)))
+
     def __str__(self):
         return str(('sender', self.sender_group, self.sender_id, 'deliver', self.deliver_good_group,
                     self.deliver_good_id, self.pay_group, self.pay_id, self.good, self.quantity, self.price,
@@ -54,7 +68,7 @@ class Contracting(object):
 
         class Firm(abcEconomics.Agent, abcEconomics.Contract)
             def request_offer(self):
-                if self.round % 10 == 0:
+                if self.time % 10 == 0:
                     self.given_contract = self.request_contract('contractbuyer', 0,
                                                                 good='labor',
                                                                 quantity=5,
@@ -113,7 +127,39 @@ class Contracting(object):
 
     """
     def _add_contracts_list(self):
-        self.contracts = Contracts(self.name)
+        """ must be called in init, sets up the contract books and adds the
+        contract topics to the agent's message clearing """
+        self.contracts = Contracts()
+        self._contracts_pay = defaultdict(dict)
+        self._contracts_deliver = defaultdict(dict)
+        self._contract_offers = defaultdict(list)
+        self._contract_offers_made = {}
+        self._clearing = dict(self._clearing, **_contract_clearing)
+
+    def _send(self, receiver_group, receiver_id, topic, msg):
+        self.send((receiver_group, receiver_id), topic, msg)
+
+    def _clear_contract_offer(self, messages):
+        for contract in messages:
+            self._contract_offers[contract.good].append(contract)
+
+    def _clear_accept_contract(self, messages):
+        for contract in messages:
+            del self._contract_offers_made[contract.id]
+            if contract.pay_group == self.group and contract.pay_id == self.id:
+                self._contracts_pay[contract.good][contract.id] = contract
+            else:
+                self._contracts_deliver[contract.good][contract.id] = contract
+
+    def _clear_deliver_or_pay(self, messages):
+        haves = self._inventory.haves
+        for contract in messages:
+            if contract.pay_group == self.group and contract.pay_id == self.id:
+                haves[contract.good] += contract.quantity
+                self._contracts_pay[contract.good][contract.id].delivered.append(self.time)
+            else:
+                haves['money'] += contract.quantity * contract.price
+                self._contracts_deliver[contract.good][contract.id].paid.append(self.time)
 
     def offer_good_contract(self, receiver_group, receiver_id, good, quantity, price, duration):
         """This method offers a contract to provide a good or service to the
@@ -143,7 +189,7 @@ class Contracting(object):
         if duration is None:
             end_date = None
         else:
-            end_date = duration + self.round
+            end_date = duration + self.time
 
         offer = Contract(sender_group=self.group,
                          sender_id=self.id,
@@ -156,7 +202,7 @@ class Contracting(object):
                          price=price,
                          end_date=end_date,
                          id=self._offer_counter(),
-                         round=self.round)
+                         round=self.time)
         self._send(receiver_group, receiver_id, '!o', offer)
         self._contract_offers_made[offer.id] = offer
         return offer
@@ -186,7 +232,7 @@ class Contracting(object):
         if duration is None:
             end_date = None
         else:
-            end_date = duration + self.round
+            end_date = duration + self.time
 
         offer = Contract(sender_group=self.group,
                          sender_id=self.id,
@@ -199,7 +245,7 @@ class Contracting(object):
                          price=price,
                          end_date=end_date,
                          id=self._offer_counter(),
-                         round=self.round)
+                         round=self.time)
         self._send(receiver_group, receiver_id, '!o', offer)
         self._contract_offers_made[offer.id] = offer
         return offer
@@ -247,11 +293,11 @@ class Contracting(object):
                 quantity = contract.quantity
 
         if contract.pay_group == self.group and contract.pay_id == self.id:
-            self.contracts._contracts_pay[contract.good][contract.id] = contract
+            self._contracts_pay[contract.good][contract.id] = contract
             self._send(contract.sender_group,
                        contract.sender_id, '_ac', contract)
         else:
-            self.contracts._contracts_deliver[contract.good][contract.id] = contract
+            self._contracts_deliver[contract.good][contract.id] = contract
             self._send(contract.sender_group,
                        contract.sender_id, '_ac', contract)
         return contract
@@ -260,71 +306,71 @@ class Contracting(object):
         """ delivers on a contract """
         assert contract.deliver_good_group == self.group and contract.deliver_good_id == self.id
         quantity = contract.quantity
-        available = self._haves[contract.good]
+        available = self._inventory.haves[contract.good]
         if quantity > available + epsilon + epsilon * max(quantity, available):
             raise NotEnoughGoods(self.name, contract.good,
                                  quantity - available)
         if quantity > available:
             quantity = available
 
-        self._haves[contract.good] -= quantity
+        self._inventory.haves[contract.good] -= quantity
         self._send(contract.pay_group, contract.pay_id, '_dp', contract)
 
     def pay_contract(self, contract):
         """ delivers on a contract """
         assert contract.pay_group == self.group and contract.pay_id == self.id
         money = contract.quantity * contract.price
-        available = self._haves['money']
+        available = self._inventory.haves['money']
         if money > available + epsilon + epsilon * max(money, available):
             raise NotEnoughGoods(self.name, 'money', money - available)
         if money > available:
             money = available
 
-        self._haves['money'] -= money
+        self._inventory.haves['money'] -= money
         self._send(contract.deliver_good_group,
                    contract.deliver_good_id, '_dp', contract)
 
     def contracts_to_deliver(self, good):
-        return list(self.contracts._contracts_deliver[good].values())
+        return list(self._contracts_deliver[good].values())
 
     def contracts_to_receive(self, good):
-        return list(self.contracts._contracts_pay[good].values())
+        return list(self._contracts_pay[good].values())
 
     def contracts_to_deliver_all(self):
         ret = {}
-        for good in self.contracts._contracts_deliver:
-            ret[good] = list(self.contracts._contracts_deliver[good].values())
+        for good in self._contracts_deliver:
+            ret[good] = list(self._contracts_deliver[good].values())
         return ret
 
     def contracts_to_receive_all(self):
         ret = {}
-        for good in self.contracts._contracts_pay:
-            ret[good] = list(self.contracts._contracts_pay[good].values())
+        for good in self._contracts_pay:
+            ret[good] = list(self._contracts_pay[good].values())
         return ret
 
     def end_contract(self, contract):
-        if contract.id in self.contracts._contracts_deliver[contract.good]:
+        if contract.id in self._contracts_deliver[contract.good]:
             self._send(contract.pay_group, contract.pay_id,
                        '!d', ('r', contract.good, contract.id))
-            del self.contracts._contracts_deliver[contract.good][contract.id]
-        elif contract.id in self.contracts._contracts_pay[contract.good]:
+            del self._contracts_deliver[contract.good][contract.id]
+        elif contract.id in self._contracts_pay[contract.good]:
             self._send(contract.deliver_good_group, contract.deliver_good_id,
                        '!d', ('d', contract.good, contract.id))
-            del self.contracts._contracts_pay[contract.good][contract.id]
+            del self._contracts_pay[contract.good][contract.id]
         else:
             raise Exception("Contract not found")
 
     def was_paid_this_round(self, contract):
-        return contract.paid[-1] == self.round
+        return contract.paid[-1] == self.time
 
     def was_delivered_this_round(self, contract):
-        return contract.delivered[-1] == self.round
+        return contract.delivered[-1] == self.time
 
     def was_paid_last_round(self, contract):
-        return self.round - 1 in contract.paid
+        return self.time - 1 in contract.paid
 
     def was_delivered_last_round(self, contract):
-        return self.round - 1 in contract.delivered
+        return self.time - 1 in contract.delivered
 
     def calculate_netvalue(self, prices={},
                            parameters={},
@@ -361,6 +407,11 @@ class Contracting(object):
                                                            value_functions))
 
 
+_contract_clearing = {'!o': Contracting._clear_contract_offer,
+                      '_ac': Contracting._clear_accept_contract,
+                      '_dp': Contracting._clear_deliver_or_pay}
+
+
 def bound_zero(x):
     """ asserts that variable is above zero, where foating point imprecission is accounted for,
     and than makes sure it is above 0, without floating point imprecission """
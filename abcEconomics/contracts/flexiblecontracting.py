@@ -5,7 +5,7 @@ from builtins import str
 from builtins import object
 from abcEconomics.notenoughgoods import NotEnoughGoods
 from random import shuffle
-from abcEconomics.trader import get_epsilon
+from abcEconomics.agents.trader import get_epsilon
 from .contracts import Contracts
 from .contracting import Contract
 
@@ -47,7 +47,7 @@ class FlexibleContracting(object):
 
         class Firm(abcEconomics.Agent, abcEconomics.Contract)
             def request_offer(self):
-                if self.round % 10 == 0:
+                if self.time % 10 == 0:
                     self.given_contract = self.request_contract('contractbuyer', 0,
                                                                 good='labor',
                                                                 quantity=5,
@@ -144,7 +144,7 @@ class FlexibleContracting(object):
                        price=interest,
                        end_date=end_date,
                        id=self._offer_counter(),
-                       round=self.round)
+                       round=self.time)
         self._send(receiver_group, receiver_id, '!o', offer)
         self._contract_offers_made[offer.id] = offer
         return offer
@@ -174,7 +174,7 @@ class FlexibleContracting(object):
         if duration is None:
             end_date = None
         else:
-            end_date = duration + self.round
+            end_date = duration + self.time
 
         offer = Contract(sender_group=self.group,
                          sender_id=self.id,
@@ -187,7 +187,7 @@ class FlexibleContracting(object):
                          price=price,
                          end_date=end_date,
                          id=self._offer_counter(),
-                         round=self.round)
+                         round=self.time)
         self._send(receiver_group, receiver_id, '!o', offer)
         self._contract_offers_made[offer.id] = offer
         return offer
@@ -303,16 +303,16 @@ class FlexibleContracting(object):
             raise Exception("Contract not found")
 
     def was_paid_this_round(self, contract):
-        return contract.paid[-1] == self.round
+        return contract.paid[-1] == self.time
 
     def was_delivered_this_round(self, contract):
-        return contract.delivered[-1] == self.round
+        return contract.delivered[-1] == self.time
 
     def was_paid_last_round(self, contract):
-        return self.round - 1 in contract.paid
+        return self.time - 1 in contract.paid
 
     def was_delivered_last_round(self, contract):
-        return self.round - 1 in contract.delivered
+        return self.time - 1 in contract.delivered
 
     def calculate_netvalue(self, prices={},
                            parameters={},
@@ -1,82 +1,270 @@
-from collections import deque
+""" Expiring goods keep their quantity in age cohorts. The cohorts of all
+expiring goods with the same duration in a shard are rows of one
+:class:`CohortTable`, a ring buffer with a row per good and a column per
+age. Advancing a round moves the table's head, the column of the oldest
+cohort, by one and clears the cohorts, that expired. The total of every
+row is cached, so that reading an expiring good does not sum its cohorts.
+"""
+from array import array
 from abcEconomics.notenoughgoods import NotEnoughGoods
 from abcEconomics.agents.trader import get_epsilon
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 epsilon = get_epsilon()
 
 
+class CohortTable:
+    """ The cohorts of the expiring goods with the same duration. cohorts
+    is a flat :mod:`array` buffer in row-major order, in every row the
+    cohorts are ordered from old to new starting at column head. """
+    def __init__(self, duration):
+        self.duration = duration
+        self.head = 0
+        self.cohorts = array('d')
+        self.totals = array('d')
+        self.free = []
+
+    def add_row(self, time_structure=()):
+        """ returns a new row with the cohorts time_structure, ordered from
+        old to new """
+        duration = self.duration
+        if self.free:
+            row = self.free.pop()
+        else:
+            row = len(self.totals)
+            self.cohorts.frombytes(bytes(8 * duration))
+            self.totals.append(0.0)
+        if time_structure:
+            base = row * duration
+            head = self.head
+            cohorts = self.cohorts
+            for age, quantity in enumerate(time_structure):
+                cohorts[base + (head + age) % duration] = quantity
+            self.totals[row] = sum(time_structure)
+        return row
+
+    def remove_row(self, row):
+        """ returns the cohorts of row ordered from old to new and frees it """
+        time_structure = self.time_structure(row)
+        base = row * self.duration
+        self.cohorts[base:base + self.duration] = array('d', bytes(8 * self.duration))
+        self.totals[row] = 0.0
+        self.free.append(row)
+        return time_structure
+
+    def time_structure(self, row):
+        duration = self.duration
+        base = row * duration
+        cohorts = self.cohorts[base:base + duration]
+        return list(cohorts[self.head:] + cohorts[:self.head])
+
+    def add(self, row, quantity):
+        """ adds quantity to the newest cohort of row """
+        self.cohorts[row * self.duration + (self.head - 1) % self.duration] += quantity
+        self.totals[row] += quantity
+
+    def take(self, row, quantity):
+        """ takes quantity from the cohorts of row, the oldest first """
+        total = self.totals[row]
+        if quantity > total + epsilon:
+            raise NotEnoughGoods("AnAgent", "ExpiringGood", quantity - total)
+        duration = self.duration
+        base = row * duration
+        cohorts = self.cohorts
+        for age in range(duration):
+            i = base + (self.head + age) % duration
+            if quantity >= cohorts[i]:
+                quantity -= cohorts[i]
+                cohorts[i] = 0
+            else:
+                cohorts[i] -= quantity
+                break
+        self.totals[row] = sum(cohorts[base:base + duration])
+
+    def advance(self):
+        """ the oldest cohorts expire and their column becomes the column
+        of the new cohorts """
+        head = self.head
+        if np is not None:
+            cohorts = np.frombuffer(self.cohorts, dtype='d').reshape(-1, self.duration)
+            cohorts[:, head] = 0
+            np.frombuffer(self.totals, dtype='d')[:] = cohorts.sum(axis=1)
+            del cohorts
+        else:
+            duration = self.duration
+            cohorts, totals = self.cohorts, self.totals
+            for row, base in enumerate(range(0, len(cohorts), duration)):
+                if cohorts[base + head]:
+                    cohorts[base + head] = 0
+                    totals[row] = sum(cohorts[base:base + duration])
+        self.head = (head + 1) % self.duration
+
+    def add_rows(self, rows, quantities):
+        """ adds quantities to the newest cohorts of rows """
+        if np is None:
+            for row, quantity in zip(rows, quantities):
+                self.add(row, quantity)
+            return
+        duration = self.duration
+        cohorts = np.frombuffer(self.cohorts, dtype='d')
+        np.add.at(cohorts, rows * duration + (self.head - 1) % duration, quantities)
+        np.add.at(np.frombuffer(self.totals, dtype='d'), rows, quantities)
+
+    def consume(self, rows, quantities):
+        """ takes quantities from the cohorts of rows, the oldest first, for
+        all rows in one NumPy expression. rows and quantities are arrays,
+        without NumPy sequences. Nothing is taken, when a row has not
+        enough. """
+        if np is None:
+            totals = self.totals
+            for row, quantity in zip(rows, quantities):
+                if quantity > totals[row] + epsilon:
+                    raise NotEnoughGoods("AnAgent", "ExpiringGood", quantity - totals[row])
+            for row, quantity in zip(rows, quantities):
+                self.take(row, quantity)
+            return
+        duration = self.duration
+        cohorts = np.frombuffer(self.cohorts, dtype='d').reshape(-1, duration)
+        totals = np.frombuffer(self.totals, dtype='d')
+        columns = (self.head + np.arange(duration)) % duration
+        ordered = cohorts[rows[:, None], columns]
+        short = quantities > totals[rows] + epsilon
+        if short.any():
+            i = np.argmax(short)
+            raise NotEnoughGoods("AnAgent", "ExpiringGood", quantities[i] - totals[rows[i]])
+        before = np.cumsum(ordered, axis=1) - ordered
+        ordered -= np.clip(quantities[:, None] - before, 0, ordered)
+        cohorts[rows[:, None], columns] = ordered
+        totals[rows] = ordered.sum(axis=1)
+
+
 class ExpiringGood(object):
-    """ A good that expires after X rounds """
+    """ A good that expires after X rounds.
 
-    def __init__(self, duration):
+    An ExpiringGood behaves like the number of its total quantity. Adding
+    to it with += creates a new cohort, subtracting with -= takes from the
+    oldest cohorts first. Outside a shard it keeps its cohorts in a
+    :class:`CohortTable` of its own.
+    """
+    __slots__ = ('duration', '_table', '_row')
+
+    def __init__(self, duration, time_structure=()):
         self.duration = duration
-        self.time_structure = deque([0 for _ in range(duration)])  # old to new
+        self._table = CohortTable(duration)
+        self._row = self._table.add_row(time_structure)
+
+    def __reduce__(self):
+        return (ExpiringGood, (self.duration, self.time_structure))
+
+    @property
+    def time_structure(self):
+        """ the quantities of the cohorts from old to new """
+        return self._table.time_structure(self._row)
+
+    def _add_time_structure(self, time_structure):
+        table, row = self._table, self._row
+        for age, quantity in enumerate(time_structure):
+            table.cohorts[row * self.duration + (table.head + age) % self.duration] += quantity
+        table.totals[row] += sum(time_structure)
+
+    def _attach(self, tables):
+        """ moves the cohorts into the shard's CohortTable for the duration """
+        try:
+            table = tables[self.duration]
+        except KeyError:
+            table = tables[self.duration] = CohortTable(self.duration)
+        time_structure = self._table.remove_row(self._row)
+        self._table, self._row = table, table.add_row(time_structure)
+
+    def _detach(self):
+        """ moves the cohorts out of the shard into a CohortTable of their own """
+        time_structure = self._table.remove_row(self._row)
+        self._table = CohortTable(self.duration)
+        self._row = self._table.add_row(time_structure)
 
     def _advance_round(self):
-        del self.time_structure[0]
-        self.time_structure.append(0)
+        """ advances a detached good, the goods in a shard are advanced by
+        their CohortTable """
+        self._table.advance()
 
-    def __add__(self, other):
+    def __iadd__(self, other):
         if isinstance(other, ExpiringGood):
-            self.time_structure = [
-                s + o for s, o in zip(self.time_structure, other.time_structure)]
+            self._add_time_structure(other.time_structure)
         else:
-            self.time_structure[-1] += other
+            self._table.add(self._row, other)
+        return self
+
+    def __isub__(self, other):
+        self._table.take(self._row, float(other))
         return self
 
+    def __add__(self, other):
+        return self._table.totals[self._row] + other
+
     def __radd__(self, other):
-        return other + sum(self.time_structure)
+        return other + self._table.totals[self._row]
 
     def __sub__(self, other):
-        if isinstance(other, ExpiringGood):
-            other = float(other)
-        sum_time_structure = sum(self.time_structure)
-        if sum_time_structure < - epsilon:
-            raise NotEnoughGoods("AnAgent", "ExpiringGood", -sum_time_structure)
-        for i in range(len(self.time_structure)):
-            if other >= self.time_structure[i]:
-                other -= self.time_structure[i]
-                self.time_structure[i] = 0
-            else:
-                self.time_structure[i] -= other
-                break
-        return self
+        return self._table.totals[self._row] - other
 
     def __rsub__(self, other):
-        return other - sum(self.time_structure)
+        return other - self._table.totals[self._row]
 
     def __mul__(self, other):
-        return sum(self.time_structure) * other
+        return self._table.totals[self._row] * other
 
-    def __floordiv__(self, other):
-        return sum(self.time_structure) // other
+    __rmul__ = __mul__
 
-    def __div__(self, other):
-        return sum(self.time_structure) / other
+    def __truediv__(self, other):
+        return self._table.totals[self._row] / other
+
+    def __floordiv__(self, other):
+        return self._table.totals[self._row] // other
 
     def __mod__(self, other):
-        return sum(self.time_structure) % other
+        return self._table.totals[self._row] % other
 
     def __pow__(self, other):
-        return sum(self.time_structure) ** other
+        return self._table.totals[self._row] ** other
 
-    def __cmp__(self, other):
-        a = sum(self.time_structure)
-        return (a > other) - (a < other)
+    def __neg__(self):
+        return -self._table.totals[self._row]
 
-    def __int__(self):
-        return int(sum(self.time_structure))
+    def __lt__(self, other):
+        return self._table.totals[self._row] < other
+
+    def __le__(self, other):
+        return self._table.totals[self._row] <= other
+
+    def __gt__(self, other):
+        return self._table.totals[self._row] > other
+
+    def __ge__(self, other):
+        return self._table.totals[self._row] >= other
+
+    def __eq__(self, other):
+        return self._table.totals[self._row] == other
 
-    def __long__(self):
-        return int(sum(self.time_structure))
+    def __ne__(self, other):
+        return self._table.totals[self._row] != other
+
+    def __bool__(self):
+        return bool(self._table.totals[self._row])
+
+    __hash__ = None
+
+    def __int__(self):
+        return int(self._table.totals[self._row])
 
     def __float__(self):
-        return float(sum(self.time_structure))
+        return float(self._table.totals[self._row])
 
     def __repr__(self):
-        return str(sum(self.time_structure))
-
-    def __get__(self, instance, owner=None):
-        return sum(self.time_structure)
+        return str(self._table.totals[self._row])
 
     def __abs__(self):
-        return abs(self.__float__())
+        return abs(self._table.totals[self._row])
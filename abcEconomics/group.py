@@ -14,6 +14,7 @@
 #  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #  License for the specific language governing permissions and limitations under
 # the License.
+import weakref
 
 
 class Chain:
@@ -55,9 +56,9 @@ class Action:
         return Action(self._scheduler, self.actions + other.actions)
 
     def __call__(self, *args, **kwargs):
-        for names, command, _, __ in self.actions:
-            self._scheduler.do(names, command, args, kwargs)
-        return Chain([self._scheduler.post_messages(action[0]) for action in self.actions])
+        for group, command, _, __ in self.actions:
+            self._scheduler.do(group._gid, command, args, kwargs)
+        return Chain([self._scheduler.post_messages(action[0]._gid) for action in self.actions])
         # itertools.chain, does not work here
 
 
@@ -96,6 +97,10 @@ class Group:
 
         (banks[6,4] + hedgefunds[7,9]).buy_stocks()
 
+    Combined groups and subgroups are views on the groups they are made of. They are
+    cheap to create and follow the agents that are created in or deleted from the
+    original groups.
+
 
     agents actions can also be combined::
 
@@ -109,14 +114,23 @@ class Group:
 
     """
 
-    def __init__(self, sim, scheduler, names, agent_arguments=None):
+    def __init__(self, sim, scheduler, names, agent_arguments=None, parents=None, placement='round_robin',
+                 gid=None):
         self.sim = sim
+        self._placement = placement
         self.num_managers = sim.processes
         self._scheduler = scheduler
-        if names is None:
-            self.names = set()
+        self._parents = parents
+        if parents is None:
+            self._names = set() if names is None else set(names)
+            self._gid = scheduler.register_group(self._names) if gid is None else gid
         else:
-            self.names = names
+            self._names = None if names is None else frozenset(names)
+            self._gid = scheduler.register_view([parent._gid for parent in parents],
+                                                None if names is None else tuple(names))
+            weakref.finalize(self, scheduler.unregister_group, self._gid)
+        self._changes = 0
+        self._names_cache = (None, None)
         self._agent_arguments = agent_arguments
         self.panel_serial = 0
         self.last_action = "Begin_of_Simulation"
@@ -124,8 +138,36 @@ class Group:
         if agent_arguments is not None:
             self.agent_name_prefix = agent_arguments['group']
 
+    @property
+    def names(self):
+        """ The set of the names of the agents in this group """
+        if self._parents is None:
+            return self._names
+        changes, names = self._names_cache
+        if changes != self._count_changes():
+            names = set().union(*(parent.names for parent in self._parents))
+            if self._names is not None:
+                names &= self._names
+            names = frozenset(names)
+            self._names_cache = (self._count_changes(), names)
+        return names
+
+    def _count_changes(self):
+        # the number of agents created in or deleted from the original
+        # groups, a view's cached names are stale, when it changed
+        if self._parents is None:
+            return self._changes
+        return sum(parent._count_changes() for parent in self._parents)
+
+    def __contains__(self, name):
+        if self._parents is None:
+            return name in self._names
+        if self._names is not None and name not in self._names:
+            return False
+        return any(name in parent for parent in self._parents)
+
     def __add__(self, other):
-        return Group(self.sim, self._scheduler, self.names.union(other.names))
+        return Group(self.sim, self._scheduler, None, parents=[self, other])
 
     def __radd__(self, g):
         if isinstance(g, Group):
@@ -133,6 +175,57 @@ class Group:
         else:
             return self
 
+    def total(self, good):
+        """ returns the sum of a good over all agents of the group. With
+        :class:`Simulation(compact_inventory=True) <abcEconomics.Simulation>`
+        this is a vectorised sum over the inventory table of each process.
+
+        Example::
+
+            money_supply = (firms + households).total('money')
+        """
+        return self._scheduler.total(self._gid, good)
+
+    def produce_all(self, production_function, input_goods, results=False):
+        """ all firms of the group produce, like :meth:`Firm.produce
+        <abcEconomics.Firm.produce>`, but the production functions made with
+        create_cobb_douglas, create_ces and create_leontief are evaluated
+        for all firms of a process in one NumPy expression and the goods are
+        taken and added in bulk.
+
+        Args:
+            production_function:
+                a production function or the name of the attribute, in which
+                every firm keeps its own production function. With several
+                processes a production function must be picklable, which the
+                ones made with the create_* methods are.
+
+            input_goods:
+                a dictionary of the quantities of the inputs, that every
+                firm uses, or a list of goods, that get completely used.
+
+            results:
+                If True returns a list with a dictionary of the used and
+                produced goods for every firm.
+
+        Raises:
+            NotEnoughGoods:
+                when a firm has not enough goods, then no firm of its process
+                produced with a batch production function. The simulation
+                can go on after the exception is caught, also with several
+                processes.
+
+        Firms with other production functions produce one by one, as
+        without NumPy. Expiring inputs are taken from their oldest cohorts
+        in one vectorised step per duration, expiring outputs are added to
+        the newest cohorts.
+
+        Example::
+
+            firms.produce_all('production_function', ['labor', 'capital'])
+        """
+        return self._scheduler.produce_all(self._gid, production_function, input_goods, results)
+
     def panel_log(self, variables=[], goods=[], func={}, len=[]):
         """ panel_log(.) writes a panel of variables and goods
         of a group of agents into the database, so that it is displayed
@@ -162,7 +255,8 @@ class Group:
     def agg_log(self, variables=[], goods=[], func={}, len=[]):
         """ agg_log(.) writes a aggregate data of variables and goods
         of a group of agents into the database, so that it is displayed
-        in the gui.
+        in the gui. Every process aggregates the data of its agents and
+        sends only the number, mean and variance to the database.
 
         Args:
             goods (list, optional):
@@ -183,7 +277,7 @@ class Group:
                             variables=['production_target', 'gross_revenue'])
                 households.buying()
         """
-        self._do('_agg_log', variables, goods, func, len)
+        self._scheduler.agg_log(self._gid, variables, goods, func, len)
 
     def create_agents(self, Agent, number=1, agent_parameters=None, **common_parameters):
         """ Create new agents to this group. Works only for non-combined groups
@@ -206,19 +300,22 @@ class Group:
         if agent_parameters is None:
             agent_parameters = number
 
-        new_names = self._scheduler.add_agents(Agent, common_parameters, agent_parameters, self._agent_arguments, self.num_agents)
+        new_names = self._scheduler.add_agents(Agent, common_parameters, agent_parameters, self._agent_arguments,
+                                               self.num_agents, self._gid, self._placement)
         self.num_agents += len(new_names)
-        self.names.update(new_names)
+        self._names.update(new_names)
+        self._changes += 1
         return new_names
 
     def _do(self, command, *args, **kwargs):
         """ agent actions can be executed by :code:`group.action(args=args)`. """
         self.last_action = command
-        return self._scheduler.do(self.names, command, args, kwargs)
+        self._scheduler.do(self._gid, command, args, kwargs)
+        return self._scheduler.post_messages(self._gid)
 
     def __getattr__(self, command, *args, **kwargs):
         self.last_action = command
-        return Action(self._scheduler, [(self.names, command, args, kwargs)])
+        return Action(self._scheduler, [(self, command, args, kwargs)])
 
     def delete_agents(self, names):
         """ Remove an agents from a group, by specifying their id.
@@ -231,16 +328,28 @@ class Group:
 
             students.delete_agents([1, 5, 15])
         """
-        for name in names:
-            self.names.remove(name)
+        names = list(names)
+        self._forget(names)
         self._scheduler.delete_agents(names)
 
+    def _forget(self, names):
+        if self._parents is None:
+            for name in names:
+                self._names.remove(name)
+            self._changes += 1
+        else:
+            for name in names:
+                if name not in self:
+                    raise KeyError(name)
+            for parent in self._parents:
+                parent._forget([name for name in names if name in parent])
+
     def __getitem__(self, ids):
         try:
-            names = {(self.agent_name_prefix, id) for id in ids}
+            names = [(self.agent_name_prefix, id) for id in ids]
         except TypeError:
-            names = {(self.agent_name_prefix, ids)}
-        return Group(self.sim, self._scheduler, names, self._agent_arguments)
+            names = [(self.agent_name_prefix, ids)]
+        return self.by_names(names)
 
     def by_names(self, names):
         """ Return a callable group of agents from a list of names.group
@@ -248,13 +357,15 @@ class Group:
         Example::
 
             banks.by_names(['UBS', 'RBS', "DKB"]).give_loans() """
-        names = set(names)
-        return Group(self.sim, self._scheduler, names, self._agent_arguments)
+        names = list(names)
+        for name in names:
+            if name not in self:
+                raise KeyError(name)
+        return Group(self.sim, self._scheduler, names, self._agent_arguments, parents=[self])
 
     def by_name(self, name):
         """ Return a group of a single agents by its name """
-        names = {name}
-        return Group(self.sim, self._scheduler, names, self._agent_arguments)
+        return self.by_names([name])
 
     def __len__(self):
         """ Returns the length of a group """
@@ -1,8 +1,15 @@
 from abcEconomics.agents.trader import get_epsilon
+from array import array
 from collections import defaultdict
+from collections.abc import MutableMapping
 from abcEconomics.notenoughgoods import NotEnoughGoods
 from .expiringgood import ExpiringGood
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 epsilon = get_epsilon()
 
 
@@ -18,6 +25,8 @@ class Inventory(object):
         self.name = name
         self._expiring_goods = []
         self._perishable = []
+        self._cohorts = None
+        self._perishing = None
 
     def create(self, good, quantity):
         """ creates quantity of the good out of nothing
@@ -56,10 +65,11 @@ class Inventory(object):
             quantity:
                 an arry or number
         """
-        length = len(self.haves[good].time_structure)
-        for i in range(length):
-            qty = quantity[i] if type(quantity) == list else quantity / length
-            self.haves[good].time_structure[i] += qty
+        expiring_good = self.haves[good]
+        length = expiring_good.duration
+        if type(quantity) != list:
+            quantity = [quantity / length] * length
+        expiring_good._add_time_structure(quantity)
 
     def destroy(self, good, quantity=None):
         """ destroys quantity of the good. If quantity is omitted destroys all
@@ -87,13 +97,14 @@ class Inventory(object):
             self.haves[good] -= quantity
 
     def reserve(self, good, quantity):
-        self._reserved[good] += quantity
-        if self._reserved[good] > self.haves[good]:
-            if isclose(self._reserved[good], self.haves[good]):
-                self._reserved[good] = self.haves[good]
+        reserved = self._reserved[good] + quantity
+        available = self.haves[good]
+        if reserved > available:
+            if isclose(reserved, available):
+                reserved = available
             else:
-                self._reserved[good] -= quantity
-                raise NotEnoughGoods(self.name, good, quantity - (self.haves[good] - self._reserved[good]))
+                raise NotEnoughGoods(self.name, good, reserved - available)
+        self._reserved[good] = reserved
 
     def rewind(self, good, quantity):
         self._reserved[good] -= quantity
@@ -182,11 +193,14 @@ class Inventory(object):
         return ret
 
     def _advance_round(self):
-        # expiring goods
+        """ advances the goods of an inventory outside a shard, in a shard
+        the expiring goods are advanced by its CohortTables and the
+        perishable goods with :meth:`_perish` """
         for good in self._expiring_goods:
             self.haves[good]._advance_round()
+        self._perish()
 
-        # perishing goods
+    def _perish(self):
         for good in self._perishable:
             if good in self.haves:
                 self.destroy(good)
@@ -195,5 +209,238 @@ class Inventory(object):
         return self.haves[good]
 
     def _declare_expiring(self, good, duration):
-        self.haves[good] = ExpiringGood(duration)
+        expiring_good = ExpiringGood(duration)
+        if self._cohorts is not None:
+            expiring_good._attach(self._cohorts)
+        self.haves[good] = expiring_good
         self._expiring_goods.append(good)
+
+    def _declare_perishable(self, good):
+        """ the good is destroyed at the end of every round """
+        if good not in self._perishable:
+            self._perishable.append(good)
+        if self._perishing is not None:
+            self._perishing[self.name] = self
+
+    def _attach_shard(self, cohorts, perishing):
+        """ moves the expiring goods into the shard's
+        :class:`~abcEconomics.expiringgood.CohortTable` s, cohorts is a
+        dictionary of them by duration. An inventory with perishable goods
+        is entered in perishing. """
+        self._cohorts = cohorts
+        self._perishing = perishing
+        for good in self._expiring_goods:
+            self.haves[good]._attach(cohorts)
+        if self._perishable:
+            perishing[self.name] = self
+
+    def _detach_shard(self):
+        for good in self._expiring_goods:
+            self.haves[good]._detach()
+        if self._perishing is not None:
+            self._perishing.pop(self.name, None)
+        self._cohorts = None
+        self._perishing = None
+
+    def _attach(self, table, slot):
+        """ moves the goods into the row slot of an :class:`InventoryTable` """
+        self.haves, self._reserved = table.attach(slot, self.haves, self._reserved)
+
+    def _detach(self):
+        """ moves the goods out of the :class:`InventoryTable` back into dictionaries """
+        self.haves, self._reserved = self.haves._table.detach(self.haves)
+
+
+class InventoryTable:
+    """ The goods of all agents of a process in one table, a row per agent
+    slot and a column per good. Goods are interned to column numbers,
+    the goods passed at construction have the same column in every
+    process. It is switched on with
+    :class:`Simulation(compact_inventory=True) <abcEconomics.Simulation>`.
+
+    haves and reserved are flat :mod:`array` buffers in row-major order,
+    :meth:`matrix` exposes them as 2-D NumPy arrays without copying them.
+    The agents' :class:`Inventory` accesses its row through a :class:`_Row`,
+    that behaves like the defaultdict(int) it replaces. Expiring goods are
+    objects and stay in the row's own dictionary.
+    """
+    def __init__(self, goods=(), width=8):
+        self.ids = {}
+        self.goods = []
+        self.width = width
+        self.haves = array('d')
+        self.reserved = array('d')
+        self.rows = []
+        self.object_goods = set()
+        for good in goods:
+            self.intern(good)
+
+    def intern(self, good):
+        """ returns the column of a good, new goods get a new column """
+        try:
+            return self.ids[good]
+        except KeyError:
+            pass
+        gid = len(self.goods)
+        if gid == self.width:
+            self._widen(2 * self.width)
+        self.ids[good] = gid
+        self.goods.append(good)
+        return gid
+
+    def _widen(self, width):
+        old_width = self.width
+        for name in ('haves', 'reserved'):
+            old = getattr(self, name)
+            new = array('d', bytes(8 * width * len(self.rows)))
+            for slot in range(len(self.rows)):
+                new[slot * width:slot * width + old_width] = old[slot * old_width:(slot + 1) * old_width]
+            setattr(self, name, new)
+        self.width = width
+        for slot, rows in enumerate(self.rows):
+            if rows is not None:
+                haves, reserved = rows
+                haves._data, haves._base = self.haves, slot * width
+                reserved._data, reserved._base = self.reserved, slot * width
+
+    def attach(self, slot, haves, reserved):
+        """ returns the rows of slot, filled with the dictionaries of goods
+        haves and reserved """
+        missing = slot + 1 - len(self.rows)
+        if missing > 0:
+            self.rows.extend([None] * missing)
+            self.haves.frombytes(bytes(8 * self.width * missing))
+            self.reserved.frombytes(bytes(8 * self.width * missing))
+        base = slot * self.width
+        rows = (_Row(self, self.haves, base), _Row(self, self.reserved, base))
+        self.rows[slot] = rows
+        for row, goods in zip(rows, (haves, reserved)):
+            for good, quantity in goods.items():
+                row[good] = quantity
+        return rows
+
+    def detach(self, row):
+        """ clears the row of an agent and returns its goods as dictionaries """
+        slot = row._base // self.width
+        haves, reserved = self.rows[slot]
+        self.rows[slot] = None
+        ret = defaultdict(int, haves._items()), defaultdict(int, reserved._items())
+        for data in (self.haves, self.reserved):
+            data[slot * self.width:(slot + 1) * self.width] = array('d', bytes(8 * self.width))
+        return ret
+
+    def matrix(self, name='haves'):
+        """ returns haves or reserved as a 2-D NumPy array (slot, good), that
+        shares the memory with the table. The array must not be kept, while
+        new goods or agents are added. """
+        return np.frombuffer(getattr(self, name), dtype='d').reshape(-1, self.width)
+
+    def total(self, slots, good):
+        """ returns the sum of a good over the agents in slots """
+        if good in self.object_goods:
+            rows = self.rows
+            return sum(float(rows[slot][0][good]) for slot in slots)
+        gid = self.ids.get(good)
+        if gid is None or not slots:
+            return 0.0
+        if np is not None:
+            return float(self.matrix()[np.frombuffer(slots, dtype=slots.typecode), gid].sum())
+        data, width = self.haves, self.width
+        return sum(data[slot * width + gid] for slot in slots)
+
+
+class _Row(MutableMapping):
+    """ a row of an :class:`InventoryTable`, that behaves like a defaultdict(int)
+    of the goods of an agent. A missing good reads as 0, the row contains
+    the goods, that are not zero. """
+    __slots__ = ('_table', '_ids', '_data', '_base', '_objects')
+
+    def __init__(self, table, data, base):
+        self._table = table
+        self._ids = table.ids
+        self._data = data
+        self._base = base
+        self._objects = None
+
+    def __getitem__(self, good):
+        try:
+            return self._data[self._base + self._ids[good]]
+        except KeyError:
+            return 0
+
+    def __setitem__(self, good, quantity):
+        if type(quantity) is ExpiringGood:
+            self.__class__ = _ObjectRow
+            self._objects = {}
+            self[good] = quantity
+            return
+        try:
+            gid = self._ids[good]
+        except KeyError:
+            gid = self._table.intern(good)
+        self._data[self._base + gid] = quantity
+
+    def __delitem__(self, good):
+        if good not in self:
+            raise KeyError(good)
+        self._data[self._base + self._ids[good]] = 0
+
+    def __contains__(self, good):
+        gid = self._ids.get(good)
+        return gid is not None and self._data[self._base + gid] != 0
+
+    def get(self, good, default=None):
+        if good in self:
+            return self[good]
+        return default
+
+    def _items(self):
+        """ the goods, that are not zero and the expiring goods """
+        data, base = self._data, self._base
+        items = [(good, data[base + gid]) for good, gid in self._ids.items() if data[base + gid]]
+        if self._objects:
+            items.extend(self._objects.items())
+        return items
+
+    def __iter__(self):
+        return iter([good for good, _ in self._items()])
+
+    def __len__(self):
+        return len(self._items())
+
+    def __repr__(self):
+        return repr(dict(self._items()))
+
+    def __reduce__(self):
+        return (_rebuild_row, (self._items(),))
+
+
+class _ObjectRow(_Row):
+    """ a row of an agent with expiring goods, they are kept in a dictionary """
+    __slots__ = ()
+
+    def __getitem__(self, good):
+        try:
+            return self._objects[good]
+        except KeyError:
+            return _Row.__getitem__(self, good)
+
+    def __setitem__(self, good, quantity):
+        if good in self._objects or type(quantity) is ExpiringGood:
+            self._objects[good] = quantity
+            self._table.object_goods.add(good)
+        else:
+            _Row.__setitem__(self, good, quantity)
+
+    def __delitem__(self, good):
+        try:
+            del self._objects[good]
+        except KeyError:
+            _Row.__delitem__(self, good)
+
+    def __contains__(self, good):
+        return good in self._objects or _Row.__contains__(self, good)
+
+
+def _rebuild_row(items):
+    return defaultdict(int, items)
@@ -0,0 +1,195 @@
+# Copyright 2012 Davoud Taghawi-Nejad
+#
+# Module Author: Davoud Taghawi-Nejad
+#
+# abcEconomics is open-source software. If you are using abcEconomics for your research you
+# are requested the quote the use of this software.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License and quotation of the
+# author. You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+The logged data is kept in column buffers, one :class:`Table` per panel,
+aggregate and trade table. The schema of a table is inferred from its
+first row: integers and floats are kept in :mod:`array` buffers, all other
+values in lists. Columns that appear later are added and back-filled as
+missing, a column whose values do not fit its type is promoted (int ->
+float -> object).
+
+Every chunk_size rows the buffers are written to disk as one NumPy .npz
+file per chunk, in the directory columns/<table>/ of the simulation's
+result directory, so the memory of the database stays bounded. The chunks
+can be read with :func:`numpy.load`; without NumPy they are pickled.
+"""
+import os
+import pickle
+import re
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MISSING = float('nan')
+
+
+def _typecode(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return 'q'
+    if isinstance(value, float):
+        return 'd'
+    return None
+
+
+def _missing(typecode):
+    return MISSING if typecode == 'd' else None
+
+
+def _is_missing(value):
+    return value is None or (type(value) is float and value != value)
+
+
+class Table:
+    """ A table with column buffers, that are written to directory in chunks.
+    With directory None the table is kept in memory. """
+    chunk_size = 10000
+
+    def __init__(self, name, directory=None):
+        self.name = name
+        self.directory = directory
+        self.columns = {}
+        self.typecodes = {}
+        self.length = 0
+        self.chunks = []
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, row):
+        """ appends a row, a dictionary of column names and values """
+        columns = self.columns
+        length = self.length
+        for key, value in row.items():
+            try:
+                columns[key].append(value)
+            except KeyError:
+                self._add_column(key, value).append(value)
+            except (TypeError, OverflowError):
+                self._promote(key, value).append(value)
+        self.length = length = length + 1
+        if len(row) != len(columns):
+            for key, column in columns.items():
+                if len(column) < length:
+                    self._append_missing(key)
+        if length == self.chunk_size and self.directory is not None:
+            self.flush()
+
+    def _add_column(self, key, value):
+        typecode = _typecode(value)
+        if self.length and typecode == 'q':
+            typecode = 'd'
+        missing = [_missing(typecode)] * self.length
+        column = self.columns[key] = list(missing) if typecode is None else array(typecode, missing)
+        self.typecodes[key] = typecode
+        return column
+
+    def _promote(self, key, value):
+        """ int -> float -> object """
+        typecode = self.typecodes[key]
+        if typecode == 'q' and (value is None or _typecode(value) is not None):
+            column = array('d', self.columns[key])
+            self.typecodes[key] = 'd'
+        else:
+            column = [None if _is_missing(v) else v for v in self.columns[key]]
+            self.typecodes[key] = None
+        self.columns[key] = column
+        return column
+
+    def _append_missing(self, key):
+        column = self.columns[key]
+        if self.typecodes[key] == 'q':
+            column = self._promote(key, None)
+        column.append(_missing(self.typecodes[key]))
+
+    def flush(self):
+        """ writes the buffered rows to a new chunk file """
+        if not self.length:
+            return
+        path = os.path.join(self.directory, '%05i' % len(self.chunks))
+        if np is not None:
+            path += '.npz'
+            np.savez(path, **{key: self._to_numpy(key, column) for key, column in self.columns.items()})
+        else:
+            path += '.pickle'
+            with open(path, 'wb') as chunk:
+                pickle.dump(self.columns, chunk, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunks.append(path)
+        self.columns = {key: [] if typecode is None else array(typecode)
+                        for key, typecode in self.typecodes.items()}
+        self.length = 0
+
+    def _to_numpy(self, key, column):
+        if self.typecodes[key] is None:
+            if all(type(value) is str for value in column):
+                return np.array(column, dtype=str)
+            ret = np.empty(len(column), dtype=object)
+            ret[:] = column
+            return ret
+        return np.frombuffer(column, dtype=self.typecodes[key])
+
+    def read(self):
+        """ yields the chunks and the buffer as dictionaries of lists,
+        missing values are None """
+        for path in self.chunks:
+            if path.endswith('.npz'):
+                with np.load(path, allow_pickle=True) as chunk:
+                    columns = {key: chunk[key].tolist() for key in chunk.files}
+            else:
+                with open(path, 'rb') as chunk:
+                    columns = {key: list(column) for key, column in pickle.load(chunk).items()}
+            yield self._fill(columns)
+        yield self._fill({key: list(column) for key, column in self.columns.items()})
+
+    def _fill(self, columns):
+        length = max((len(column) for column in columns.values()), default=0)
+        for key in self.columns:
+            if key not in columns:
+                columns[key] = [None] * length
+            else:
+                columns[key] = [None if _is_missing(v) else v for v in columns[key]]
+        return columns
+
+    def rows(self):
+        """ yields the rows as dictionaries """
+        for columns in self.read():
+            keys = list(columns)
+            for values in zip(*(columns[key] for key in keys)):
+                yield dict(zip(keys, values))
+
+
+class ColumnStore:
+    """ The tables of a simulation, they are written to directory/columns """
+    def __init__(self, directory=None):
+        self.directory = None if directory is None else os.path.join(directory, 'columns')
+        self.tables = {}
+
+    def __getitem__(self, name):
+        try:
+            return self.tables[name]
+        except KeyError:
+            directory = (None if self.directory is None else
+                         os.path.join(self.directory, re.sub('[^0-9a-zA-Z_]', '', name)))
+            table = self.tables[name] = Table(name, directory)
+            return table
+
+    def __contains__(self, name):
+        return name in self.tables
@@ -20,20 +20,24 @@ import os
 import threading
 import multiprocessing
 import time
-from collections import defaultdict
-
-import dataset
+from collections import defaultdict, OrderedDict
 
+from .columnar import ColumnStore
 from .online_variance import OnlineVariance
-from .postprocess import to_csv
+from .postprocess import CsvExporter
 import queue
 
 
 class DbDatabase:
-    """Separate thread that receives data from in_sok and saves it into a
-    database"""
+    """Separate thread that receives data from in_sok and saves it into
+    column buffers, see :mod:`abcEconomics.logger.columnar`. The buffers are
+    written to the directory in chunks, while the simulation runs.
+
+    Every one of the shards of the scheduler sends 'round_end' at the end of
+    a round, when all shards have ended a round, its rows are appended to
+    the csv files, see :class:`~abcEconomics.logger.postprocess.CsvExporter`."""
 
-    def __init__(self, directory, name, in_sok, trade_log, plugin=None, pluginargs=[]):
+    def __init__(self, directory, name, in_sok, trade_log, plugin=None, pluginargs=[], shards=1):
         super().__init__()
 
         # setting up directory
@@ -61,8 +65,10 @@ class DbDatabase:
         self.data = {}
         self.trade_log = trade_log
 
-        self.aggregation = defaultdict(lambda: defaultdict(OnlineVariance))
-        self.round = 0
+        self.shards = shards
+        self.aggregation = OrderedDict()
+        self.ended = defaultdict(set)
+        self.busy = 0.0
 
         self.plugin = plugin
         self.pluginargs = pluginargs
@@ -70,20 +76,8 @@ class DbDatabase:
     def run(self):
         if self.plugin is not None:
             self.plugin = self.plugin(*self.pluginargs)
-        self.dataset_db = dataset.connect('sqlite://')
-        self.dataset_db.query('PRAGMA synchronous=OFF')
-        # self.dataset_db.query('PRAGMA journal_mode=OFF')
-        self.dataset_db.query('PRAGMA count_changes=OFF')
-        self.dataset_db.query('PRAGMA temp_store=OFF')
-        self.dataset_db.query('PRAGMA default_temp_store=OFF')
-        table_log = {}
-        current_log = defaultdict(list)
-        current_trade = []
-        self.table_aggregates = {}
-
-        if self.trade_log:
-            trade_table = self.dataset_db.create_table('trade___trade',
-                                                       primary_id='index')
+        self.tables = ColumnStore(self.directory)
+        self.exporter = CsvExporter(self.directory)
 
         while True:
             try:
@@ -92,82 +86,88 @@ class DbDatabase:
                 print("simulation.finalize() must be specified at the end of simulation")
                 msg = self.in_sok.get()
 
-            if msg[0] == 'snapshot_agg':
-                _, round, group, data_to_write = msg
-                if self.round == round:
-                    for key, value in data_to_write.items():
-                        self.aggregation[group][key].update(value)
-                else:
-                    self.make_aggregation_and_write()
-                    self.round = round
-                    for key, value in data_to_write.items():
-                        self.aggregation[group][key].update(value)
-
-            elif msg[0] == 'trade_log':
-                for (good, seller, buyer, price), quantity in msg[1].items():
-                    current_trade.append({'round': msg[2],
-                                          'good': good,
-                                          'seller': seller,
-                                          'buyer': buyer,
-                                          'price': price,
-                                          'quantity': quantity})
-                    if len(current_trade) == 1000:
-                        trade_table.insert_many(current_trade)
-                        current_trade = []
-
-            elif msg[0] == 'log':
-                _, group, name, round, data_to_write, subround_or_serial = msg
-                table_name = 'panel___%s___%s' % (group, subround_or_serial)
-                data_to_write['round'] = str(round)
-                data_to_write['name'] = str(name)
-                current_log[table_name].append(data_to_write)
-                if len(current_log[table_name]) == 1000:
-                    if table_name not in table_log:
-                        table_log[table_name] = self.dataset_db.create_table(
-                            table_name, primary_id='index')
-                    table_log[table_name].insert_many(current_log[table_name])
-                    current_log[table_name] = []
-
-            elif msg == "close":
+            if msg == "close":
                 break
+            start = time.perf_counter()
+            self._handle(msg)
+            self.busy += time.perf_counter() - start
 
-            else:
-                try:
-                    getattr(self.plugin, msg[0])(*msg[1], **msg[2])
-                except AttributeError:
-                    raise AttributeError(
-                        "abcEconomics_db error '%s' command unknown" % msg)
-
-        for name, data in current_log.items():
-            if name not in self.dataset_db:
-                table_log[name] = self.dataset_db.create_table(
-                    name, primary_id='index')
-            table_log[name].insert_many(data)
-        self.make_aggregation_and_write()
-        if self.trade_log:
-            trade_table.insert_many(current_trade)
-        self.dataset_db.commit()
+        for round in list(self.aggregation):
+            self.make_aggregation_and_write(round)
+        self.exporter.close()
         try:
             self.plugin.close()
         except AttributeError:
             pass
         if self.directory is not None:
-            to_csv(self.directory, self.dataset_db)
-
-    def make_aggregation_and_write(self):
-        for group, table in self.aggregation.items():
-            result = {'round': self.round}
+            for table in self.tables.tables.values():
+                table.flush()
+
+    def _handle(self, msg):
+        if msg[0] == 'batch':
+            for message in msg[1]:
+                self._handle(message)
+
+        elif msg[0] == 'snapshot_agg':
+            _, round, group, moments = msg
+            aggregation = self.aggregation.setdefault(round, defaultdict(lambda: defaultdict(OnlineVariance)))
+            for key, (n, mean, M2) in moments.items():
+                aggregation[group][key].merge(n, mean, M2)
+
+        elif msg[0] == 'round_end':
+            _, shard, round = msg
+            ended = self.ended[round]
+            ended.add(shard)
+            if len(ended) == self.shards:
+                del self.ended[round]
+                if round in self.aggregation:
+                    self.make_aggregation_and_write(round)
+                self.exporter.round_complete(round)
+
+        elif msg[0] == 'profile':
+            _, rows, round_row = msg
+            round_row['database_seconds'] = self.busy
+            self.busy = 0.0
+            self.exporter.append('profile.csv', rows, index=False)
+            self.exporter.append('profile_round.csv', [round_row], index=False)
+
+        elif msg[0] == 'trade_log':
+            trade_table = self.tables['trade___trade']
+            rows = [{'round': msg[2],
+                     'good': good,
+                     'seller': seller,
+                     'buyer': buyer,
+                     'price': price,
+                     'quantity': quantity}
+                    for (good, seller, buyer, price), quantity in msg[1].items()]
+            for row in rows:
+                trade_table.append(row)
+            self.exporter.append('trade___trade.csv', rows)
+
+        elif msg[0] == 'log':
+            _, group, name, round, data_to_write, subround_or_serial = msg
+            table_name = 'panel___%s___%s' % (group, subround_or_serial)
+            data_to_write['round'] = str(round)
+            data_to_write['name'] = str(name)
+            self.tables[table_name].append(data_to_write)
+            self.exporter.panel(group, data_to_write)
+
+        else:
+            try:
+                getattr(self.plugin, msg[0])(*msg[1], **msg[2])
+            except AttributeError:
+                raise AttributeError(
+                    "abcEconomics_db error '%s' command unknown" % msg)
+
+    def make_aggregation_and_write(self, round):
+        for group, table in self.aggregation.pop(round).items():
+            result = {'round': round}
             for key, data in table.items():
                 result[key + '_ttl'] = data.sum()
                 result[key + '_mean'] = data.mean()
                 result[key + '_std'] = data.std()
-            try:
-                self.table_aggregates[group].insert(result)
-            except KeyError:
-                self.table_aggregates[group] = self.dataset_db.create_table(
-                    'aggregate___%s' % group, primary_id='index')
-                self.table_aggregates[group].insert(result)
-            self.aggregation[group].clear()
+            self.tables['aggregate___%s' % group].append(result)
+            self.exporter.append('aggregate_%s.csv' % group, [dict(result)])
 
     def finalize(self, data):
         self.in_sok.put('close')
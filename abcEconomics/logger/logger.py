@@ -39,7 +39,35 @@ Messaging between agents:
 from collections import OrderedDict
 import re
 
-import abcEconomics
+
+_column_names = {}
+
+
+def _column_name(action_name, key):
+    """ the sanitized column name of a logged key, cached per (action_name, key) """
+    try:
+        return _column_names[action_name, key]
+    except KeyError:
+        name = re.sub('[^0-9a-zA-Z_]', '', '%s_%s' % (str(action_name), str(key)))
+        _column_names[action_name, key] = name
+        return name
+
+
+class LogBuffer(list):
+    """ collects the log messages of the agents of a process. The scheduler
+    replaces the agents' database_connection with its LogBuffer and sends
+    the messages to the database as one batch with :meth:`flush`, after
+    every action and round. """
+    put = list.append
+
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    def flush(self):
+        if self:
+            self.connection.put(['batch', list(self)])
+            self.clear()
 
 
 class Logger:
@@ -55,13 +83,6 @@ class Logger:
         self._data_to_log_1 = {}
         self._data_to_observe = {}
 
-        if hasattr(abcEconomics, 'conditional_logging'):
-            self.conditional_logging = True
-            self.log_rounds = abcEconomics.conditional_logging
-        else:
-            self.conditional_logging = False
-        self.log_this_round = True
-
         self.trade_logging = {'individual': 1,
                               'group': 2,
                               'off': 0}[trade_logging]
@@ -103,8 +124,7 @@ class Logger:
         """
         if self.log_this_round:
             try:
-                data_to_write = {re.sub('[^0-9a-zA-Z_]', '', '%s_%s' % (str(action_name), str(
-                    key))): data_to_log[key] for key in data_to_log}
+                data_to_write = {_column_name(action_name, key): data_to_log[key] for key in data_to_log}
             except TypeError:
                 data_to_write = {str(action_name): data_to_log}
 
@@ -128,17 +148,6 @@ class Logger:
             ret['len_' + length] = len(self.__dict__[length])
         return ret
 
-    def _agg_log(self, variables, possessions, functions, lengths):
-        if self.log_this_round:
-            data_to_write = self._common_log(variables,
-                                             possessions,
-                                             functions,
-                                             lengths)
-            self.database_connection.put(["snapshot_agg",
-                                          self._str_round,
-                                          self.group,
-                                          data_to_write])
-
     def _panel_log(self, variables, possessions, functions, lengths, serial):
         if self.log_this_round:
             data_to_write = self._common_log(variables,
@@ -5,6 +5,7 @@ cdef class OnlineVariance:
 
     cpdef clear(self)
     cpdef update(self, double x)
+    cpdef merge(self, long n, double mean, double M2)
     cpdef double std(self)
     cpdef double sum(self)
     cpdef double mean(self)
@@ -1,3 +1,21 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def moments(values):
+    """ returns the number, the mean and the sum of squared deviations (M2)
+    of values, the partial moments, that :meth:`OnlineVariance.merge` merges """
+    n = len(values)
+    if np is not None:
+        x = np.asarray(values, dtype=float)
+        mean = x.mean()
+        return n, float(mean), float(np.square(x - mean).sum())
+    mean = sum(values) / n
+    return n, mean, sum((value - mean) ** 2 for value in values)
+
+
 class OnlineVariance:
     def __init__(self):
         self.clear()
@@ -14,6 +32,16 @@ class OnlineVariance:
         delta2 = x - self._mean
         self.M2 += delta * delta2
 
+    def merge(self, n, mean, M2):
+        """ adds the partial moments of n values, see :func:`moments` """
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self._mean
+        self._mean += delta * n / total
+        self.M2 += M2 + delta * delta * self.n * n / total
+        self.n = total
+
     def std(self):
         if self.n < 2:
             return 0.0
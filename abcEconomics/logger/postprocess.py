@@ -1,99 +1,136 @@
 import os
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import csv
 
 
-def to_csv(directory, dataset):
-    os.chdir(directory)
-    tables = dataset.tables
-    panels = defaultdict(list)
-    aggs = defaultdict(list)
-    for table_name in tables:
-        typ = table_name.split('___')[0]
-        group = table_name.split('___')[1]
-        if typ == 'panel':
-            panels[group].append(table_name)
-        elif typ == 'aggregate':
-            aggs[group].append(table_name)
-        elif typ == 'trade':
-            print([ds for ds in dataset[table_name].all()][0])
-            save_to_csv('trade_', '_trade', dataset)
-
-    for group, tables in aggs.items():
-        join_table(tables, group, 'round', 'aggregate', dataset)
-
-    for group, tables in panels.items():
-        join_table(tables, group, 'name, round', 'panel', dataset)
-        create_aggregated_table(group, dataset)
-    dataset.commit()
-
-    for group in aggs:
-        save_to_csv('aggregate', group, dataset)
-
-    for group in panels:
-        save_to_csv('panel', group, dataset)
-        save_to_csv('aggregated', group, dataset)
-    os.chdir('../..')
-
-
-def create_aggregated_table(group, dataset):
-    columns = ', '.join('AVG(%s) %s_mean, SUM(%s) %s_ttl' % (c, c, c, c)
-                        for c in get_columns(dataset, 'panel_%s' % group))
-    try:
-        dataset.query("CREATE TABLE aggregated_%s AS "
-                      "SELECT round, %s FROM panel_%s GROUP BY round ORDER BY cast(round as float);"
-                      % (group, columns, group))
-    except Exception:
-        print('round not castable as float; default to unordered group by')
-        dataset.query("CREATE TABLE aggregated_%s AS "
-                      "SELECT round, %s FROM panel_%s GROUP BY round;"
-                      % (group, columns, group))
-    dataset.update_table('aggregated_%s' % group)
-
-
-def join_table(tables, group, indexes, type_, dataset):
-    for i, table_name in enumerate(tables):
-        if i == 0:
-            dataset.query("CREATE TEMPORARY TABLE temp0 AS "
-                          "SELECT * FROM %s;" % table_name)
-        else:
-            redundant_columns = (set(dataset[table_name].columns) &
-                                 set(dataset['temp%i' % (i - 1)].columns))
-            dataset.query("CREATE TEMPORARY TABLE temp%i AS "
-                          "SELECT temp%i.* %s "
-                          "FROM temp%i LEFT JOIN %s using(%s)"
-                          % (i, i - 1,
-                             get_str_columns(dataset, table_name,
-                                             redundant_columns),
-                             i - 1, table_name, indexes))
-            dataset.query("DROP TABLE temp%i;" % (i - 1))
-        dataset.query("DROP TABLE %s" % table_name)
-
-    dataset.query("CREATE TABLE %s_%s AS "
-                  "SELECT * FROM temp%i" % (type_, group, i))
-    dataset.update_table('panel_%s' % group)
-    dataset.query("DROP TABLE temp%i;" % i)
-
-
-def save_to_csv(prefix, group, dataset):
-    table = dataset['%s_%s' % (prefix, group)]
-    with open('%s_%s.csv' % (prefix, group), 'w') as outfile:
-        outdict = csv.DictWriter(outfile, fieldnames=table.columns)
-        outdict.writeheader()
-        for row in table:
-            outdict.writerow(row)
-
-
-def get_str_columns(dataset, table_name, redundant_columns):
-    ret = ', '.join([' %s ' % c
-                     for c in dataset[table_name].columns
-                     if c not in list(redundant_columns)])
-    if ret == '':
-        return ''
-    else:
-        return ', %s' % ret
-
-
-def get_columns(dataset, table_name):
-    return [c for c in dataset[table_name].columns
-            if c not in ('index', 'name', 'round')]
+class CsvExporter:
+    """ writes the csv files, while the simulation runs. The panel rows of
+    a group are joined on (name, round) and kept until the round is
+    completed, then they and the aggregated table (means and totals of the
+    round) are appended to panel_<group>.csv and aggregated_<group>.csv.
+    All files are flushed after every round, so they can be tailed. """
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.panels = defaultdict(OrderedDict)
+
+    def panel(self, group, row):
+        """ adds a row of a panel table, rows of the other panel tables of the
+        group with the same name and round are joined to it """
+        if self.directory is None:
+            return
+        rows = self.panels[group].setdefault(row['round'], OrderedDict())
+        try:
+            rows[row['name']].update(row)
+        except KeyError:
+            rows[row['name']] = row
+
+    def round_complete(self, round):
+        """ appends the joined panel rows of a round to the csv files """
+        for group, rounds in self.panels.items():
+            rows = rounds.pop(round, None)
+            if rows:
+                self.append('panel_%s.csv' % group, rows.values())
+                self.append('aggregated_%s.csv' % group, create_aggregated_table(rows.values()), index=False)
+        for csv_file in self.files.values():
+            csv_file.flush()
+
+    def append(self, filename, rows, index=True):
+        """ appends rows (dictionaries) to a csv file """
+        if self.directory is None:
+            return
+        try:
+            csv_file = self.files[filename]
+        except KeyError:
+            csv_file = self.files[filename] = CsvFile(os.path.join(self.directory, filename), index)
+        csv_file.write(rows)
+
+    def close(self):
+        """ writes the rounds, that are not completed and closes the files """
+        rounds = OrderedDict()
+        for group_rounds in self.panels.values():
+            rounds.update(dict.fromkeys(group_rounds))
+        for round in rounds:
+            self.round_complete(round)
+        for csv_file in self.files.values():
+            csv_file.close()
+
+
+class CsvFile:
+    """ a csv file, that rows are appended to, the columns are the union of
+    the rows' keys in the order of their first appearance. New columns are
+    added at the end, so the rows written before have a prefix of the
+    columns. The rows are appended without touching the written part of
+    the file; when the columns grew, the header is replaced in one
+    streaming pass, when the file is closed. Until then the rows written
+    after a new column are longer than the header. """
+    def __init__(self, path, index=True):
+        self.path = path
+        self.index = index
+        self.fieldnames = ['index'] if index else []
+        self.header = None
+        self.length = 0
+        self.file = None
+        self.writer = None
+
+    def write(self, rows):
+        rows = list(rows)
+        known = set(self.fieldnames)
+        for row in rows:
+            for key in row:
+                if key not in known:
+                    known.add(key)
+                    self.fieldnames.append(key)
+        if self.file is None:
+            self.file = open(self.path, 'w', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+            self.writer.writeheader()
+            self.header = len(self.fieldnames)
+        for row in rows:
+            if self.index:
+                self.length += 1
+                row['index'] = self.length
+            self.writer.writerow(row)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+        if self.header != len(self.fieldnames):
+            self._replace_header()
+
+    def _replace_header(self):
+        """ copies the rows row by row after a header with all columns, the
+        rows, that were written before a column was added, are padded """
+        width = len(self.fieldnames)
+        with open(self.path, newline='') as old, open(self.path + '.tmp', 'w', newline='') as new:
+            reader = csv.reader(old)
+            writer = csv.writer(new)
+            next(reader)
+            writer.writerow(self.fieldnames)
+            for row in reader:
+                writer.writerow(row + [''] * (width - len(row)))
+        os.replace(self.path + '.tmp', self.path)
+
+
+def create_aggregated_table(rows):
+    """ returns the mean and total of every column per round """
+    totals = OrderedDict()
+    counts = OrderedDict()
+    for row in rows:
+        total = totals.setdefault(row['round'], OrderedDict())
+        count = counts.setdefault(row['round'], defaultdict(int))
+        for column, value in row.items():
+            if column in ('index', 'name', 'round'):
+                continue
+            total.setdefault(column, None)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[column] = value if total[column] is None else total[column] + value
+                count[column] += 1
+    for round in totals:
+        ret = OrderedDict([('round', round)])
+        for column, total in totals[round].items():
+            ret[column + '_mean'] = None if total is None else total / counts[round][column]
+            ret[column + '_ttl'] = total
+        yield ret
@@ -0,0 +1,131 @@
+# Copyright 2012 Davoud Taghawi-Nejad
+#
+# Module Author: Davoud Taghawi-Nejad
+#
+# abcEconomics is open-source software. If you are using abcEconomics for your research you are
+# requested the quote the use of this software.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License and quotation of the
+# author. You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+"""
+The :class:`Market` is an agent, that keeps a central limit order book for
+anonymous markets. Instead of sending offers to every potential trading
+partner, agents submit limit orders to the market with
+:meth:`~abcEconomics.Trader.limit_buy` and
+:meth:`~abcEconomics.Trader.limit_sell`. The goods and money of an order are
+reserved in the agent's inventory, until the order is filled or cancelled.
+
+The market matches the orders, when its `match` action is called, usually once
+per subround. Orders are matched by price-time priority: the highest bid with
+the lowest ask, earlier orders first. A trade is executed at the price of the
+order that was submitted first. Orders that are not filled stay in the
+order book until they are cancelled with :meth:`~abcEconomics.Trader.cancel_order`.
+
+Example::
+
+    class Baker(abcEconomics.Agent):
+        def sell_bread(self):
+            self.order = self.limit_sell(('market', 0), 'bread', 10, price=1.5)
+
+    class Household(abcEconomics.Agent):
+        def buy_bread(self):
+            self.limit_buy(('market', 0), 'bread', 2, price=2)
+
+    market = simulation.build_agents(abcEconomics.Market, 'market', 1)
+
+    for r in range(100):
+        simulation.advance_round(r)
+        bakers.sell_bread()
+        households.buy_bread()
+        market.match()
+"""
+from heapq import heappush, heappop
+
+from .agent import Agent
+from .agents.trader import get_epsilon
+
+epsilon = get_epsilon()
+
+TRADER, ID, REMAINING, PRICE = range(4)
+
+
+class Market(Agent):
+    """ A central limit order book, one book per good and currency. Every
+    side of a book is a heap, so that matching n orders costs
+    O(n log n) instead of a message to every potential trading partner. """
+
+    def __init__(self, id, agent_parameters, simulation_parameters, name=None):
+        super().__init__(id, agent_parameters, simulation_parameters, name=name)
+        self._bids = {}
+        self._asks = {}
+        self._orders = {}
+        self._sequence = 0
+
+    def init(self):
+        pass
+
+    def match(self):
+        """ adds the orders and cancellations received since the last call
+        to the order books and matches them. Returns the number of trades. """
+        for trader, order_id, good, currency, sell, quantity, price in self.get_messages('abcEconomics_order'):
+            self._sequence += 1
+            order = [trader, order_id, quantity, price]
+            self._orders[trader, order_id] = order
+            if sell:
+                heappush(self._asks.setdefault((good, currency), []), (price, self._sequence, order))
+            else:
+                heappush(self._bids.setdefault((good, currency), []), (- price, self._sequence, order))
+
+        for trader, order_id in self.get_messages('abcEconomics_cancel_order'):
+            order = self._orders.pop((trader, order_id), None)
+            if order is not None:
+                self.send(trader, 'abcEconomics_order_cancelled', (order_id, order[REMAINING]))
+                order[REMAINING] = 0
+
+        trades = 0
+        for market, bids in self._bids.items():
+            asks = self._asks.get(market)
+            if asks:
+                trades += self._match(bids, asks)
+        return trades
+
+    def _match(self, bids, asks):
+        trades = 0
+        send = self.send
+        while bids and asks:
+            _, bid_sequence, bid = bids[0]
+            if bid[REMAINING] <= epsilon:
+                heappop(bids)
+                continue
+            _, ask_sequence, ask = asks[0]
+            if ask[REMAINING] <= epsilon:
+                heappop(asks)
+                continue
+            if bid[PRICE] < ask[PRICE]:
+                break
+            quantity = min(bid[REMAINING], ask[REMAINING])
+            price = bid[PRICE] if bid_sequence < ask_sequence else ask[PRICE]
+            send(bid[TRADER], 'abcEconomics_fill', (bid[ID], quantity, price))
+            send(ask[TRADER], 'abcEconomics_fill', (ask[ID], quantity, price))
+            for order in (bid, ask):
+                order[REMAINING] -= quantity
+                if order[REMAINING] <= epsilon:
+                    del self._orders[order[TRADER], order[ID]]
+            trades += 1
+        return trades
+
+    def order_book(self, good, currency='money'):
+        """ returns the open bids and asks of a good as lists of (price, quantity)
+        ordered by priority """
+        bids = [(- price, order[REMAINING]) for price, _, order in sorted(self._bids.get((good, currency), []))
+                if order[REMAINING] > epsilon]
+        asks = [(price, order[REMAINING]) for price, _, order in sorted(self._asks.get((good, currency), []))
+                if order[REMAINING] > epsilon]
+        return bids, asks
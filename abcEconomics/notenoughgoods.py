@@ -35,7 +35,7 @@ class NotEnoughGoods(Exception):
         self.good = good
         self.amount_missing = amount_missing
         self.name = _agent_name
-        Exception.__init__(self)
+        Exception.__init__(self, _agent_name, good, amount_missing)
 
     def __str__(self):
         return repr(str(self.name) + " " + str(self.amount_missing) + " of good '" + str(self.good) + "' missing")
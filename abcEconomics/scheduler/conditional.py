@@ -0,0 +1,143 @@
+""" Copyright 2012 Davoud Taghawi-Nejad
+
+ Module Author: Davoud Taghawi-Nejad
+
+ abcEconomics is open-source software. If you are using abcEconomics for your research you are
+ requested the quote the use of this software.
+
+ Licensed under the Apache License, Version 2.0 (the "License"); you may not
+ use this file except in compliance with the License and quotation of the
+ author. You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+ WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+ License for the specific language governing permissions and limitations under
+ the License.
+
+Conditional actions are only executed by the agents, that have work. In
+sparse models, where in every round only a few agents get messages, the
+time of such an action grows with the number of active agents instead of the
+number of agents in the group::
+
+    class Shop(abcEconomics.Agent):
+        @conditional(topics=['order'])
+        def handle_orders(self):
+            for order in self.get_messages('order'):
+                ...
+
+        @conditional(guard=lambda self: self['stock'] > 0)
+        def restock(self):
+            ...
+
+An action with topics runs only for the agents, that received a message
+with one of the topics since the action was last executed by them. The
+scheduler keeps the set of these agents from the messages it delivers, it
+does not look at the other agents. An action with a guard runs for the
+agents for which guard(agent) is True, the guard is evaluated after the
+agent received its messages. With topics and guard the guard is evaluated
+for the agents, that got messages.
+
+A conditional action returns the return values of the agents, that
+executed it.
+"""
+
+
+class Condition:
+    __slots__ = ['topics', 'guard']
+
+    def __init__(self, topics, guard):
+        self.topics = topics
+        self.guard = guard
+
+
+def conditional(topics=(), guard=None):
+    """ declares an agent's action as conditional, the action is only
+    executed by agents, that received messages on one of the topics or for
+    which guard(agent) is True.
+
+    Args:
+        topics:
+            a topic or a list of topics
+        guard:
+            a function, that gets the agent and returns whether it
+            executes the action
+    """
+    if isinstance(topics, str):
+        topics = (topics,)
+    topics = tuple(topics)
+    if not topics and guard is None:
+        raise ValueError('conditional needs topics or a guard')
+    condition = Condition(topics, guard)
+
+    def decorate(action):
+        action._abce_condition = condition
+        return action
+    return decorate
+
+
+def condition_of(Agent, command):
+    """ returns the Condition of the action command of the agent class or
+    None if it is unconditional """
+    return getattr(getattr(Agent, command, None), '_abce_condition', None)
+
+
+class ActiveSet:
+    """ The agents of one shard, that received messages on the topics of
+    conditional actions. Agents are identified by their slot. Every action
+    has its own set of woken agents, so that an action, that is executed,
+    does not take the wake-ups of other actions on the same topics. """
+    def __init__(self):
+        self.woken = {}
+        self.topics = {}
+        self.watchers = {}
+
+    def watch(self, action, topics, slots):
+        """ returns the set of agents, that got messages on topics since
+        action was last executed by them; when the action is new, the
+        agents are searched for unread messages """
+        try:
+            return self.woken[action]
+        except KeyError:
+            woken = self.woken[action] = {slot for slot, agent in enumerate(slots)
+                                          if agent is not None and
+                                          any(_has_messages(agent, topic) for topic in topics)}
+            self.topics[action] = topics
+            for topic in topics:
+                self.watchers.setdefault(topic, []).append(woken)
+            return woken
+
+    def arrivals(self, envelopes, slot_of):
+        """ records the receivers of a list of (receiver, (topic, message)) """
+        watchers = self.watchers
+        for receiver, (topic, _) in envelopes:
+            try:
+                woken_sets = watchers[topic]
+                slot = slot_of[receiver]
+            except KeyError:
+                continue
+            for woken in woken_sets:
+                woken.add(slot)
+
+    def admit(self, slot, agent):
+        """ records the unread messages of an agent, that joins the shard """
+        for action, woken in self.woken.items():
+            if any(_has_messages(agent, topic) for topic in self.topics[action]):
+                woken.add(slot)
+
+    def forget(self, slots):
+        for woken in self.woken.values():
+            woken.difference_update(slots)
+
+    def take(self, action, topics, slots, is_member):
+        """ returns the sorted slots of the members, that got messages on
+        topics since they last executed action, and removes them from the
+        action's set """
+        woken = self.watch((action, topics), topics, slots)
+        active = sorted(slot for slot in woken if is_member(slot))
+        woken.difference_update(active)
+        return active
+
+
+def _has_messages(agent, topic):
+    return bool(agent.inbox.get(topic)) or bool(agent._msgs.get(topic))
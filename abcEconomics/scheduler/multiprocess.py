@@ -14,156 +14,499 @@
  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
  License for the specific language governing permissions and limitations under
  the License.
+
+ The agents live in long-lived worker processes, one :class:`ProcessorGroup`
+ (shard) per process. The :class:`MultiProcess` scheduler drives them over a
+ pipe with a compact command protocol: a batch of (command, arguments) tuples
+ is sent to every worker and answered with the result of the last command.
+ Commands that need no answer (e.g. registering a group or executing an
+ action) are queued and travel with the next command that needs one, so that
+ a group action costs a single round trip. Messages between shards are
+ exchanged directly through shared memory ring buffers, see
+ :mod:`abcEconomics.scheduler.transport`.
 """
 # pylint: disable=W0212, C0111
 
 
 import re
+import pickle
+import shutil
+import tempfile
 import multiprocessing as mp
-from multiprocessing.managers import BaseManager
+from multiprocessing.connection import wait
 import traceback
 from collections import defaultdict, ChainMap
+from itertools import chain
+from time import perf_counter
 
 from .singleprocess import SingleProcess
-
-
-class MyManager(BaseManager):
-    pass
+from .placement import get_strategy, plan_migration
+from .transport import Transport, create_rings
+from ..notenoughgoods import NotEnoughGoods
 
 
 class ProcessorGroup(SingleProcess):
-    def __init__(self, batch, queues, processes):
-        self.agents = {}
+    def __init__(self, batch, queues, processes, rings=None, offer_book=False, compact_inventory=False,
+                 database=None, profile=False):
+        super().__init__(offer_book, compact_inventory, database, profile)
         self.batch = batch
-        self.queues = queues
-        self.queue = queues[self.batch]
+        self.transport = Transport(batch, queues, rings)
         self.processes = processes
-
-    def add_agents(self, Agent, simulation_parameters, agent_parameters, default_sim_params, maxid):
-        """appends an agent to a group """
-        if isinstance(agent_parameters, int):
-            agent_parameters = ({} for _ in range(agent_parameters))
-
+        self.post = [[] for _ in range(self.processes)]
+        self.directory = {}
+        self.traffic = None
+
+    def add_agents(self, Agent, simulation_parameters, agent_parameters, default_sim_params, gid, directory):
+        """ creates the agents, agent_parameters is a list of (id, parameters) of
+        the agents, that are placed on this shard, directory maps the names of all
+        new agents to their shard """
+        self.directory.update(directory)
         names = {}
         _sim_parameters = {**default_sim_params, **simulation_parameters}
         group = _sim_parameters['group']
-        for id, ap in enumerate(agent_parameters, maxid):
-            agent_name = ap.get('name', (group, id))
-            if hash(agent_name) % self.processes == self.batch:
-                agent = Agent(id, ap, _sim_parameters, name=agent_name)
-                agent.send = agent._send_multiprocessing
-                agent._out = defaultdict(list)
-                agent.init(**ChainMap(simulation_parameters, ap))
-                assert agent.name not in self.agents, ('Two agents with the same name %s' % str(agent.name))
-                agent._str_name = re.sub('[^0-9a-zA-Z_]', '', str(agent.name))
-                names[agent.name] = agent.name
-                agent._processes = self.processes
-                self.agents[agent.name] = agent
+        for id, ap in agent_parameters:
+            agent = Agent(id, ap, _sim_parameters, name=ap.get('name', (group, id)))
+            self._install(agent)
+            agent.init(**ChainMap(simulation_parameters, ap))
+            agent._str_name = re.sub('[^0-9a-zA-Z_]', '', str(agent.name))
+            names[agent.name] = agent.name
+            self._add_agent(agent, gid)
         return names
 
-    def do(self, names, command, args, kwargs):
+    def _install(self, agent, slot=None):
+        """ connects an agent to this shard """
+        super()._install(agent, slot)
+        agent.send = agent._send_multiprocessing
+        agent._send_many = agent._send_many_multiprocessing
+        agent._out = defaultdict(list)
+        agent._directory = self.directory
+        agent._processes = self.processes
+
+    def _uninstall(self, agent):
+        super()._uninstall(agent)
+        del agent.send
+        del agent._send_many
+        del agent._directory
+
+    def delete_agents(self, names):
+        super().delete_agents(names)
+        for name in names:
+            self.directory.pop(name, None)
+
+    def do(self, gid, command, args, kwargs):
+        slots = self.slots
+        rets = []
+        post = self.post
+        traffic = self.traffic
+        profiler = self.profiler
         try:
-            self.rets = []
-            self.post = [[] for _ in range(self.processes)]
-            for name in names:
-                if hash(name) % self.processes == self.batch:
-                    agent = self.agents[name]
-                    ret = agent._execute(command, args, kwargs)
-                    self.rets.append(ret)
-                    pst = agent._post_messages_multiprocessing(self.processes)
-                    for o in range(self.processes):
-                        self.post[o].extend(pst[o])
-        except Exception:
+            for slot in self._runnable(gid, command):
+                agent = slots[slot]
+                if profiler is None:
+                    rets.append(agent._execute(command, args, kwargs))
+                else:
+                    rets.append(profiler.execute(agent, command, args, kwargs))
+                for o, messages in agent._post_messages_multiprocessing(self.processes).items():
+                    post[o].extend(messages)
+                    if traffic is not None:
+                        for receiver, _ in messages:
+                            traffic[agent.name, receiver] += 1
+                    if profiler is not None:
+                        profiler.messages(messages)
+        finally:
+            # the post_messages of the batch runs also when an agent raised
+            self._rets.append(rets)
+
+    def post_messages(self, gid):
+        start = perf_counter()
+        post, self.post = self.post, [[] for _ in range(self.processes)]
+        for i in range(self.processes):
+            if i != self.batch:
+                size = self.transport.send(i, post[i])
+                if self.profiler is not None:
+                    self.profiler.frame(i, size)
+
+        self._deliver(post[self.batch])
+        for _ in range(self.processes - 1):
+            self._deliver(self.transport.receive())
+        self._flush_log()
+        if self.profiler is not None:
+            self.profiler.phase('post_messages', perf_counter() - start)
+        return self._rets.popleft()
+
+    def _deliver(self, envelopes):
+        agents = self.agents
+        if self._active.woken:
+            self._active.arrivals(envelopes, self._slot_of)
+        for receiver, (typ, msg) in envelopes:
+            try:
+                agents[receiver].inbox[typ].append(msg)
+            except KeyError:
+                print((typ, msg))
+                raise KeyError("Receiver %s does not exist" % str(receiver))
+
+    def _track_traffic(self):
+        if self.traffic is None:
+            self.traffic = defaultdict(int)
+
+    def collect_traffic(self, gids):
+        """ returns the number of messages sent between every pair of agents
+        since the last call and the names of the local agents of the groups gids """
+        edges = list(self.traffic.items())
+        self.traffic.clear()
+        migratable = [self.slots[slot].name
+                      for slot in chain.from_iterable(self.groups[gid] for gid in gids)]
+        return edges, migratable
+
+    def _emigrate(self, names):
+        """ removes the agents from this shard and returns them pickled """
+        ret = []
+        for name in names:
+            agent = self.agents[name]
+            gid = self._base_of[self._slot_of[name]]
+            self._uninstall(agent)
+            self._remove_agents([name])
+            ret.append((name, gid, pickle.dumps(agent, protocol=pickle.HIGHEST_PROTOCOL)))
+        return ret
+
+    def _immigrate(self, agents):
+        for _, gid, pickled_agent in agents:
+            agent = pickle.loads(pickled_agent)
+            self._install(agent)
+            self._add_agent(agent, gid)
+
+    def _update_directory(self, moves):
+        self.directory.update(moves)
+
+    def _state(self):
+        state = super()._state()
+        state['directory'] = self.directory
+        state['traffic'] = self.traffic
+        return state
+
+    def _set_state(self, state):
+        super()._set_state(state)
+        self.directory = state['directory']
+        self.traffic = state['traffic']
+
+
+def worker(batch, connection, queues, processes, rings, offer_book, compact_inventory, database, profile):
+    """ main loop of a worker process, executes the batches of commands it
+    receives on the connection on its :class:`ProcessorGroup`.
+
+    An exception in an agent's action ('do') is kept and the rest of the
+    batch is executed, so that the worker takes part in the following
+    post_messages of the other workers. The first exception is sent back
+    as 'raised' and the worker goes on, like NotEnoughGoods in the last
+    command of a batch. Other exceptions are sent back as 'error'. """
+    pg = ProcessorGroup(batch, queues, processes, rings, offer_book, compact_inventory, database, profile)
+    while True:
+        commands = connection.recv()
+        raised = None
+        try:
+            for i, (command, args) in enumerate(commands):
+                if command == 'close':
+                    pg.close()
+                    pg.transport.close()
+                    connection.send(('ok', None))
+                    return
+                try:
+                    ret = getattr(pg, command)(*args)
+                except Exception as e:
+                    if command != 'do':
+                        raise
+                    if raised is None:
+                        raised = e
+        except NotEnoughGoods as e:
+            if i == len(commands) - 1:
+                _send_raised(connection, e)
+            else:
+                traceback.print_exc()
+                connection.send(('error', e))
+        except Exception as e:
             traceback.print_exc()
-            raise
+            try:
+                connection.send(('error', e))
+            except Exception:
+                connection.send(('error', Exception(repr(e))))
+        else:
+            if raised is None:
+                connection.send(('ok', ret))
+            else:
+                _send_raised(connection, raised)
 
-    def post_messages(self, names):
-        for i in range(self.processes):
-            self.queues[i].put(self.post[i])
 
-        for i in range(self.processes):
-            for receiver, envelope in self.queue.get():
-                try:
-                    self.agents[receiver].inbox.append(envelope)
-                except KeyError:
-                    print(envelope)
-                    raise KeyError("Receiver %s does not exist" % str(name))
-        return self.rets
+def _send_raised(connection, exception):
+    try:
+        connection.send(('raised', exception))
+    except Exception:
+        connection.send(('raised', Exception(repr(exception))))
 
 
 class MultiProcess(object):
     """ This is a container for all agents. It exists only to allow for multiprocessing with MultiProcess.
+
+    The scheduler knows on which shard every agent lives. New agents are
+    placed with a placement strategy see :mod:`abcEconomics.scheduler.placement`.
     """
 
-    def __init__(self, processes):
-        manager = mp.Manager()
-        self.queues = [manager.Queue() for _ in range(processes)]
-        self.pool = mp.Pool(processes)
-        MyManager.register('ProcessorGroup', ProcessorGroup)
-        self.processor_groups = []
-        self.managers = []
-        for i in range(processes):
-            manager = MyManager()
-            manager.start()
-            self.managers.append(manager)
-            pg = manager.ProcessorGroup(i, self.queues, processes)
-            self.processor_groups.append(pg)
-
-    def add_agents(self, Agent, simulation_parameters, agent_parameters, agent_arguments, maxid):
+    def __init__(self, processes, offer_book=False, compact_inventory=False, database=None, profile=False):
+        self.processes = processes
+        self.offer_book = offer_book
+        self.compact_inventory = compact_inventory
+        self.profile_shards = profile
+        self._start_workers(database)
+        self._num_groups = 0
+        self._released = []
+        self.directory = {}
+        self.loads = [0] * processes
+        self._cost_of = {}
+        self._migratable = set()
+
+    def _start_workers(self, database):
+        processes = self.processes
+        queues = [mp.Queue() for _ in range(processes)]
+        self._rings = create_rings(processes)
+        self.connections = []
+        self.workers = []
+        for batch in range(processes):
+            connection, worker_connection = mp.Pipe()
+            process = mp.Process(target=worker,
+                                 args=(batch, worker_connection, queues, processes, self._rings, self.offer_book,
+                                       self.compact_inventory, database, self.profile_shards),
+                                 daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.workers.append(process)
+        self._pending = [[] for _ in range(processes)]
+
+    def _queue(self, command, *args):
+        """ queues a command for all workers, it is send with the next
+        :meth:`_call` """
+        for pending in self._pending:
+            pending.append((command, args))
+
+    def _queue_each(self, command, args):
+        """ queues a command for each worker with the worker's arguments
+        args[worker] """
+        for pending, worker_args in zip(self._pending, args):
+            pending.append((command, worker_args))
+
+    def _call(self, command, *args):
+        """ sends the queued commands and this command to all workers and
+        returns the list of the workers' results for this command """
+        self._queue(command, *args)
+        return self._flush()
+
+    def _call_each(self, command, args):
+        self._queue_each(command, args)
+        return self._flush()
+
+    def _flush(self):
+        for connection, commands in zip(self.connections, self._pending):
+            connection.send(commands)
+        self._pending = [[] for _ in range(self.processes)]
+        return self._gather()
+
+    def _gather(self):
+        """ returns the workers' results; an error terminates the workers,
+        a recoverable exception is raised after all workers answered """
+        results = {}
+        raised = None
+        waiting = list(self.connections)
+        while waiting:
+            for connection in wait(waiting):
+                status, ret = connection.recv()
+                if status == 'error':
+                    self.terminate()
+                    raise ret
+                if status == 'raised' and raised is None:
+                    raised = ret
+                results[connection] = ret
+                waiting.remove(connection)
+        if raised is not None:
+            raise raised
+        return [results[connection] for connection in self.connections]
+
+    def register_group(self, names):
+        gid = self._new_gid()
+        self._queue('_register_group', gid, tuple(names))
+        return gid
+
+    def register_view(self, parents, names=None):
+        gid = self._new_gid()
+        self._queue('_register_view', gid, parents, names)
+        return gid
+
+    def unregister_group(self, gid):
+        self._released.append(gid)
+
+    def _new_gid(self):
+        if self._released:
+            self._queue('_release_groups', self._released)
+            self._released = []
+        gid = self._num_groups
+        self._num_groups += 1
+        return gid
+
+    def add_agents(self, Agent, simulation_parameters, agent_parameters, agent_arguments, maxid, gid,
+                   placement='round_robin'):
         """appends an agent to a group """
-        names = self.pool.map(add_agents_wrapper, jkk(self.processor_groups,
-                                                      Agent,
-                                                      simulation_parameters,
-                                                      agent_parameters,
-                                                      agent_arguments,
-                                                      maxid))
-
+        if isinstance(agent_parameters, int):
+            agent_parameters = [{} for _ in range(agent_parameters)]
+        group = {**agent_arguments, **simulation_parameters}['group']
+        agents = list(enumerate(agent_parameters, maxid))
+        names = [ap.get('name', (group, id)) for id, ap in agents]
+        cost = getattr(Agent, 'placement_cost', 1)
+        shards = get_strategy(placement)(names, [cost] * len(names), list(self.loads))
+
+        directory = {}
+        per_shard = [[] for _ in range(self.processes)]
+        for name, shard, agent in zip(names, shards, agents):
+            assert name not in self.directory and name not in directory, (
+                'Two agents with the same name %s' % str(name))
+            directory[name] = shard
+            per_shard[shard].append(agent)
+            self.loads[shard] += cost
+            self._cost_of[name] = cost
+        self.directory.update(directory)
+
+        if placement == 'communication' and gid not in self._migratable:
+            self._migratable.add(gid)
+            self._queue('_track_traffic')
+
+        names = self._call_each('add_agents', [(Agent, simulation_parameters, shard_agents, agent_arguments, gid, directory)
+                                               for shard_agents in per_shard])
         return flatten(names)
 
     def delete_agents(self, names):
-        self.pool.map(delete_agents_wrapper, jkk(self.processor_groups, names))
-
-    def do(self, names, command, args, kwargs):
-        self.pool.map(wrapper, jkk(self.processor_groups, names, command, args, kwargs))
-
-    def post_messages(self, names):
-        return flatten(self.pool.map(post_messages, jkk(self.processor_groups, names)))
+        for name in names:
+            shard = self.directory.pop(name, None)
+            if shard is not None:
+                self.loads[shard] -= self._cost_of.pop(name)
+        self._queue('delete_agents', names)
+
+    def rebalance(self, slack=0.1):
+        """ moves the agents of groups that are placed with 'communication' to
+        the shard they exchange most messages with """
+        if not self._migratable:
+            return {}
+        edges = []
+        migratable = set()
+        for shard_edges, shard_migratable in self._call('collect_traffic', self._migratable):
+            edges.extend(shard_edges)
+            migratable.update(shard_migratable)
+        moves = plan_migration(edges, migratable, self.directory, self._cost_of.__getitem__,
+                               list(self.loads), slack)
+        self.migrate(moves)
+        return moves
+
+    def migrate(self, moves):
+        """ moves agents to other shards, moves is a dictionary {name: shard} """
+        moves = {name: shard for name, shard in moves.items() if self.directory[name] != shard}
+        if not moves:
+            return
+        emigrants = [[] for _ in range(self.processes)]
+        for name, shard in moves.items():
+            emigrants[self.directory[name]].append(name)
+        departed = self._call_each('_emigrate', [(names,) for names in emigrants])
+
+        immigrants = [[] for _ in range(self.processes)]
+        for agents in departed:
+            for agent in agents:
+                immigrants[moves[agent[0]]].append(agent)
+        for name, shard in moves.items():
+            cost = self._cost_of[name]
+            self.loads[self.directory[name]] -= cost
+            self.loads[shard] += cost
+        self.directory.update(moves)
+        self._queue_each('_immigrate', [(agents,) for agents in immigrants])
+        self._queue('_update_directory', moves)
+
+    def do(self, gid, command, args, kwargs):
+        self._queue('do', gid, command, args, kwargs)
+
+    def post_messages(self, gid):
+        return flatten(self._call('post_messages', gid))
+
+    def total(self, gid, good):
+        return sum(self._call('total', gid, good))
+
+    def produce_all(self, gid, production_function, input_goods, results):
+        rets = self._call('produce_all', gid, production_function, input_goods, results)
+        if results:
+            return list(chain.from_iterable(rets))
+
+    def agg_log(self, gid, variables, goods, functions, lengths):
+        self._queue('agg_log', gid, variables, goods, functions, lengths)
 
     def advance_round(self, time, str_time):
-        self.pool.map(advance_round_wrapper, jkk(self.processor_groups, time, str_time))
-
-    def group_names(self):
-        return self.processor_groups[0].group_names()
-
-
-def wrapper(args):
-    pg, names, command, args, kwargs = args
-    pg.do(names, command, args, kwargs)
-
+        self._queue('advance_round', time, str_time)
 
-def post_messages(args):
-    pg, names = args
-    return pg.post_messages(names)
+    def profile(self):
+        """ returns the profiles of the shards since the last call """
+        return flatten(self._call('profile'))
 
-
-def add_agents_wrapper(arg):
-    pg, Agent, simulation_parameters, agent_parameters, agent_arguments, maxid = arg
-    return pg.add_agents(Agent, simulation_parameters, agent_parameters, agent_arguments, maxid)
-
-
-def delete_agents_wrapper(arg):
-    pg, names = arg
-    pg.delete_agents(names)
-
-
-def advance_round_wrapper(arg):
-    pg, time, str_time = arg
-    pg.advance_round(time, str_time)
-
-
-def jkk(iterator, *args):
-    for i in iterator:
-        yield (i,) + args
+    def group_names(self):
+        return flatten(self._call('group_names'))
+
+    def checkpoint(self, directory):
+        """ every shard writes its agents to directory in parallel, returns
+        the state of the scheduler """
+        self._call('checkpoint', directory)
+        return {'num_groups': self._num_groups,
+                'directory': self.directory,
+                'loads': self.loads,
+                'cost_of': self._cost_of,
+                'migratable': self._migratable}
+
+    def restore(self, directory, state):
+        """ every shard reads its agents from directory in parallel """
+        self._call('restore', directory)
+        self._num_groups = state['num_groups']
+        self._released = []
+        self.directory = state['directory']
+        self.loads = state['loads']
+        self._cost_of = state['cost_of']
+        self._migratable = state['migratable']
+
+    def prepare_branch(self):
+        """ the workers can not be forked with the simulation, they write a
+        checkpoint, that the forked simulations restore """
+        directory = tempfile.mkdtemp()
+        return directory, self.checkpoint(directory)
+
+    def branch(self, database, state):
+        """ starts new workers for the copy of the scheduler in a forked
+        process, the workers of the original process are left alone """
+        self._start_workers(database)
+        self.restore(*state)
+
+    def release_branch(self, state):
+        shutil.rmtree(state[0])
+
+    def close(self):
+        if self.workers:
+            self._call('close')
+            for process in self.workers:
+                process.join()
+            self.workers = []
+            self._unlink_rings()
+
+    def terminate(self):
+        for process in self.workers:
+            process.terminate()
+        self.workers = []
+        self._unlink_rings()
+
+    def _unlink_rings(self):
+        if self._rings is not None:
+            for rings in self._rings:
+                for ring in rings:
+                    if ring is not None:
+                        ring.close()
+                        ring.unlink()
+            self._rings = None
 
 
 def flatten(l):
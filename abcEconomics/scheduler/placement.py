@@ -0,0 +1,135 @@
+""" Copyright 2012 Davoud Taghawi-Nejad
+
+ Module Author: Davoud Taghawi-Nejad
+
+ abcEconomics is open-source software. If you are using abcEconomics for your research you are
+ requested the quote the use of this software.
+
+ Licensed under the Apache License, Version 2.0 (the "License"); you may not
+ use this file except in compliance with the License and quotation of the
+ author. You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+ WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+ License for the specific language governing permissions and limitations under
+ the License.
+
+Placement strategies decide on which process (shard) an agent lives, when
+the simulation runs with several processes. A strategy is a function::
+
+    strategy(names, costs, loads) -> list of shards
+
+names is the list of the names of the new agents, costs the cost of each
+agent and loads the summed cost of the agents that are already on each shard.
+The cost of an agent is the class attribute :code:`placement_cost` of its
+agent class (default 1), so that heavy agent classes can be spread evenly.
+
+The strategies are selected in :meth:`abcEconomics.Simulation.build_agents`
+with placement='round_robin' (default), 'weighted', 'hash' or
+'communication' or by passing a function.
+"""
+import heapq
+import zlib
+from collections import defaultdict
+
+
+def round_robin(names, costs, loads):
+    """ places the agents in turn on each shard, starting with the least
+    loaded shard """
+    start = loads.index(min(loads))
+    return [(start + i) % len(loads) for i in range(len(names))]
+
+
+def weighted(names, costs, loads):
+    """ places every agent on the shard with the smallest load, agents are
+    placed in the order of decreasing cost """
+    heap = [(load, shard) for shard, load in enumerate(loads)]
+    heapq.heapify(heap)
+    shards = [None] * len(names)
+    for i in sorted(range(len(names)), key=lambda i: -costs[i]):
+        load, shard = heapq.heappop(heap)
+        shards[i] = shard
+        heapq.heappush(heap, (load + costs[i], shard))
+    return shards
+
+
+def hash_name(names, costs, loads):
+    """ places the agents according to a CRC32 of their name, unlike the
+    built-in hash() it does not change between runs """
+    return [zlib.crc32(repr(name).encode()) % len(loads) for name in names]
+
+
+strategies = {'round_robin': round_robin,
+              'weighted': weighted,
+              'hash': hash_name,
+              'communication': round_robin}
+
+
+def get_strategy(placement):
+    if callable(placement):
+        return placement
+    try:
+        return strategies[placement]
+    except KeyError:
+        raise ValueError("placement must be one of %s or a function, not %r"
+                         % (', '.join(strategies), placement))
+
+
+def plan_migration(edges, migratable, shard_of, cost_of, loads, slack=0.1):
+    """ returns a dictionary {name: shard} of agents that move to the
+    shard with which they exchange most messages.
+
+    The agents are visited in the order of the messages they would save by
+    moving. Every agent is moved to the shard of most of its messages, taking
+    into account the agents that have already moved.
+
+    Args:
+        edges:
+            list of ((sender, receiver), number of messages)
+        migratable:
+            set of the agents that can move
+        shard_of:
+            dictionary of the current shard of every agent
+        cost_of:
+            function that returns the cost of an agent
+        loads:
+            the current load of every shard, it is updated
+        slack:
+            a shard can be loaded at most (1 + slack) times the average load
+    """
+    neighbours = defaultdict(lambda: defaultdict(int))
+    for (sender, receiver), messages in edges:
+        if (sender != receiver and
+                (sender in migratable or receiver in migratable) and
+                sender in shard_of and receiver in shard_of):
+            neighbours[sender][receiver] += messages
+            neighbours[receiver][sender] += messages
+    shard = {name: shard_of[name] for name in neighbours}
+
+    def messages_per_shard(name):
+        messages = [0] * len(loads)
+        for neighbour, number in neighbours[name].items():
+            messages[shard[neighbour]] += number
+        return messages
+
+    def saving(name):
+        messages = messages_per_shard(name)
+        return max(messages) - messages[shard[name]]
+
+    capacity = (1 + slack) * sum(loads) / len(loads)
+    candidates = sorted((name for name in neighbours if name in migratable),
+                        key=saving, reverse=True)
+    moves = {}
+    for name in candidates:
+        messages = messages_per_shard(name)
+        current = shard[name]
+        target = max(range(len(messages)), key=messages.__getitem__)
+        if messages[target] > messages[current]:
+            cost = cost_of(name)
+            if loads[target] + cost <= capacity:
+                loads[target] += cost
+                loads[current] -= cost
+                shard[name] = target
+                moves[name] = target
+    return moves
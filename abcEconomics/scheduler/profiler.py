@@ -0,0 +1,131 @@
+""" Copyright 2012 Davoud Taghawi-Nejad
+
+ Module Author: Davoud Taghawi-Nejad
+
+ abcEconomics is open-source software. If you are using abcEconomics for your research you are
+ requested the quote the use of this software.
+
+ Licensed under the Apache License, Version 2.0 (the "License"); you may not
+ use this file except in compliance with the License and quotation of the
+ author. You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+ WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+ License for the specific language governing permissions and limitations under
+ the License.
+
+With :class:`Simulation(profile=True) <abcEconomics.Simulation>` every shard
+of the scheduler has a :class:`Profiler`. It records per round:
+
+- the wall time and the number of calls of every (group, action), only the
+  agents' own code is counted
+- the time of the scheduler's phases: 'execute' (the agents' actions),
+  'message_clearing' (processing the inbox before an action), 'reject'
+  (rejecting the offers, that were polled but not accepted),
+  'post_messages' (delivering the messages, with several processes this
+  includes waiting for the other processes) and 'advance_round'
+- the number of messages per topic
+- the number and the encoded size of the frames, that are sent to every
+  other process; a frame carries the messages of one post_messages from
+  one process to another
+
+At the end of every round the simulation collects the profiles of all
+shards and writes them to profile.csv in the simulation's directory.
+profile_round.csv has one row per round with its wall time, the number of
+messages waiting in the database queue, the time the database thread was
+busy and the busy time of the slowest shard relative to the average shard
+(imbalance).
+"""
+from collections import defaultdict
+from time import perf_counter
+
+
+class Profiler:
+    """ The profile of one shard """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.actions = defaultdict(lambda: [0, 0.0])
+        self.phases = defaultdict(lambda: [0, 0.0])
+        self.topics = defaultdict(int)
+        self.frames = defaultdict(lambda: [0, 0])
+
+    def execute(self, agent, command, args, kwargs):
+        """ replaces agent._execute and times its parts """
+        start = perf_counter()
+        if agent.inbox:
+            agent._do_message_clearing()
+        cleared = perf_counter()
+        agent._begin_subround()
+        ret = getattr(agent, command)(*args, **kwargs)
+        agent._end_subround()
+        executed = perf_counter()
+        agent._reject_polled_but_not_accepted_offers()
+        end = perf_counter()
+
+        action = self.actions[agent.group, command]
+        action[0] += 1
+        action[1] += executed - cleared
+        phases = self.phases
+        for phase, seconds in (('message_clearing', cleared - start),
+                               ('execute', executed - cleared),
+                               ('reject', end - executed)):
+            phases[phase][0] += 1
+            phases[phase][1] += seconds
+        return ret
+
+    def phase(self, name, seconds):
+        phase = self.phases[name]
+        phase[0] += 1
+        phase[1] += seconds
+
+    def messages(self, envelopes):
+        """ counts the messages in a list of (receiver, (topic, message)) """
+        topics = self.topics
+        for _, (topic, _) in envelopes:
+            topics[topic] += 1
+
+    def frame(self, receiver, size):
+        """ records a frame of size bytes, sent to the process receiver """
+        frames = self.frames[receiver]
+        frames[0] += 1
+        frames[1] += size
+
+    def collect(self):
+        """ returns the profile since the last collect and resets it """
+        ret = {'actions': dict(self.actions),
+               'phases': dict(self.phases),
+               'topics': dict(self.topics),
+               'frames': dict(self.frames)}
+        self.reset()
+        return ret
+
+
+def profile_tables(round, shards):
+    """ returns the rows of profile.csv and the row of profile_round.csv
+    for the collected profiles of all shards """
+    rows = []
+    busy = []
+    for shard, profile in enumerate(shards):
+        for (group, action), (calls, seconds) in sorted(profile['actions'].items()):
+            rows.append({'round': round, 'shard': shard, 'category': 'action',
+                         'name': '%s.%s' % (group, action), 'count': calls, 'seconds': seconds, 'bytes': ''})
+        for phase, (calls, seconds) in sorted(profile['phases'].items()):
+            rows.append({'round': round, 'shard': shard, 'category': 'phase',
+                         'name': phase, 'count': calls, 'seconds': seconds, 'bytes': ''})
+        for topic, messages in sorted(profile['topics'].items()):
+            rows.append({'round': round, 'shard': shard, 'category': 'topic',
+                         'name': topic, 'count': messages, 'seconds': '', 'bytes': ''})
+        for receiver, (frames, size) in sorted(profile['frames'].items()):
+            rows.append({'round': round, 'shard': shard, 'category': 'frame',
+                         'name': 'to shard %i' % receiver, 'count': frames, 'seconds': '', 'bytes': size})
+        busy.append(sum(seconds for phase, (_, seconds) in profile['phases'].items()
+                        if phase != 'post_messages'))
+    mean = sum(busy) / len(busy)
+    round_row = {'round': round,
+                 'busy_max': max(busy),
+                 'busy_mean': mean,
+                 'imbalance': max(busy) / mean if mean else 1.0}
+    return rows, round_row
@@ -16,50 +16,499 @@
  the License.
 """
 # pylint: disable=W0212, C0111
-from collections import ChainMap
+from array import array
+from collections import ChainMap, defaultdict, deque
+from itertools import chain
+import os
+import pickle
+import random
 import re
+from time import perf_counter
+
+from ..agents.firm import produce_all
+from ..agents.offerbook import OfferBook
+from ..inventory import InventoryTable
+from ..logger.logger import LogBuffer
+from ..logger.online_variance import moments
+from .profiler import Profiler
+from .conditional import ActiveSet, condition_of
+from ..agent import Agent
+from ..agents.clock import Clock
+import abcEconomics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class SingleProcess(object):
     """ This is a container for all agents. It exists only to allow for multiprocessing with MultiProcess.
+
+    Agents are kept in slots, a group is an array of the slots of its
+    local members. Groups created by the simulation are registered
+    once with :meth:`register_group`; sub-groups and combined groups
+    are views on other groups, registered with :meth:`register_view`.
+    A view is resolved to an array of slots, when it is first used and
+    only re-resolved after agents have been added or deleted.
+
+    With offer_book=True the offers of all agents are kept in one
+    :class:`~abcEconomics.agents.offerbook.OfferBook`.
+
+    With compact_inventory the goods of all agents are kept in one
+    :class:`~abcEconomics.inventory.InventoryTable`, compact_inventory
+    can be a list of goods, that are interned in advance.
+
+    The cohorts of the expiring goods are kept in a
+    :class:`~abcEconomics.expiringgood.CohortTable` per duration, at the
+    beginning of every round each table is advanced at once.
+
+    The agents share the shard's :class:`~abcEconomics.agents.clock.Clock`.
+    :meth:`advance_round` sends the trade logs of the agents, that traded,
+    destroys the perishable goods of the agents, that have them, and
+    advances the clock. The agents, that set their own time, get the
+    shared clock back. Only the agents, whose class overrides
+    _advance_round, are called one by one.
+
+    The log messages of the agents are collected in a
+    :class:`~abcEconomics.logger.logger.LogBuffer` and sent to the database
+    in one batch after every action. At the end of every round the
+    database gets a 'round_end' message.
+
+    Between rounds the shard can be written to a file with
+    :meth:`checkpoint` and read back into a new shard with :meth:`restore`.
+
+    With profile=True the actions are timed by a
+    :class:`~abcEconomics.scheduler.profiler.Profiler`.
+
+    Actions declared with :func:`~abcEconomics.scheduler.conditional.conditional`
+    are only executed by the agents, that have work. The shard keeps an
+    :class:`~abcEconomics.scheduler.conditional.ActiveSet` of the agents,
+    that received messages on the topics of conditional actions.
     """
+    batch = 0
 
-    def __init__(self):
+    def __init__(self, offer_book=False, compact_inventory=False, database=None, profile=False):
         self.agents = {}
+        self.slots = []
+        self._slot_of = {}
+        self._base_of = []
+        self.groups = {}
+        self._views = {}
+        self._view_cache = {}
+        self._epoch = 0
+        self._conditions = {}
+        self._member_sets = {}
+        self._active = ActiveSet()
+        self._num_groups = 0
+        self._released = []
+        self._rets = deque()
+        self._executed = deque()
+        self._log_buffer = None if database is None else LogBuffer(database)
+        self._round = None
+        self.profiler = Profiler() if profile else None
+        self.offer_book = OfferBook() if offer_book else None
+        if compact_inventory:
+            self.inventory = InventoryTable(() if compact_inventory is True else compact_inventory)
+        else:
+            self.inventory = None
+        self.cohorts = {}
+        self.perishing = {}
+        self.clock = Clock(shared=True)
+        self._hooks = {}
+
+    def register_group(self, names):
+        """ registers a set of agent names and returns the group id, that
+        is used in :meth:`do` and :meth:`post_messages` """
+        gid = self._new_gid()
+        self._register_group(gid, names)
+        return gid
+
+    def register_view(self, parents, names=None):
+        """ registers a group, that consists of the members of the parent
+        groups, optionally restricted to names """
+        gid = self._new_gid()
+        self._register_view(gid, parents, names)
+        return gid
 
-    def add_agents(self, Agent, simulation_parameters, agent_parameters, default_sim_params, maxid):
-        """appends an agent to a group """
+    def unregister_group(self, gid):
+        """ the group is released, when the next group is registered """
+        self._released.append(gid)
+
+    def _new_gid(self):
+        self._release_groups(self._released)
+        self._released = []
+        gid = self._num_groups
+        self._num_groups += 1
+        return gid
+
+    def _register_group(self, gid, names):
+        self.groups[gid] = array('l', [self._slot_of[name] for name in names if name in self._slot_of])
+
+    def _register_view(self, gid, parents, names):
+        self._views[gid] = (parents, names)
+
+    def _release_groups(self, gids):
+        for gid in gids:
+            self._views.pop(gid, None)
+            self._view_cache.pop(gid, None)
+            self._member_sets.pop(gid, None)
+        if gids and self._conditions:
+            gids = set(gids)
+            self._conditions = {key: value for key, value in self._conditions.items() if key[0] not in gids}
+
+    def _members(self, gid):
+        """ returns the array of slots of the local members of a group """
+        try:
+            return self.groups[gid]
+        except KeyError:
+            pass
+        epoch, slots = self._view_cache.get(gid, (None, None))
+        if epoch != self._epoch:
+            slots = self._resolve_view(gid)
+            self._view_cache[gid] = (self._epoch, slots)
+        return slots
+
+    def _resolve_view(self, gid):
+        parents, names = self._views[gid]
+        if names is None:
+            return array('l', dict.fromkeys(chain.from_iterable(self._members(parent)
+                                                                for parent in parents)))
+        slots = [self._slot_of[name] for name in names if name in self._slot_of]
+        if all(parent in self.groups for parent in parents):
+            parents = set(parents)
+            return array('l', [slot for slot in slots if self._base_of[slot] in parents])
+        else:
+            members = set(chain.from_iterable(self._members(parent) for parent in parents))
+            return array('l', [slot for slot in slots if slot in members])
+
+    def _add_agent(self, agent, gid):
+        assert agent.name not in self.agents, ('Two agents with the same name %s' % str(agent.name))
+        slot = len(self.slots)
+        self.slots.append(agent)
+        self._base_of.append(gid)
+        self._slot_of[agent.name] = slot
+        self.agents[agent.name] = agent
+        self.groups[gid].append(slot)
+        self._epoch += 1
+        if self._active.woken:
+            self._active.admit(slot, agent)
+        if type(agent)._advance_round is not Agent._advance_round:
+            self._hooks[agent.name] = agent
+
+    def add_agents(self, Agent, simulation_parameters, agent_parameters, default_sim_params, maxid, gid,
+                   placement=None):
+        """appends an agent to a group, placement is ignored as all agents are in one process """
         if isinstance(agent_parameters, int):
-            agent_parameters = ([] for _ in range(agent_parameters))
+            agent_parameters = ({} for _ in range(agent_parameters))
 
         names = {}
         for id, ap in enumerate(agent_parameters, maxid):
             agent = Agent(id, ap, {**default_sim_params, **simulation_parameters})
+            self._install(agent)
             agent.init(**ChainMap(simulation_parameters, ap))
             agent._str_name = re.sub('[^0-9a-zA-Z_]', '', str(agent.name))
             names[agent.name] = agent.name
-            assert agent.name not in self.agents, ('Two agents with the same name %s' % str(agent.name))
-            self.agents[agent.name] = agent
+            self._add_agent(agent, gid)
         return names
 
+    def _install(self, agent, slot=None):
+        """ connects an agent to this process, by default the agent gets the next slot """
+        if self.offer_book is not None:
+            agent._attach_offer_book(self.offer_book)
+        if self.inventory is not None:
+            agent._inventory._attach(self.inventory, len(self.slots) if slot is None else slot)
+        agent._inventory._attach_shard(self.cohorts, self.perishing)
+        agent._clock = self.clock
+        if agent._trade_log:
+            self.clock.traders[agent.name] = agent
+        if self._log_buffer is None:
+            self._log_buffer = LogBuffer(agent.database_connection)
+        agent.database_connection = self._log_buffer
+
+    def _uninstall(self, agent):
+        self._release(agent)
+        agent._clock = agent._clock.copy()
+        self.clock.traders.pop(agent.name, None)
+        self.clock.forked.pop(agent.name, None)
+        agent.database_connection = self._log_buffer.connection
+
+    def _flush_log(self):
+        if self._log_buffer is not None:
+            self._log_buffer.flush()
+
+    def _release(self, agent):
+        """ moves the offers and goods of the agent out of the offer book,
+        the inventory table and the cohort tables of this process """
+        if self.offer_book is not None:
+            agent._detach_offer_book()
+        if self.inventory is not None:
+            agent._inventory._detach()
+        agent._inventory._detach_shard()
+
     def delete_agents(self, names):
         for name in names:
-            self.agents.pop(name, None)
+            agent = self.agents.get(name)
+            if agent is not None:
+                self._release(agent)
+        self._remove_agents(names)
 
-    def do(self, names, command, args, kwargs):
-        self.rets = []
+    def _remove_agents(self, names):
+        deleted = set()
         for name in names:
-            ret = self.agents[name]._execute(command, args, kwargs)
-            self.rets.append(ret)
+            agent = self.agents.pop(name, None)
+            if agent is not None:
+                slot = self._slot_of.pop(name)
+                self.slots[slot] = None
+                self._hooks.pop(name, None)
+                deleted.add(slot)
+        if deleted:
+            for gid, members in self.groups.items():
+                self.groups[gid] = array('l', [slot for slot in members if slot not in deleted])
+            self._epoch += 1
+            self._active.forget(deleted)
 
-    def post_messages(self, names):
-        for name in names:
-            self.agents[name]._post_messages(self.agents)
-        return self.rets
+    def rebalance(self, slack=0.1):
+        return {}
+
+    def migrate(self, moves):
+        pass
+
+    def do(self, gid, command, args, kwargs):
+        slots = self.slots
+        rets = []
+        profiler = self.profiler
+        executed = self._runnable(gid, command)
+        for slot in executed:
+            if profiler is None:
+                rets.append(slots[slot]._execute(command, args, kwargs))
+            else:
+                rets.append(profiler.execute(slots[slot], command, args, kwargs))
+        self._rets.append(rets)
+        self._executed.append(executed)
+
+    def _runnable(self, gid, command):
+        """ returns the slots of the members of the group, that execute
+        command, all members unless the action is conditional """
+        members = self._members(gid)
+        condition = self._condition(gid, members, command)
+        if condition is None:
+            return members
+        if condition.topics:
+            members = self._active.take(command, condition.topics, self.slots, self._is_member(gid))
+        if condition.guard is None:
+            return members
+        return self._guarded(members, condition.guard)
+
+    def _guarded(self, members, guard):
+        slots = self.slots
+        guarded = []
+        for slot in members:
+            agent = slots[slot]
+            if agent.inbox:
+                agent._do_message_clearing()
+            if guard(agent):
+                guarded.append(slot)
+        return guarded
+
+    def _condition(self, gid, members, command):
+        """ returns the condition of command for the agents of the group,
+        the agent classes of the group are looked up once per change of
+        the agents """
+        try:
+            epoch, condition = self._conditions[gid, command]
+            if epoch == self._epoch:
+                return condition
+        except KeyError:
+            pass
+        slots = self.slots
+        conditions = {condition_of(Agent, command) for Agent in {type(slots[slot]) for slot in members}}
+        if len(conditions) > 1:
+            raise Exception('The action %s is conditional for some of the agent classes in the group only'
+                            % command)
+        condition = conditions.pop() if conditions else None
+        self._conditions[gid, command] = (self._epoch, condition)
+        return condition
+
+    def _is_member(self, gid):
+        if gid in self.groups:
+            base_of = self._base_of
+            return lambda slot: base_of[slot] == gid
+        epoch, members = self._member_sets.get(gid, (None, None))
+        if epoch != self._epoch:
+            members = set(self._members(gid))
+            self._member_sets[gid] = (self._epoch, members)
+        return members.__contains__
+
+    def post_messages(self, gid):
+        """ delivers the messages of the agents, that executed the action
+        of the group """
+        slots = self.slots
+        profiler = self.profiler
+        executed = self._executed.popleft()
+        if self._active.woken:
+            for slot in executed:
+                self._active.arrivals(slots[slot]._out, self._slot_of)
+        if profiler is not None:
+            start = perf_counter()
+            for slot in executed:
+                profiler.messages(slots[slot]._out)
+        for slot in executed:
+            slots[slot]._post_messages(self.agents)
+        self._flush_log()
+        if profiler is not None:
+            profiler.phase('post_messages', perf_counter() - start)
+        return self._rets.popleft()
+
+    def total(self, gid, good):
+        """ returns the sum of a good over the local members of a group """
+        members = self._members(gid)
+        if self.inventory is not None:
+            return self.inventory.total(members, good)
+        slots = self.slots
+        return sum(float(slots[slot]._inventory.haves.get(good, 0)) for slot in members)
+
+    def produce_all(self, gid, production_function, input_goods, results):
+        """ the local members of a group produce in bulk, see
+        :func:`abcEconomics.agents.firm.produce_all` """
+        members = self._members(gid)
+        slots = self.slots
+        return produce_all([slots[slot] for slot in members], members, self.inventory,
+                           production_function, input_goods, results)
+
+    def agg_log(self, gid, variables, goods, functions, lengths):
+        """ sends the partial moments of the logged values of the local
+        members of a group to the database, one message per agent group """
+        values = defaultdict(lambda: defaultdict(list))
+        slots = self.slots
+        round = None
+        for slot in self._members(gid):
+            agent = slots[slot]
+            if agent.log_this_round:
+                round = agent._str_round
+                columns = values[agent.group]
+                for key, value in agent._common_log(variables, goods, functions, lengths).items():
+                    columns[key].append(value)
+        for group, columns in values.items():
+            self._log_buffer.put(['snapshot_agg', round, group,
+                                  {key: moments(column) for key, column in columns.items()}])
 
     def advance_round(self, time, str_time):
-        for agent in self.agents.values():
+        start = perf_counter()
+        clock = self.clock
+        if clock.traders:
+            for agent in clock.traders.values():
+                if agent._trade_log:
+                    agent.database_connection.put(["trade_log", agent._trade_log, agent._clock.time])
+                    agent._trade_log = defaultdict(int)
+            clock.traders = {}
+        if clock.forked:
+            for agent in clock.forked.values():
+                agent._clock = clock
+            clock.forked = {}
+        for table in self.cohorts.values():
+            table.advance()
+        for inventory in self.perishing.values():
+            inventory._perish()
+        clock.time = time
+        clock.str_time = str_time
+        log_rounds = getattr(abcEconomics, 'conditional_logging', None)
+        clock.log_this_round = log_rounds is None or time in log_rounds
+        for agent in self._hooks.values():
             agent._advance_round(time, str_time)
+        if self._log_buffer is not None and self._round is not None:
+            self._log_buffer.put(['round_end', self.batch, self._round])
+        self._round = str_time
+        self._flush_log()
+        if self.profiler is not None:
+            self.profiler.phase('advance_round', perf_counter() - start)
+
+    def profile(self):
+        """ returns the profiles of the shards since the last call """
+        return [self.profiler.collect()]
 
     def group_names(self):
-        return self.agents.keys()
+        return list(self.agents.keys())
+
+    def checkpoint(self, directory):
+        """ writes the agents and groups of this shard to
+        directory/shard_<batch>.pickle. The agents are detached from the
+        shard while they are pickled. """
+        self._flush_log()
+        for agent in self.agents.values():
+            self._uninstall(agent)
+            agent.database_connection = None
+        try:
+            with open(self._shard_file(directory), 'wb') as shard_file:
+                pickle.dump(self._state(), shard_file, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for slot, agent in enumerate(self.slots):
+                if agent is not None:
+                    self._install(agent, slot)
+
+    def restore(self, directory, state=None):
+        """ replaces the agents and groups of this shard by the ones in
+        directory/shard_<batch>.pickle, state is the return value of
+        :meth:`checkpoint` """
+        with open(self._shard_file(directory), 'rb') as shard_file:
+            self._set_state(pickle.load(shard_file))
+        for slot, agent in enumerate(self.slots):
+            if agent is not None:
+                self._install(agent, slot)
+
+    def prepare_branch(self):
+        """ is called before the simulation is forked by
+        :meth:`Simulation.branch <abcEconomics.Simulation.branch>`, returns
+        the state, that is passed to :meth:`branch` """
+        self._flush_log()
+
+    def branch(self, database, state):
+        """ connects the copy of the agents in the forked process to its
+        new database """
+        self._log_buffer = LogBuffer(database)
+        for agent in self.agents.values():
+            agent.database_connection = self._log_buffer
+
+    def release_branch(self, state):
+        pass
+
+    def _shard_file(self, directory):
+        return os.path.join(directory, 'shard_%i.pickle' % self.batch)
+
+    def _state(self):
+        return {'slots': self.slots,
+                'base_of': self._base_of,
+                'groups': self.groups,
+                'views': self._views,
+                'num_groups': self._num_groups,
+                'round': self._round,
+                'clock': (self.clock.time, self.clock.str_time, self.clock.log_this_round),
+                'random': random.getstate(),
+                'numpy_random': None if np is None else np.random.get_state()}
+
+    def _set_state(self, state):
+        self.slots = state['slots']
+        self._base_of = state['base_of']
+        self.agents = {agent.name: agent for agent in self.slots if agent is not None}
+        self._slot_of = {agent.name: slot for slot, agent in enumerate(self.slots) if agent is not None}
+        self.groups = state['groups']
+        self._views = state['views']
+        self._view_cache = {}
+        self._epoch += 1
+        self._conditions = {}
+        self._member_sets = {}
+        self._active = ActiveSet()
+        self.cohorts = {}
+        self.perishing = {}
+        self.clock = Clock(*state['clock'], shared=True)
+        self._hooks = {agent.name: agent for agent in self.agents.values()
+                       if type(agent)._advance_round is not Agent._advance_round}
+        self._num_groups = state['num_groups']
+        self._released = []
+        self._round = state['round']
+        random.setstate(state['random'])
+        if np is not None and state['numpy_random'] is not None:
+            np.random.set_state(state['numpy_random'])
+
+    def close(self):
+        self._flush_log()
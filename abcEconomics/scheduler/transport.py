@@ -0,0 +1,358 @@
+""" Copyright 2012 Davoud Taghawi-Nejad
+
+ Module Author: Davoud Taghawi-Nejad
+
+ abcEconomics is open-source software. If you are using abcEconomics for your research you are
+ requested the quote the use of this software.
+
+ Licensed under the Apache License, Version 2.0 (the "License"); you may not
+ use this file except in compliance with the License and quotation of the
+ author. You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+ WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+ License for the specific language governing permissions and limitations under
+ the License.
+
+The transport carries the messages between the shards of the
+:class:`~abcEconomics.scheduler.multiprocess.MultiProcess` scheduler.
+
+Every pair of shards has a ring buffer in shared memory. The messages that one
+shard sends to another in a subround are encoded into a frame. Trade messages
+(offers, acceptances, rejections and given goods) of agents that are named
+(group, id) are written column by column in a fixed binary layout. All other
+messages are pickled. A frame is written into the ring buffer and only a
+small token is sent over the shard's queue. When the frame does not fit into
+the ring buffer or shared memory is not available (Python < 3.8) the frame
+travels in the token itself.
+
+Frame layout, all numbers little endian::
+
+    header      8 x uint32: number of new symbols, number of messages of
+                each kind (sell offers, buy offers, accepts, rejects,
+                goods), length of pickled part, reserved
+    symbols     uint32 length of every new symbol, utf-8 encoded symbols
+    sells       columns: receiver group (uint32), receiver id (int64),
+                sender group (uint32), sender id (int64), good (uint32),
+                currency (uint32), quantity (float64), price (float64),
+                offer id (int64), made (int64)
+    buys        same as sells
+    accepts     receiver group, receiver id, offer id, quantity
+    rejects     receiver group, receiver id, offer id
+    goods       receiver group, receiver id, good, quantity
+    pickled     the pickled list of the remaining messages
+
+Strings (group names, goods, currencies) are replaced by symbols, a symbol is
+send only the first time it is used on a connection.
+"""
+import pickle
+import struct
+import sys
+from array import array
+
+from ..agents.trader import Offer
+from ..agents.offerbook import OfferView
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+RING_SIZE = 2 ** 20
+""" size in bytes of the ring buffer between two shards """
+
+_header = struct.Struct('<8I')
+_tail = struct.Struct('<Q')
+_HEADER_SIZE = 64
+
+SELL, BUY, ACCEPT, REJECT, GOOD = range(5)
+_kinds = {'abcEconomics_propose_sell': SELL,
+          'abcEconomics_propose_buy': BUY,
+          'abcEconomics_receive_accept': ACCEPT,
+          'abcEconomics_receive_reject': REJECT,
+          'abcEconomics_receive_good': GOOD}
+_topics = ['abcEconomics_propose_sell',
+           'abcEconomics_propose_buy',
+           'abcEconomics_receive_accept',
+           'abcEconomics_receive_reject',
+           'abcEconomics_receive_good']
+_columns = {SELL: 'IqIqIIddqq',
+            BUY: 'IqIqIIddqq',
+            ACCEPT: 'Iqqd',
+            REJECT: 'Iqq',
+            GOOD: 'IqId'}
+_numbers = (int, float)
+_offers = (Offer, OfferView)
+_big_endian = sys.byteorder == 'big'
+
+
+class RingBuffer:
+    """ A single writer, single reader ring of bytes in shared memory.
+
+    The writer keeps its position, the reader keeps its position and
+    publishes it in the header, so that the writer knows how much space is
+    free. The writer tells the reader the size of each frame.
+    """
+
+    def __init__(self, size, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + size)
+            _tail.pack_into(self.shm.buf, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.size = size
+        self.position = 0
+
+    def __reduce__(self):
+        return (RingBuffer, (self.size, self.shm.name))
+
+    def write(self, frame):
+        """ writes the frame and returns True or returns False if it does
+        not fit """
+        length = len(frame)
+        tail, = _tail.unpack_from(self.shm.buf, 0)
+        if self.position + length - tail > self.size:
+            return False
+        start = self.position % self.size
+        end = start + length
+        buf = self.shm.buf
+        if end <= self.size:
+            buf[_HEADER_SIZE + start:_HEADER_SIZE + end] = frame
+        else:
+            split = self.size - start
+            buf[_HEADER_SIZE + start:_HEADER_SIZE + self.size] = frame[:split]
+            buf[_HEADER_SIZE:_HEADER_SIZE + length - split] = frame[split:]
+        self.position += length
+        return True
+
+    def read(self, length):
+        start = self.position % self.size
+        end = start + length
+        buf = self.shm.buf
+        if end <= self.size:
+            frame = bytes(buf[_HEADER_SIZE + start:_HEADER_SIZE + end])
+        else:
+            split = self.size - start
+            frame = (bytes(buf[_HEADER_SIZE + start:_HEADER_SIZE + self.size]) +
+                     bytes(buf[_HEADER_SIZE:_HEADER_SIZE + length - split]))
+        self.position += length
+        _tail.pack_into(buf, 0, self.position)
+        return frame
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def create_rings(processes, size=None):
+    """ creates the ring buffers rings[sender][receiver] between all shards or
+    returns None, when shared memory is not available """
+    if shared_memory is None or processes < 2:
+        return None
+    if size is None:
+        size = RING_SIZE
+    try:
+        return [[RingBuffer(size) if sender != receiver else None
+                 for receiver in range(processes)]
+                for sender in range(processes)]
+    except OSError:
+        return None
+
+
+class Encoder:
+    """ encodes the messages of one shard to another shard """
+
+    def __init__(self):
+        self.symbols = {}
+
+    def _symbol(self, string, new_symbols):
+        try:
+            return self.symbols[string]
+        except KeyError:
+            symbol = self.symbols[string] = len(self.symbols)
+            new_symbols.append(string)
+            return symbol
+
+    def encode(self, envelopes):
+        rows = ([], [], [], [], [])
+        encoded = ([], [], [], [], [])
+        rest = []
+        new_symbols = []
+        symbol = self._symbol
+        for envelope in envelopes:
+            receiver, (topic, msg) = envelope
+            kind = _kinds.get(topic)
+            if kind is None or not _is_name(receiver):
+                rest.append(envelope)
+                continue
+            group = symbol(receiver[0], new_symbols)
+            if kind <= BUY:
+                default = -2 if kind == SELL else -1
+                if (type(msg) not in _offers or msg.sell != (kind == SELL) or msg.status != 'new' or
+                        msg.final_quantity != default or msg.status_round != default or
+                        msg.receiver != receiver or not _is_name(msg.sender) or
+                        type(msg.good) is not str or type(msg.currency) is not str or
+                        type(msg.quantity) not in _numbers or type(msg.price) not in _numbers or
+                        type(msg.made) is not int):
+                    rest.append(envelope)
+                    continue
+                sender = msg.sender
+                row = (group, receiver[1],
+                       symbol(sender[0], new_symbols), sender[1],
+                       symbol(msg.good, new_symbols),
+                       symbol(msg.currency, new_symbols),
+                       msg.quantity, msg.price, msg.id, msg.made)
+            elif kind == ACCEPT:
+                if (type(msg) is not tuple or len(msg) != 2 or type(msg[0]) is not int or
+                        type(msg[1]) not in _numbers):
+                    rest.append(envelope)
+                    continue
+                row = (group, receiver[1], msg[0], msg[1])
+            elif kind == REJECT:
+                if type(msg) is not int:
+                    rest.append(envelope)
+                    continue
+                row = (group, receiver[1], msg)
+            else:
+                if (type(msg) is not list or len(msg) != 2 or type(msg[0]) is not str or
+                        type(msg[1]) not in _numbers):
+                    rest.append(envelope)
+                    continue
+                row = (group, receiver[1], symbol(msg[0], new_symbols), msg[1])
+            rows[kind].append(row)
+            encoded[kind].append(envelope)
+
+        parts = []
+        counts = []
+        for kind, kind_rows in enumerate(rows):
+            try:
+                parts.extend(_pack_columns(_columns[kind], kind_rows) if kind_rows else ())
+                counts.append(len(kind_rows))
+            except OverflowError:  # an integer does not fit into 64 bit
+                rest.extend(encoded[kind])
+                counts.append(0)
+        pickled = pickle.dumps(rest, protocol=pickle.HIGHEST_PROTOCOL) if rest else b''
+        encoded_symbols = [string.encode('utf-8') for string in new_symbols]
+        header = _header.pack(len(new_symbols), *counts, len(pickled), 0)
+        return b''.join([header,
+                         _to_bytes(array('I', [len(string) for string in encoded_symbols])),
+                         *encoded_symbols,
+                         *parts,
+                         pickled])
+
+
+class Decoder:
+    """ decodes the messages one shard receives from another shard """
+
+    def __init__(self):
+        self.symbols = []
+
+    def decode(self, frame):
+        view = memoryview(frame)
+        num_symbols, *counts, pickled_length, _ = _header.unpack_from(view, 0)
+        position = _header.size
+        lengths, position = _unpack_column('I', view, position, num_symbols)
+        for length in lengths:
+            self.symbols.append(str(view[position:position + length], 'utf-8'))
+            position += length
+        symbols = self.symbols
+
+        envelopes = []
+        for kind, count in enumerate(counts):
+            if not count:
+                continue
+            columns = []
+            for typecode in _columns[kind]:
+                column, position = _unpack_column(typecode, view, position, count)
+                columns.append(column)
+            topic = _topics[kind]
+            if kind == SELL or kind == BUY:
+                sell = kind == SELL
+                status = -2 if sell else -1
+                envelopes.extend(((symbols[rg], ri),
+                                  (topic, Offer((symbols[sg], si), (symbols[rg], ri), symbols[good],
+                                                quantity, price, symbols[currency], sell, 'new',
+                                                status, id, made, status)))
+                                 for rg, ri, sg, si, good, currency, quantity, price, id, made
+                                 in zip(*columns))
+            elif kind == ACCEPT:
+                envelopes.extend(((symbols[rg], ri), (topic, (id, quantity)))
+                                 for rg, ri, id, quantity in zip(*columns))
+            elif kind == REJECT:
+                envelopes.extend(((symbols[rg], ri), (topic, id))
+                                 for rg, ri, id in zip(*columns))
+            else:
+                envelopes.extend(((symbols[rg], ri), (topic, [symbols[good], quantity]))
+                                 for rg, ri, good, quantity in zip(*columns))
+        if pickled_length:
+            envelopes.extend(pickle.loads(view[position:position + pickled_length]))
+        return envelopes
+
+
+def _is_name(name):
+    return (type(name) is tuple and len(name) == 2 and
+            type(name[0]) is str and type(name[1]) is int)
+
+
+def _to_bytes(column):
+    if _big_endian:
+        column.byteswap()
+    return column.tobytes()
+
+
+def _pack_columns(typecodes, rows):
+    return [_to_bytes(array(typecode, column))
+            for typecode, column in zip(typecodes, zip(*rows))]
+
+
+def _unpack_column(typecode, view, position, count):
+    column = array(typecode)
+    end = position + column.itemsize * count
+    column.frombytes(view[position:end])
+    if _big_endian:
+        column.byteswap()
+    return column.tolist(), end
+
+
+class Transport:
+    """ sends and receives the messages of one shard """
+
+    def __init__(self, batch, queues, rings):
+        self.batch = batch
+        self.queues = queues
+        self.queue = queues[batch]
+        self.rings = rings
+        self.encoders = [Encoder() for _ in queues]
+        self.decoders = [Decoder() for _ in queues]
+
+    def send(self, receiver, envelopes):
+        """ encodes envelopes into a frame and sends it to receiver,
+        returns the length of the frame in bytes """
+        frame = self.encoders[receiver].encode(envelopes)
+        if self.rings is not None and self.rings[self.batch][receiver].write(frame):
+            self.queue_put(receiver, len(frame))
+        else:
+            self.queue_put(receiver, frame)
+        return len(frame)
+
+    def queue_put(self, receiver, token):
+        self.queues[receiver].put((self.batch, token))
+
+    def receive(self):
+        sender, token = self.queue.get()
+        if isinstance(token, int):
+            frame = self.rings[sender][self.batch].read(token)
+        else:
+            frame = token
+        return self.decoders[sender].decode(frame)
+
+    def close(self):
+        if self.rings is not None:
+            for rings in self.rings:
+                for ring in rings:
+                    if ring is not None:
+                        ring.close()
@@ -0,0 +1,155 @@
+# Copyright 2012 Davoud Taghawi-Nejad
+#
+# Module Author: Davoud Taghawi-Nejad
+#
+# abcEconomics is open-source software. If you are using abcEconomics for your research you
+# are requested the quote the use of this software.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License and quotation of the
+# author. You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+Runs many independent simulations in a pool of processes, for Monte Carlo
+experiments and calibration. Every run is a call of a model function with
+its own parameters, random seed and result directory. The aggregate tables
+of all runs are collected in one csv file per table in the sweep's
+directory.
+
+Example::
+
+    def model(parameters):
+        simulation = Simulation(random_seed=parameters['random_seed'],
+                                path=parameters['path'])
+        firms = simulation.build_agents(Firm, 'firm', parameters['num_firms'])
+        for r in range(100):
+            simulation.advance_round(r)
+            firms.production()
+            firms.agg_log(goods=['produce'])
+        simulation.finalize()
+
+    sweep(model, {'num_firms': [10, 100], 'tax': [0.1, 0.2]}, repetitions=10)
+"""
+import concurrent.futures
+import csv
+import datetime
+import os
+import re
+import time
+import multiprocessing as mp
+from collections import OrderedDict
+from itertools import product
+
+from .logger.postprocess import CsvFile
+
+
+def sweep(model, parameters, workers=None, repetitions=1, random_seed=None, path='auto', name='sweep'):
+    """ Runs model(parameters) for every combination of parameters in a
+    pool of processes and collects the aggregate tables of the runs.
+
+    Args:
+        model:
+            a function, that runs one simulation with a dictionary of
+            parameters. It must be defined at the top level of a module,
+            so that it can be sent to the processes. The simulation
+            should use parameters['random_seed'] and parameters['path']
+            for its random_seed and path. The simulation must run with
+            processes=1.
+
+        parameters:
+            a dictionary of lists of values, every combination is run. Or
+            a list of dictionaries, one per run. A combination, that sets
+            'random_seed', is repeated with the seeds random_seed,
+            random_seed + 1, ...
+
+        workers (optional):
+            the number of simulations that run at the same time, by
+            default the number of processor cores.
+
+        repetitions (optional):
+            how often every combination is run, with different seeds.
+
+        random_seed (optional):
+            the seed of the first run, the following runs get the following
+            seeds. By default the current time.
+
+        path:
+            the directory of the sweep, by default result/<name>_<date>.
+            Every run has a directory run_<number> in it. The aggregate
+            and aggregated tables of all runs are combined in tables with
+            the same name in the sweep's directory, with the column 'run'
+            and the parameters of the run.
+
+    Returns:
+        a list of the parameters of every run and the return value of the
+        model, in the order of the runs
+    """
+    if isinstance(parameters, dict):
+        keys = list(parameters)
+        grid = [OrderedDict(zip(keys, values)) for values in product(*parameters.values())]
+    else:
+        grid = [OrderedDict(point) for point in parameters]
+
+    path = _make_directory(path, name)
+    if random_seed is None:
+        random_seed = int(time.time())
+    runs = []
+    for point in grid:
+        for repetition in range(repetitions):
+            run_parameters = OrderedDict(point)
+            if 'random_seed' in point:
+                run_parameters['random_seed'] = point['random_seed'] + repetition
+            else:
+                run_parameters['random_seed'] = random_seed + len(runs)
+            run_parameters['path'] = os.path.join(path, 'run_%05i' % len(runs))
+            runs.append(run_parameters)
+
+    workers = mp.cpu_count() if workers is None else workers
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(model, runs))
+
+    combine(path, runs)
+    return list(zip(runs, results))
+
+
+def combine(path, runs):
+    """ appends the aggregate tables of all runs to a table of the same
+    name in path, with the run's number and parameters in front """
+    files = {}
+    for number, run_parameters in enumerate(runs):
+        run_path = run_parameters['path']
+        if not os.path.isdir(run_path):
+            continue
+        columns = OrderedDict([('run', number)])
+        columns.update((key, value) for key, value in run_parameters.items() if key != 'path')
+        for filename in sorted(os.listdir(run_path)):
+            if not re.match('aggregated?_.*\\.csv$', filename):
+                continue
+            with open(os.path.join(run_path, filename)) as table:
+                rows = [OrderedDict(columns, **row) for row in csv.DictReader(table)]
+            if not rows:
+                continue
+            try:
+                combined = files[filename]
+            except KeyError:
+                combined = files[filename] = CsvFile(os.path.join(path, filename), index=False)
+            combined.write(rows)
+    for combined in files.values():
+        combined.close()
+
+
+def _make_directory(path, name):
+    if path == 'auto':
+        path = os.path.join(os.path.abspath('.'), 'result',
+                            name + '_' + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M"))
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except OSError:
+            path += 'I'
@@ -0,0 +1,12 @@
+""" The benchmarks of abcEconomics. They measure the throughput and the
+latency per round of scenarios (messages, trade, production, logging and
+contracts) for different numbers of agents, goods and processes::
+
+    python -m benchmarks --agents 100 1000 10000 --processes 1 2 4
+
+The results are written as JSON to benchmark.json. With
+--baseline benchmarks/baseline.json the throughput is compared to a
+stored run and the command fails if it fell by more than --tolerance.
+The command also fails if a scenario raises an exception or the baseline
+stores a failed scenario.
+"""
@@ -0,0 +1,52 @@
+""" python -m benchmarks [options], see python -m benchmarks --help """
+import argparse
+import sys
+
+from .runner import run, check_baseline, compare, report, load, save
+from .scenarios import scenarios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Runs the abcEconomics benchmarks and writes the results as JSON')
+    parser.add_argument('scenarios', nargs='*',
+                        help='the scenarios to run, default all of: %s' % ', '.join(scenarios))
+    parser.add_argument('--agents', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--goods', type=int, nargs='+', default=[5])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='every benchmark is run repeat times, the fastest run counts')
+    parser.add_argument('--output', default='benchmark.json', help='the JSON file for the results')
+    parser.add_argument('--baseline', help='a JSON file of an earlier run, to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='a fall of the throughput by more than tolerance is a regression')
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in scenarios:
+            parser.error('unknown scenario %r, choose from %s' % (name, ', '.join(scenarios)))
+    baseline = None
+    if args.baseline:
+        baseline = load(args.baseline)
+        try:
+            check_baseline(baseline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    results = run(args.scenarios or list(scenarios), args.agents, args.goods, args.processes,
+                  args.rounds, args.repeat)
+    save(results, args.output)
+    comparisons, regressions = [], []
+    if baseline is not None:
+        comparisons, regressions = compare(results, baseline, args.tolerance)
+    print(report(results, comparisons))
+    for record, base, ratio in regressions:
+        print('regression: %s with %i agents, %i goods and %i processes: %.0f operations/s, baseline %.0f'
+              % (record['scenario'], record['agents'], record['goods'], record['processes'],
+                 record['throughput'], base['throughput']))
+    failed = [record for record in results['results'] if 'error' in record]
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
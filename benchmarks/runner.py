@@ -0,0 +1,126 @@
+""" Runs the benchmark scenarios and compares the results with a baseline """
+import json
+import platform
+import statistics
+import sys
+import time
+import traceback
+
+import abcEconomics
+from .scenarios import scenarios
+
+
+def run_scenario(name, agents, goods, processes, rounds, repeat=3):
+    """ runs a scenario repeat times and returns the record of the fastest
+    run. throughput is in operations per second, the latencies are the
+    durations of the rounds in milliseconds """
+    best = None
+    for _ in range(repeat):
+        scenario = scenarios[name]()
+        simulation = abcEconomics.Simulation(name='benchmark', random_seed=1, processes=processes, path=None)
+        try:
+            scenario.setup(simulation, agents, goods)
+            latencies = []
+            start = time.perf_counter()
+            for r in range(rounds):
+                round_start = time.perf_counter()
+                simulation.advance_round(r)
+                scenario.step()
+                latencies.append(time.perf_counter() - round_start)
+            seconds = time.perf_counter() - start
+        finally:
+            simulation.finalize()
+        if best is None or seconds < best[0]:
+            best = (seconds, latencies, scenario.operations)
+
+    seconds, latencies, operations = best
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {'seconds': seconds,
+            'operations': operations * rounds,
+            'throughput': operations * rounds / seconds,
+            'latency_ms': {'median': statistics.median(latencies),
+                           'p95': latencies[int(0.95 * (len(latencies) - 1))],
+                           'max': latencies[-1]}}
+
+
+def run(names, agent_counts, goods_counts, process_counts, rounds, repeat=3):
+    """ runs every combination of scenario, number of agents, number of
+    goods and processes. A scenario that fails is recorded with its error """
+    results = []
+    for name in names:
+        for agents in agent_counts:
+            for goods in goods_counts:
+                for processes in process_counts:
+                    record = {'scenario': name, 'agents': agents, 'goods': goods,
+                              'processes': processes, 'rounds': rounds}
+                    try:
+                        record.update(run_scenario(name, agents, goods, processes, rounds, repeat))
+                    except Exception as e:
+                        traceback.print_exc()
+                        record['error'] = repr(e)
+                    results.append(record)
+    return {'machine': {'python': sys.version.split()[0],
+                        'implementation': platform.python_implementation(),
+                        'platform': platform.platform(),
+                        'processor': platform.processor()},
+            'results': results}
+
+
+def key(record):
+    return (record['scenario'], record['agents'], record['goods'], record['processes'])
+
+
+def check_baseline(baseline):
+    """ raises ValueError, if a scenario of the baseline is stored as an
+    error, such a scenario would never be compared """
+    failed = ['%s with %i agents, %i goods and %i processes: %s'
+              % (key(record) + (record['error'],))
+              for record in baseline['results'] if 'error' in record]
+    if failed:
+        raise ValueError('the baseline stores failed scenarios, regenerate it:\n' + '\n'.join(failed))
+
+
+def compare(results, baseline, tolerance=0.3):
+    """ compares the throughput of every result with the baseline, returns
+    the list of (result, baseline result, ratio) and the list of
+    regressions, where the throughput fell by more than tolerance """
+    check_baseline(baseline)
+    baseline = {key(record): record for record in baseline['results']}
+    comparisons = []
+    regressions = []
+    for record in results['results']:
+        base = baseline.get(key(record))
+        if base is None or 'throughput' not in base or 'throughput' not in record:
+            continue
+        ratio = record['throughput'] / base['throughput']
+        comparisons.append((record, base, ratio))
+        if ratio < 1 - tolerance:
+            regressions.append((record, base, ratio))
+    return comparisons, regressions
+
+
+def report(results, comparisons=()):
+    ratios = {key(record): ratio for record, _, ratio in comparisons}
+    lines = ['%-11s %7s %6s %5s %14s %11s %9s %9s' % ('scenario', 'agents', 'goods', 'proc',
+                                                      'operations/s', 'median ms', 'p95 ms', 'baseline')]
+    for record in results['results']:
+        if 'error' in record:
+            lines.append('%-11s %7i %6i %5i %s' % (record['scenario'], record['agents'], record['goods'],
+                                                   record['processes'], record['error']))
+            continue
+        ratio = ratios.get(key(record))
+        lines.append('%-11s %7i %6i %5i %14.0f %11.2f %9.2f %9s' % (
+            record['scenario'], record['agents'], record['goods'], record['processes'],
+            record['throughput'], record['latency_ms']['median'], record['latency_ms']['p95'],
+            '' if ratio is None else '%.2fx' % ratio))
+    return '\n'.join(lines)
+
+
+def load(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def save(results, path):
+    with open(path, 'w') as json_file:
+        json.dump(results, json_file, indent=2, sort_keys=True)
@@ -0,0 +1,163 @@
+""" The benchmark scenarios. A scenario is a class, that builds its agents in
+setup(simulation, agents, goods) and runs one round in step(). operations is
+the number of operations (messages, trades, productions, log entries or
+contract deliveries) of one round, it is used for the throughput. """
+import abcEconomics
+from abcEconomics import Firm
+from abcEconomics.contracts import Contracting
+
+
+def neighbour(agent, population):
+    return (agent.group, (agent.id + 1) % population)
+
+
+class Messenger(abcEconomics.Agent):
+    def init(self, population, goods):
+        self.population = population
+        self.topics = ['topic%i' % g for g in range(goods)]
+
+    def send_messages(self):
+        receiver = neighbour(self, self.population)
+        for topic in self.topics:
+            self.send_envelope(receiver, topic, self.id)
+
+    def get_all_messages(self):
+        for topic in self.topics:
+            self.get_messages(topic)
+
+
+class Messages:
+    """ every agent sends one message per good (topic) to its neighbour,
+    that reads them with get_messages """
+    def setup(self, simulation, agents, goods):
+        self.agents = simulation.build_agents(Messenger, 'messenger', agents, population=agents, goods=goods)
+        self.operations = agents * goods
+
+    def step(self):
+        self.agents.send_messages()
+        self.agents.get_all_messages()
+
+
+class Trader(abcEconomics.Agent):
+    def init(self, population, goods):
+        self.population = population
+        self.goods = ['good%i' % g for g in range(goods)]
+        self.create('money', 1e12)
+        for good in self.goods:
+            self.create(good, 1e12)
+
+    def sell_goods(self):
+        receiver = neighbour(self, self.population)
+        for good in self.goods:
+            self.sell(receiver, good, 1, 1)
+
+    def accept_offers(self):
+        for good in self.goods:
+            for offer in self.get_offers(good):
+                self.accept(offer)
+
+
+class Trade:
+    """ every agent sells one unit of every good to its neighbour, that
+    accepts """
+    def setup(self, simulation, agents, goods):
+        self.agents = simulation.build_agents(Trader, 'trader', agents, population=agents, goods=goods)
+        self.operations = agents * goods
+
+    def step(self):
+        self.agents.sell_goods()
+        self.agents.accept_offers()
+
+
+class Producer(abcEconomics.Agent, Firm):
+    def init(self, goods):
+        self.inputs = ['input%i' % g for g in range(goods)]
+        self.production_function = self.create_cobb_douglas('output', 1, {good: 1 / goods for good in self.inputs})
+
+    def production(self):
+        for good in self.inputs:
+            self.create(good, 1)
+        self.produce(self.production_function, self.inputs)
+
+
+class Production:
+    """ every firm produces with a Cobb-Douglas function with goods inputs """
+    def setup(self, simulation, agents, goods):
+        self.agents = simulation.build_agents(Producer, 'producer', agents, goods=goods)
+        self.operations = agents
+
+    def step(self):
+        self.agents.production()
+
+
+class Logger(abcEconomics.Agent):
+    def init(self, goods):
+        self.goods = ['good%i' % g for g in range(goods)]
+        self.counter = 0
+        for good in self.goods:
+            self.create(good, 1)
+
+    def count(self):
+        self.counter += 1
+        self.log('counter', self.counter)
+
+
+class Logging:
+    """ every agent logs a variable, the group is logged with panel_log
+    and agg_log over all goods """
+    def setup(self, simulation, agents, goods):
+        self.agents = simulation.build_agents(Logger, 'logger', agents, goods=goods)
+        self.goods = ['good%i' % g for g in range(goods)]
+        self.operations = agents * 3
+
+    def step(self):
+        self.agents.count()
+        self.agents.panel_log(variables=['counter'], goods=self.goods)
+        self.agents.agg_log(variables=['counter'], goods=self.goods)
+
+
+class Contractor(abcEconomics.Agent, Contracting):
+    def init(self, population, goods):
+        self.population = population
+        self.goods = ['service%i' % g for g in range(goods)]
+        self._add_contracts_list()
+        self.create('money', 1e12)
+
+    def offer_contracts(self):
+        if self.time == 0:
+            group, id = neighbour(self, self.population)
+            for good in self.goods:
+                self.offer_good_contract(group, id, good, quantity=1, price=1, duration=None)
+
+    def accept_contracts(self):
+        for good in self.goods:
+            for contract in self.get_contract_offers(good):
+                self.accept_contract(contract)
+
+    def deliver_and_pay(self):
+        for good in self.goods:
+            self.create(good, 1)
+            for contract in self.contracts_to_deliver(good):
+                self.deliver_contract(contract)
+            for contract in self.contracts_to_receive(good):
+                self.pay_contract(contract)
+
+
+class Contracts:
+    """ every agent offers a contract for every good to its neighbour, who
+    accepts. Every round the goods are delivered and paid """
+    def setup(self, simulation, agents, goods):
+        self.agents = simulation.build_agents(Contractor, 'contractor', agents, population=agents, goods=goods)
+        self.operations = agents * goods * 2
+
+    def step(self):
+        self.agents.offer_contracts()
+        self.agents.accept_contracts()
+        self.agents.deliver_and_pay()
+
+
+scenarios = {'messages': Messages,
+             'trade': Trade,
+             'production': Production,
+             'logging': Logging,
+             'contracts': Contracts}
@@ -9,8 +9,7 @@ import platform
 
 cmdclass = {}
 
-install_requires = ['future',
-                    'dataset == 0.8']
+install_requires = ['future']
 
 
 readthedocs = os.environ.get('READTHEDOCS') == 'True'
@@ -14,6 +14,29 @@ import start_service
 import start_transform
 import start_messaging
 import start_messaging_with_envelope
+import start_group_views
+import start_placement
+import start_offer_book
+import start_clear_market
+import start_market
+import start_compact_inventory
+import start_columnar_logging
+import start_log_batching
+import start_agg_log
+import start_streaming_export
+import start_checkpoint
+import start_branch
+import start_sweep
+import start_profile
+import start_conditional
+import start_records
+import start_produce_all
+import start_production_functions
+import start_optimal_demand
+import start_expiring_goods
+import start_advance_round
+import start_action_exceptions
+import start_delete_release
 
 
 def run_test(name, test):
@@ -45,3 +68,26 @@ if __name__ == '__main__':
     run_test("Test Transform method", start_transform)
     run_test("Messaging", start_messaging)
     run_test("Messaging with envelope", start_messaging_with_envelope)
+    run_test("Group views", start_group_views)
+    run_test("Placement", start_placement)
+    run_test("Offer book", start_offer_book)
+    run_test("Clear market", start_clear_market)
+    run_test("Market", start_market)
+    run_test("Compact inventory", start_compact_inventory)
+    run_test("Columnar logging", start_columnar_logging)
+    run_test("Log batching", start_log_batching)
+    run_test("Aggregate logging", start_agg_log)
+    run_test("Streaming export", start_streaming_export)
+    run_test("Checkpoint", start_checkpoint)
+    run_test("Branch", start_branch)
+    run_test("Sweep", start_sweep)
+    run_test("Profile", start_profile)
+    run_test("Conditional actions", start_conditional)
+    run_test("Slotted records", start_records)
+    run_test("Produce all", start_produce_all)
+    run_test("Production functions", start_production_functions)
+    run_test("Optimal demand", start_optimal_demand)
+    run_test("Expiring goods", start_expiring_goods)
+    run_test("Advance round", start_advance_round)
+    run_test("Action exceptions", start_action_exceptions)
+    run_test("Delete release", start_delete_release)
@@ -0,0 +1,49 @@
+import abcEconomics
+from abcEconomics import NotEnoughGoods
+
+
+class Spender(abcEconomics.Agent):
+    def init(self, num_spenders):
+        self.num_spenders = num_spenders
+        self.create('money', 10)
+
+    def spend(self, quantity):
+        if self.id == self.num_spenders - 1:
+            self.destroy('money', quantity)
+        else:
+            self.destroy('money', 1)
+
+    def talk(self):
+        self.send(('spender', (self.id + 1) % self.num_spenders), 'note', self.id)
+
+    def listen(self):
+        assert self.get_messages('note') == [(self.id - 1) % self.num_spenders]
+
+    def money(self):
+        return self.id, self['money']
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    spenders = sim.build_agents(Spender, 'spender', number=4, num_spenders=4)
+    for r in range(rounds):
+        sim.advance_round(r)
+        try:
+            spenders.spend(quantity=100)
+        except NotEnoughGoods:
+            pass
+        else:
+            raise Exception('spend did not raise NotEnoughGoods')
+        # the simulation goes on after the exception of an agent's action
+        spenders.talk()
+        spenders.listen()
+        assert dict(spenders.money()) == {0: 9, 1: 9, 2: 9, 3: 10}
+        spenders.create('money', 1)
+        spenders[3].destroy('money', 1)
+    sim.finalize()
+    print('Test action exceptions:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,82 @@
+import csv
+import os
+
+import abcEconomics
+
+
+class Baker(abcEconomics.Agent):
+    def init(self):
+        self.declare_perishable('bread')
+        self._inventory._declare_expiring('flour', 2)
+
+    def bake(self, time):
+        assert self['bread'] == 0, self['bread']
+        assert self.time == time
+        self.create('bread', 10)
+        self.create('flour', 1)
+        assert float(self['flour']) == (1 if time == 0 else 2)
+        if self.id % 2 == 0:
+            self.sell(('customer', self.id), 'bread', 2 + self.id, price=1)
+
+    def collect(self):
+        """ settles the sales before the bread perishes """
+        assert self['bread'] == 10 - (2 + self.id if self.id % 2 == 0 else 0)
+
+
+class Customer(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 1000)
+        self.declare_perishable('bread')
+        self.rounds = []
+
+    def buy(self):
+        for offer in self.get_offers('bread'):
+            self.accept(offer)
+
+    def _advance_round(self, time, str_time):
+        super()._advance_round(time, str_time)
+        assert self.time == time
+        self.rounds.append(time)
+
+    def set_time(self, time):
+        if self.id == 0:
+            self.time = ('custom', time)
+        return self.id, self.time
+
+    def get_rounds(self):
+        return self.rounds
+
+    def eat(self):
+        return self['bread']
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes, trade_logging='individual')
+    bakers = sim.build_agents(Baker, 'baker', number=4)
+    customers = sim.build_agents(Customer, 'customer', number=4)
+    for r in range(rounds):
+        sim.advance_round(r)
+        bakers.bake(time=r)
+        customers.buy()
+        bakers.collect()
+        assert sorted(customers.eat()) == [0, 0, 2, 4]
+        # an agent, that sets its time, does not change the time of the others,
+        # _advance_round checks that it has the shared time again in the next round
+        assert dict(customers.set_time(time=r)) == {0: ('custom', r), 1: r, 2: r, 3: r}
+    assert all(got == list(range(rounds)) for got in customers.get_rounds())
+    sim.finalize()
+
+    with open(os.path.join(sim.path, 'trade___trade.csv')) as trade_file:
+        trades = list(csv.DictReader(trade_file))
+    # the trades of the last round are written when the next round begins
+    assert len(trades) == 2 * (rounds - 1), trades
+    for trade in trades:
+        assert trade['good'] == 'bread'
+        assert trade['buyer'] == trade['seller'].replace('baker', 'customer')
+        assert float(trade['quantity']) == 2 + int(trade['seller'][len('baker_'):])
+    print('Test advance round:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,62 @@
+import csv
+import os
+import random
+import statistics
+import abcEconomics
+from abcEconomics.logger.online_variance import OnlineVariance, moments
+from tools import is_zero
+
+
+class Firm(abcEconomics.Agent):
+    def init(self):
+        self.output = self.id ** 2 / 3
+
+    def produce(self):
+        self.create('money', self.id + 0.5)
+
+
+class Bank(Firm):
+    pass
+
+
+def main(processes, rounds):
+    values = [random.uniform(-10, 10) for _ in range(101)]
+    sequential = OnlineVariance()
+    for value in values:
+        sequential.update(value)
+    merged = OnlineVariance()
+    for start in range(0, 101, 17):
+        merged.merge(*moments(values[start:start + 17]))
+    merged.merge(0, 0.0, 0.0)
+    assert merged.n == sequential.n == 101
+    assert is_zero(merged.mean() - statistics.mean(values))
+    assert is_zero(merged.std() - statistics.stdev(values))
+    assert is_zero(merged.std() - sequential.std())
+
+    sim = abcEconomics.Simulation(name='agg_log', processes=processes)
+    firms = sim.build_agents(Firm, 'firm', 11)
+    banks = sim.build_agents(Bank, 'bank', 4)
+    for r in range(rounds):
+        sim.advance_round(r)
+        (firms + banks).produce()
+        (firms + banks).agg_log(variables=['output'], goods=['money'])
+    sim.finalize()
+
+    for group, number in (('firm', 11), ('bank', 4)):
+        with open(os.path.join(sim.path, 'aggregate_%s.csv' % group)) as table:
+            rows = list(csv.DictReader(table))
+        assert len(rows) == rounds
+        output = [id ** 2 / 3 for id in range(number)]
+        for r, row in enumerate(rows):
+            money = [(id + 0.5) * (r + 1) for id in range(number)]
+            assert row['round'] == str(r)
+            assert is_zero(float(row['output_mean']) - statistics.mean(output))
+            assert is_zero(float(row['output_std']) - statistics.stdev(output))
+            assert is_zero(float(row['money_ttl']) - sum(money))
+            assert is_zero(float(row['money_std']) - statistics.stdev(money))
+    print('Test agg_log:\t\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=5)
+    main(processes=3, rounds=5)
@@ -0,0 +1,57 @@
+import csv
+import os
+
+import abcEconomics
+
+
+class Saver(abcEconomics.Agent):
+    def init(self):
+        self.income = 10
+
+    def earn(self):
+        self.create('money', self.income)
+        self.log('money', self['money'])
+
+    def set_income(self, income):
+        self.income = income
+
+    def money(self):
+        return self['money']
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    savers = sim.build_agents(Saver, 'saver', number=4)
+    everybody = savers + savers
+    for r in range(5):
+        sim.advance_round(r)
+        savers.earn()
+
+    def policy(simulation, branch):
+        everybody.set_income(branch)
+        for r in range(5, 10):
+            simulation.advance_round(r)
+            savers.earn()
+        assert len(savers.create_agents(Saver, number=1)) == 1
+        return sorted(savers.money())
+
+    results = sim.branch(3, policy, parallel=2)
+    assert results == [[0] + [50 + branch * 5] * 4 for branch in range(3)], results
+
+    assert sorted(savers.money()) == [50] * 4
+    sim.advance_round(5)
+    savers.earn()
+    assert sorted(savers.money()) == [60] * 4
+    sim.finalize()
+
+    for branch in range(3):
+        with open(os.path.join(sim.path, 'branch_%i' % branch, 'panel_saver.csv')) as panel:
+            rows = list(csv.DictReader(panel))
+        assert len(rows) == 4 * 5
+        assert {row['round'] for row in rows} == {str(r) for r in range(5, 10)}
+    print('Test branch:\t\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,76 @@
+import os
+import random
+import shutil
+import tempfile
+
+import abcEconomics
+
+
+class Trader(abcEconomics.Agent):
+    def init(self, num_traders):
+        self.num_traders = num_traders
+        self.create('money', 100)
+        self.create('apple', 50)
+        self.draws = []
+        self.received = []
+
+    def buy(self):
+        for offer in self.get_offers('apple'):
+            self.accept(offer)
+        self.received.extend(self.get_messages('hello'))
+
+    def offer(self):
+        neighbour = ('trader', (self.id + 1) % self.num_traders)
+        self.draws.append(random.random())
+        self.sell(neighbour, 'apple', 1, price=random.randint(1, 5))
+        self.send(neighbour, 'hello', (self.id, self.time))
+
+    def state(self):
+        return (self.name, self['money'], self['apple'], self.not_reserved('apple'),
+                self.draws, self.received, self.time)
+
+
+def run(sim, traders, rounds):
+    states = []
+    for r in range(sim.time + 1, rounds):
+        sim.advance_round(r)
+        traders.buy()
+        traders.offer()
+        states.append(sorted(traders.state()))
+    return states
+
+
+def main(processes, rounds):
+    directory = tempfile.mkdtemp()
+    try:
+        for compact_inventory in (False, True):
+            checkpoint = os.path.join(directory, str(compact_inventory))
+            sim = abcEconomics.Simulation(name='unittest', processes=processes,
+                                          compact_inventory=compact_inventory)
+            traders = sim.build_agents(Trader, 'trader', number=5, num_traders=5)
+            sim.advance_round(0)
+            traders.offer()
+            run(sim, traders, rounds // 2)
+            sim.checkpoint(checkpoint)
+            continued = run(sim, traders, rounds)
+            sim.finalize()
+
+            sim = abcEconomics.Simulation(name='unittest', processes=processes,
+                                          compact_inventory=compact_inventory)
+            traders = sim.restore(checkpoint)['trader']
+            assert sim.time == rounds // 2 - 1
+            assert len(traders) == 5
+            restored = run(sim, traders, rounds)
+            assert restored == continued, (restored, continued)
+            assert restored[-1][0][3] == 49
+            new = traders.create_agents(Trader, number=1, num_traders=5)
+            assert list(new) == [('trader', 5)]
+            sim.finalize()
+    finally:
+        shutil.rmtree(directory)
+    print('Test checkpoint:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 10)
+    main(2, 10)
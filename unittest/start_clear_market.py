@@ -0,0 +1,92 @@
+import abcEconomics
+from abcEconomics import Simulation, NotEnoughGoods
+from tools import is_zero
+
+
+class Seller(abcEconomics.Agent):
+    def init(self):
+        self.create('bread', 2)
+
+    def offer(self):
+        self.sell(('buyer', 0), 'bread', 1, price=self.id + 1)
+        self.sell(('buyer', 1), 'bread', 1, price=self.id + 1)
+
+    def check(self):
+        sold = (1 if self.id < 4 else 0) + {0: 1, 1: 1, 2: 0.5}.get(self.id, 0)
+        assert is_zero(self['bread'] - (2 - sold)), (self.name, self['bread'])
+        assert is_zero(self.not_reserved('bread') - (2 - sold))
+        assert is_zero(self['money'] - sold * (self.id + 1)), (self.name, self['money'])
+
+
+class Procurer(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 100)
+
+    def offer(self):
+        self.buy(('buyer', 2), 'bread', 1, price=self.id + 1)
+
+    def check(self):
+        bought = {9: 1, 8: 1, 7: 1, 6: 0.5}.get(self.id, 0)
+        assert is_zero(self['bread'] - bought), (self.name, self['bread'])
+        assert is_zero(self.not_reserved('money') - (100 - bought * (self.id + 1)))
+
+
+class Buyer(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 10)
+        if self.id == 2:
+            self.create('bread', 3.5)
+
+    def clear(self):
+        if self.id == 0:
+            change = self.clear_market('bread', limit_price=8)
+            assert change == {'bread': 4, 'money': -10}, change
+        elif self.id == 1:
+            offers = self.get_offers('bread')
+            try:
+                self.accept_many(offers)
+            except NotEnoughGoods:
+                pass
+            else:
+                raise Exception('accepted offers worth more than the money of the agent')
+            try:
+                self.accept_many(offers[:1], [2])
+            except AssertionError:
+                pass
+            else:
+                raise Exception('accepted more than offered')
+            assert self['money'] == 10 and self['bread'] == 0
+            change = self.accept_many(offers[:3], [1, 1, 0.5])
+            assert change == {'bread': 2.5, 'money': -4.5}, change
+        elif self.id == 2:
+            self.clear_market('bread', max_quantity=3.5)
+
+    def check(self):
+        if self.id == 0:
+            assert self['bread'] == 4
+            assert self['money'] == 0
+        elif self.id == 1:
+            assert self['bread'] == 2.5
+            assert self['money'] == 5.5
+        elif self.id == 2:
+            assert is_zero(self['bread'])
+            assert is_zero(self['money'] - 10 - 10 - 9 - 8 - 3.5)
+
+
+def main(processes, rounds):
+    for offer_book in [False, True]:
+        s = Simulation(processes=processes, name='unittest', offer_book=offer_book)
+        sellers = s.build_agents(Seller, 'seller', 10)
+        procurers = s.build_agents(Procurer, 'procurer', 10)
+        buyers = s.build_agents(Buyer, 'buyer', 3)
+        s.advance_round(0)
+        (sellers + procurers).offer()
+        buyers.clear()
+        (sellers + procurers + buyers).check()
+        s.finalize()
+    print('Test clear_market and accept_many:\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=1)
+    main(processes=2, rounds=1)
@@ -0,0 +1,49 @@
+import os
+import platform
+import abcEconomics
+from abcEconomics.logger.columnar import Table
+import start_logging_test
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def main(processes, rounds):
+    chunk_size = Table.chunk_size
+    Table.chunk_size = 7
+    try:
+        start_logging_test.main(processes, rounds)
+    finally:
+        Table.chunk_size = chunk_size
+
+    table = Table('test')
+    for i in range(5):
+        table.append({'a': i, 'b': 'x'})
+    table.append({'a': 1.5, 'c': None})
+    table.append({'a': 'text', 'b': 'y', 'c': 2})
+    rows = list(table.rows())
+    assert rows[0] == {'a': 0, 'b': 'x', 'c': None}, rows[0]
+    assert rows[5] == {'a': 1.5, 'b': None, 'c': None}, rows[5]
+    assert rows[6] == {'a': 'text', 'b': 'y', 'c': 2}, rows[6]
+
+    simulation = abcEconomics.Simulation(name='logging_test', processes=processes)
+    agents = simulation.build_agents(start_logging_test.Agent, 'agent', 10)
+    for rnd in range(3):
+        simulation.advance_round(rnd)
+        agents.go()
+    simulation.finalize()
+    directory = os.path.join(simulation.path, 'columns', 'panel___agent___li')
+    chunks = sorted(os.listdir(directory))
+    assert len(chunks) == 1, chunks
+    if np is not None:
+        chunk = np.load(os.path.join(directory, chunks[0]))
+        assert sorted(chunk['li'].tolist()) == sorted(list(range(10)) * 3)
+        assert chunk['li'].dtype == np.int64
+    print('Test columnar logging:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=None)
+    if (platform.system() != 'Windows' and platform.python_implementation() != 'PyPy'):
+        main(processes=2, rounds=None)
@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+import abcEconomics
+from abcEconomics import Simulation
+from tools import is_zero
+
+
+class Holder(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 10 + self.id)
+        for i in range(12):
+            self.create('good%i' % i, i)
+        self._inventory._declare_expiring('capital', 2)
+        self.create('capital', 5)
+        assert float(self['capital']) == 5
+
+    def give_money(self):
+        self.give(('holder', (self.id + 1) % 10), 'money', 1)
+
+    def sell_goods(self):
+        if self.id % 2 == 0:
+            self.sell(('holder', self.id + 1), 'good11', 1, price=1)
+            assert self.not_reserved('good11') == self['good11'] - 1
+
+    def buy_goods(self):
+        for offer in self.get_offers('good11'):
+            self.accept(offer)
+
+    def check(self, round):
+        trades = round + 1
+        if self.id % 2 == 0:
+            assert is_zero(self['good11'] - (11 - trades)), self['good11']
+            assert is_zero(self['money'] - (10 + self.id + trades)), self['money']
+        else:
+            assert is_zero(self['good11'] - (11 + trades)), self['good11']
+            assert is_zero(self['money'] - (10 + self.id - trades)), self['money']
+        possessions = self.possessions()
+        assert possessions['good3'] == 3
+        assert possessions.get('good0', 0) == 0
+        assert float(self['capital']) == 5
+        assert self['unknown'] == 0
+        haves = self._inventory.haves
+        assert 'good3' in haves and 'never_held' not in haves
+        assert haves.get('good3') == 3 and haves.get('never_held', -1) == -1
+        assert {'money', 'good3', 'capital'} <= set(haves.keys())
+        assert dict(haves.items())['good3'] == 3
+        if not isinstance(haves, defaultdict):
+            # good0 has a column in the table, but the row holds none of it
+            assert 'good0' not in haves and len(haves) == len(list(haves))
+        self.create('capital', 5)  # replaces the capital, that expires next round
+
+
+def main(processes, rounds):
+    for compact_inventory in (False, True, ['money', 'good11']):
+        s = Simulation(processes=processes, name='unittest', compact_inventory=compact_inventory)
+        holders = s.build_agents(Holder, 'holder', 10, placement='communication')
+        for r in range(rounds):
+            s.advance_round(r)
+            holders.give_money()
+            holders.sell_goods()
+            holders.buy_goods()
+            holders.check(r)
+            assert is_zero(holders.total('money') - 145), holders.total('money')
+            assert is_zero(holders.total('good11') - 110)
+            assert holders.total('good3') == 30
+            assert holders.total('unknown') == 0
+            assert holders.total('capital') == 100
+            assert holders[[0, 1, 2, 3, 4]].total('good5') == 25
+            if processes > 1 and r == 1:
+                s.scheduler.migrate({('holder', 0): 1, ('holder', 1): 0})
+        s.finalize()
+    print('Test compact inventory:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=5)
+    main(processes=2, rounds=5)
@@ -0,0 +1,86 @@
+import abcEconomics
+from abcEconomics import conditional
+
+
+class Shop(abcEconomics.Agent):
+    def init(self):
+        self.handled = 0
+        self.logged = 0
+        self.create('stock', 10)
+
+    def idle(self):
+        pass
+
+    @conditional(topics=['order'])
+    def handle_orders(self):
+        orders = self.get_messages('order')
+        assert orders
+        self.handled += len(orders)
+        self.destroy('stock', len(orders))
+        return self.id
+
+    @conditional(topics=['order'])
+    def log_orders(self):
+        """ watches the same topic as handle_orders, without reading the messages """
+        self.logged += 1
+        return self.id
+
+    @conditional(guard=lambda self: self['stock'] < 10)
+    def restock(self):
+        self.create('stock', 10 - self['stock'])
+        return self.id
+
+    @conditional(topics=['order', 'complaint'], guard=lambda self: self['stock'] < 10)
+    def answer(self):
+        self.get_messages('order')
+        self.get_messages('complaint')
+        return self.id
+
+    def get_handled(self):
+        return self.handled
+
+
+class Customer(abcEconomics.Agent):
+    def init(self, num_shops):
+        self.num_shops = num_shops
+
+    def order(self, time):
+        self.send(('shop', time % self.num_shops), 'order', 'bread')
+
+    def complain(self, time):
+        self.send(('shop', (time + 1) % self.num_shops), 'complaint', 'stale')
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    shops = sim.build_agents(Shop, 'shop', number=7)
+    customers = sim.build_agents(Customer, 'customer', number=3, num_shops=7)
+    for r in range(rounds):
+        sim.advance_round(r)
+        assert list(shops.handle_orders()) == []
+        customers.order(time=r)
+        shops.idle()
+        assert list(shops.log_orders()) == [r % 7]
+        assert list(shops.handle_orders()) == [r % 7]
+        assert list(shops.log_orders()) == []
+        assert list(shops.handle_orders()) == []
+        assert list(shops.restock()) == [r % 7]
+        assert list(shops.restock()) == []
+
+        customers.order(time=r)
+        customers.complain(time=r)
+        assert list(shops[r % 7, (r + 1) % 7].answer()) == []
+        customers.order(time=r)
+        customers.complain(time=r)
+        shops.handle_orders()
+        assert list(shops.restock()) == [r % 7]
+        assert list(shops.log_orders()) == [r % 7]
+        shops.idle()
+    assert sorted(shops.get_handled()) == sorted(3 * 3 * len(range(i, rounds, 7)) for i in range(7))
+    sim.finalize()
+    print('Test conditional actions:\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
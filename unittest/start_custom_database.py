@@ -1,14 +1,16 @@
+import sqlite3
+
 import abcEconomics
-import dataset
 
 
 class CustomLogging:
-    def __init__(self, dbprotocolname, tablename):
-        self.db = dataset.connect(dbprotocolname)
-        self.table = self.db[tablename]
+    def __init__(self, dbname, tablename):
+        self.db = sqlite3.connect(dbname)
+        self.tablename = tablename
+        self.db.execute('CREATE TABLE %s (name TEXT, m INTEGER)' % tablename)
 
     def write_everything(self, **kveverything):
-        self.table.insert(kveverything)
+        self.db.execute('INSERT INTO %s (name, m) VALUES (:name, :m)' % self.tablename, kveverything)
 
     def close(self):
         self.db.commit()
@@ -20,7 +22,7 @@ class MyAgent(abcEconomics.Agent):
 
 
 def main(processes, rounds):
-    sim = abcEconomics.Simulation(name='mysim', processes=processes, dbplugin=CustomLogging, dbpluginargs=['sqlite:///:memory:', 'sometable'])
+    sim = abcEconomics.Simulation(name='mysim', processes=processes, dbplugin=CustomLogging, dbpluginargs=[':memory:', 'sometable'])
 
     myagents = sim.build_agents(MyAgent, 'myagent', number=5)
 
@@ -0,0 +1,48 @@
+import abcEconomics
+from abcEconomics import Simulation
+
+
+class Trader(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 10)
+        self.create('bread', 1)
+
+    def offer(self):
+        if self.id == 0:
+            self.sell(('trader', 1), 'bread', 1, price=1)
+
+    def receive(self):
+        if self.id == 1:
+            assert len(self.get_offers('bread')) == 1
+
+
+def main(processes, rounds):
+    s = Simulation(processes=processes, name='unittest', offer_book=True, compact_inventory=True)
+    traders = s.build_agents(Trader, 'trader', 3)
+    s.advance_round(0)
+    traders.offer()
+    traders.receive()
+    if processes == 1:
+        scheduler = s.scheduler
+        slots = [scheduler._slot_of[('trader', id)] for id in (0, 1)]
+        offer, = scheduler.agents[('trader', 0)].given_offers.values()
+        row = scheduler.offer_book.row_of(offer)
+    traders.delete_agents([('trader', 0), ('trader', 1)])
+    assert traders.total('money') == 10
+    if processes == 1:
+        # the rows of the deleted agents are cleared and the offer, that
+        # is referenced by both, is retired
+        assert all(scheduler.inventory.rows[slot] is None for slot in slots)
+        assert sum(scheduler.inventory.haves) == 11
+        assert row in scheduler.offer_book._retired
+    for r in range(1, rounds):
+        s.advance_round(r)
+        traders.offer()
+        traders.receive()
+    s.finalize()
+    print('Test delete release:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=3)
+    main(processes=2, rounds=3)
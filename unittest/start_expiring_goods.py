@@ -0,0 +1,145 @@
+import pickle
+from collections import deque
+
+import abcEconomics
+from abcEconomics import Firm, NotEnoughGoods
+from abcEconomics import expiringgood
+from abcEconomics.expiringgood import ExpiringGood, CohortTable
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def isclose(a, b):
+    return abs(a - b) < 1e-9
+
+
+class Reference:
+    """ the cohorts of an expiring good, as a deque from old to new """
+    def __init__(self, duration, time_structure=()):
+        self.cohorts = deque(time_structure or [0] * duration)
+
+    def advance(self):
+        self.cohorts.popleft()
+        self.cohorts.append(0)
+
+    def take(self, quantity):
+        for i in range(len(self.cohorts)):
+            taken = min(quantity, self.cohorts[i])
+            self.cohorts[i] -= taken
+            quantity -= taken
+
+
+class Mill(abcEconomics.Agent):
+    def init(self):
+        self._inventory._declare_expiring('capital', 3)
+        self._inventory._declare_expiring('stock', 1)
+        self._inventory.create_timestructured('capital', [1, 2, 3])
+        self.capital = Reference(3, [1, 2, 3])
+        self.stock = Reference(1)
+
+    def work(self, time):
+        self.capital.advance()
+        self.stock.advance()
+        for good, reference in (('capital', self.capital), ('stock', self.stock)):
+            assert self[good].time_structure == list(reference.cohorts), (good, self[good].time_structure)
+            assert isclose(float(self[good]), sum(reference.cohorts))
+        self.create('capital', self.id + time)
+        self.capital.cohorts[-1] += self.id + time
+        self.create('stock', 2)
+        self.stock.cohorts[-1] += 2
+        used = min(float(self['capital']), 2.5)
+        self.destroy('capital', used)
+        self.capital.take(used)
+        assert self['capital'].time_structure == list(self.capital.cohorts)
+        assert self['capital'] >= 0 and self['capital'] - 1 == float(self['capital']) - 1
+
+
+class Bakery(abcEconomics.Agent, Firm):
+    def init(self):
+        self._inventory._declare_expiring('flour', 3)
+        self._inventory._declare_expiring('bread', 2)
+        self.pf = self.create_leontief('bread', {'flour': 2, 'water': 1})
+
+    def deliver(self):
+        self.create('flour', 3 + self.id)
+        self.create('water', 10)
+
+    def bake(self, inputs):
+        return self.id, self.produce(self.pf, inputs, results=True)
+
+    def cohorts(self):
+        return self.id, self['flour'].time_structure, self['bread'].time_structure, self['water']
+
+
+def main(processes, rounds):
+    good = ExpiringGood(3, [1, 2, 3])
+    good -= 2.5
+    assert good.time_structure == [0, 0.5, 3] and float(good) == 3.5
+    good += 4
+    assert good.time_structure == [0, 0.5, 7]
+    good._advance_round()
+    assert good.time_structure == [0.5, 7, 0] and good == 7.5
+    assert pickle.loads(pickle.dumps(good)).time_structure == [0.5, 7, 0]
+    try:
+        good -= 8
+    except NotEnoughGoods:
+        pass
+    else:
+        raise Exception('took more than the expiring good has')
+    assert good.time_structure == [0.5, 7, 0]
+
+    if np is not None:
+        table = CohortTable(4)
+        rows = np.array([table.add_row([1, 2, 3, 4]) for _ in range(5)])
+        table.advance()
+        table.consume(rows, np.array([0, 1, 2.5, 5, 9]))
+        assert [table.time_structure(row) for row in rows] == [[2, 3, 4, 0], [1, 3, 4, 0], [0, 2.5, 4, 0],
+                                                               [0, 0, 4, 0], [0, 0, 0, 0]]
+        assert list(table.totals) == [9, 8, 6.5, 4, 0]
+
+    # the same without NumPy
+    numpy, expiringgood.np = expiringgood.np, None
+    try:
+        table = CohortTable(4)
+        rows = [table.add_row([1, 2, 3, 4]) for _ in range(5)]
+        table.advance()
+        table.consume(rows, [0, 1, 2.5, 5, 9])
+        table.add_rows(rows[:2], [1, 2])
+        assert [table.time_structure(row) for row in rows] == [[2, 3, 4, 1], [1, 3, 4, 2], [0, 2.5, 4, 0],
+                                                               [0, 0, 4, 0], [0, 0, 0, 0]]
+        try:
+            table.consume(rows, [0, 0, 0, 0, 1])
+        except NotEnoughGoods:
+            pass
+        else:
+            raise Exception('consumed more than the cohorts have')
+        assert list(table.totals) == [10, 10, 6.5, 4, 0]
+    finally:
+        expiringgood.np = numpy
+
+    for compact_inventory in (False, True):
+        sim = abcEconomics.Simulation(name='unittest', processes=processes, compact_inventory=compact_inventory)
+        mills = sim.build_agents(Mill, 'mill', number=6)
+        bulk = sim.build_agents(Bakery, 'bulk', number=6)
+        single = sim.build_agents(Bakery, 'single', number=6)
+        inputs = {'flour': 2.5, 'water': 1}
+        for r in range(rounds):
+            sim.advance_round(r)
+            mills.work(time=r)
+            (bulk + single).deliver()
+            # produce_all takes the flour of all bakeries from the oldest cohorts in one step
+            bulk_results = bulk.produce_all('pf', inputs, results=True)
+            assert sorted(map(sorted, (result.items() for result in bulk_results))) == \
+                sorted(map(sorted, (result.items() for _, result in single.bake(inputs=inputs))))
+            assert sorted(bulk.cohorts()) == sorted(single.cohorts())
+            if processes > 1 and r == 1:
+                sim.scheduler.migrate({('mill', 0): 1, ('mill', 1): 0})
+        sim.finalize()
+    print('Test expiring goods:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,57 @@
+import platform
+import abcEconomics
+
+
+class MyAgent(abcEconomics.Agent):
+    def init(self):
+        pass
+
+    def say(self):
+        return self.name
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(processes=processes)
+
+    aagents = sim.build_agents(MyAgent, 'aagent', number=5)
+    bagents = sim.build_agents(MyAgent, 'bagent', number=5)
+
+    both = aagents + bagents
+    some = aagents[1, 3]
+    twice = both + aagents[2]
+
+    for r in range(rounds):
+        sim.advance_round(r)
+        assert set(both.say()) == aagents.names | bagents.names, (list(both.say()))
+        assert len(both) == len(aagents) + len(bagents)
+        assert sorted(some.say()) == [('aagent', 1), ('aagent', 3)], list(some.say())
+        assert sorted(twice.say()) == sorted(both.say()), list(twice.say())
+
+    bagents.create_agents(MyAgent, number=2)
+    assert set(both.say()) == aagents.names | bagents.names
+    assert len(both) == 12, len(both)
+
+    aagents.delete_agents([('aagent', 3)])
+    assert list(some.say()) == [('aagent', 1)], list(some.say())
+    assert ('aagent', 3) not in set(both.say())
+    assert len(both) == 11, len(both)
+    assert ('aagent', 3) not in both and ('aagent', 3) not in some
+    assert ('aagent', 1) in some and ('bagent', 6) in twice
+    assert twice.names == both.names
+
+    try:
+        aagents[3]
+    except KeyError:
+        pass
+    else:
+        raise AssertionError('deleted agent is still addressable')
+
+    sim.finalize()
+    print('Test group views:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=5)
+    if (platform.system() != 'Windows' and
+            platform.python_implementation() != 'PyPy'):
+        main(processes=2, rounds=5)
@@ -0,0 +1,43 @@
+import abcEconomics
+
+
+class Recorder:
+    def __init__(self):
+        self.last = {}
+
+    def record(self, name, round, number):
+        assert (round, number) > self.last.get(name, (-1, -1)), (name, round, number, self.last[name])
+        self.last[name] = (round, number)
+
+    def close(self):
+        pass
+
+
+class Writer(abcEconomics.Agent):
+    def init(self):
+        self.buffered = type(self.database_connection).__name__
+
+    def write(self):
+        for number in range(10):
+            self.custom_log('record', self.name, self.time, number)
+            self.log('number', number)
+        return self.buffered
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes,
+                                  dbplugin=Recorder)
+    writers = sim.build_agents(Writer, 'writer', number=7)
+    for r in range(rounds):
+        sim.advance_round(r)
+        assert set(writers.write()) == {'LogBuffer'}
+    sim.finalize()
+    recorder = sim._db.plugin
+    assert len(recorder.last) == 7
+    assert all(last == (rounds - 1, 9) for last in recorder.last.values()), recorder.last
+    print('Test log batching:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -2,7 +2,10 @@ import platform
 import csv
 import abcEconomics
 try:
-    from math import isclose
+    from math import isclose as _isclose
+
+    def isclose(a, b):
+        return _isclose(a, b, abs_tol=1e-12)
 except ImportError:
     def isclose(a, b):
         return a - 0.000001 < b < a + 0.000001
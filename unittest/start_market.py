@@ -0,0 +1,122 @@
+import abcEconomics
+from abcEconomics import Simulation, Market
+from tools import is_zero
+
+
+class Seller(abcEconomics.Agent):
+    def init(self):
+        self.create('bread', 1)
+
+    def offer(self):
+        self.order = self.limit_sell(('market', 0), 'bread', 1, price=self.id + 1)
+        assert self.not_reserved('bread') == 0
+
+    def cancel(self):
+        self.cancel_order(self.order)
+
+    def check_first(self):
+        if self.id < 5:
+            assert self.order.status == 'filled', self.order
+            assert self['money'] == self.id + 1
+            assert self['bread'] == 0
+        else:
+            assert self.order.status == 'open'
+            assert self['bread'] == 1
+
+    def check_last(self):
+        sold = {5: 1, 6: 1, 7: 0.5}.get(self.id, 1 if self.id < 5 else 0)
+        assert is_zero(self['bread'] - (1 - sold)), (self.name, self['bread'])
+        assert is_zero(self.not_reserved('bread') - (1 - sold))
+        assert is_zero(self['money'] - sold * (self.id + 1))
+        assert self.order.status == ('filled' if sold == 1 else 'cancelled'), self.order
+
+
+class Buyer(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 100)
+
+    def bid(self):
+        self.order = self.limit_buy(('market', 0), 'bread', 1, price=10 - self.id)
+
+    def cancel(self):
+        self.cancel_order(self.order)
+
+    def check_first(self):
+        if self.id < 5:
+            assert self.order.status == 'filled'
+            assert self['bread'] == 1
+            assert self['money'] == 100 - (self.id + 1)
+            assert self.not_reserved('money') == self['money']
+        else:
+            assert self.order.status == 'open'
+            assert self.not_reserved('money') == 100 - (10 - self.id)
+
+    def check_last(self):
+        if self.id < 5:
+            assert self['bread'] == 1
+        else:
+            assert self.order.status == 'cancelled'
+            assert self['money'] == 100 and self.not_reserved('money') == 100
+
+
+class BigBuyer(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 100)
+
+    def bid(self):
+        self.order = self.limit_buy(('market', 0), 'bread', 2.5, price=20)
+        assert self.not_reserved('money') == 100 - 2.5 * 20
+
+    def check_last(self):
+        assert self.order.status == 'filled', self.order
+        assert is_zero(self['bread'] - 2.5)
+        assert is_zero(self['money'] - (100 - 6 - 7 - 0.5 * 8))
+        assert is_zero(self.not_reserved('money') - self['money'])
+
+
+class FreeBidder(abcEconomics.Agent):
+    def init(self):
+        self.create('money', 0.3)
+
+    def bid(self):
+        # 0.3 - 0.1 - 0.2 leaves a tiny negative amount of money
+        self.destroy('money', 0.1)
+        self.destroy('money', 0.2)
+        self.order = self.limit_buy(('market', 0), 'bread', 1, price=0)
+        assert self.not_reserved('money') == self['money']
+
+    def check_last(self):
+        assert self.order.status == 'open', self.order
+        assert self['bread'] == 0
+
+
+def main(processes, rounds):
+    s = Simulation(processes=processes, name='unittest')
+    sellers = s.build_agents(Seller, 'seller', 10)
+    buyers = s.build_agents(Buyer, 'buyer', 10)
+    big_buyer = s.build_agents(BigBuyer, 'big_buyer', 1)
+    free_bidder = s.build_agents(FreeBidder, 'free_bidder', 1)
+    market = s.build_agents(Market, 'market', 1)
+    s.advance_round(0)
+    sellers.offer()
+    assert list(market.match()) == [0]
+    buyers.bid()
+    assert list(market.match()) == [5]
+    (sellers + buyers).check_first()
+    assert list(market.by_name(('market', 0)).order_book('bread')) == [
+        ([(5, 1), (4, 1), (3, 1), (2, 1), (1, 1)], [(6, 1), (7, 1), (8, 1), (9, 1), (10, 1)])]
+    big_buyer.bid()
+    assert list(market.match()) == [3]
+    (sellers + buyers).cancel()
+    market.match()
+    (sellers + buyers + big_buyer).check_last()
+    free_bidder.bid()
+    assert list(market.match()) == [0]
+    free_bidder.check_last()
+    s.finalize()
+    print('Test market:\t\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=1)
+    main(processes=2, rounds=1)
@@ -0,0 +1,42 @@
+from buy import Buy
+from sell import Sell
+from give import Give
+from abcEconomics import Simulation
+
+
+def main(processes, rounds):
+    s = Simulation(processes=processes, name='unittest', offer_book=True)
+
+    buy = s.build_agents(Buy, 'buy', 100, rounds=rounds)
+    sell = s.build_agents(Sell, 'sell', 100, rounds=rounds)
+    give = s.build_agents(Give, 'give', 2, rounds=rounds)
+
+    all = buy + sell + give
+
+    for r in range(rounds):
+        s.advance_round(r)
+        for _ in range(5):
+            buy.one()
+            buy.two()
+            buy.three()
+            buy.clean_up()
+        for _ in range(5):
+            sell.one()
+            sell.two()
+            sell.three()
+            sell.clean_up()
+        for _ in range(5):
+            give.one()
+            give.two()
+            give.three()
+            give.clean_up()
+        all.all_tests_completed()
+    s.finalize()
+    print('Test offer book:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=3)
+    print('Iteration with 1 core finished')
+    main(processes=2, rounds=3)
+    print('Iteration with multiple processes finished')
@@ -0,0 +1,116 @@
+import abcEconomics
+from abcEconomics import Firm, Household
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def isclose(a, b, tolerance=1e-9):
+    return abs(a - b) < tolerance * max(1, abs(a), abs(b))
+
+
+def cost(prices, inputs):
+    return sum(prices[good] * quantity for good, quantity in inputs.items())
+
+
+def assert_tangent(function, prices, inputs, output_price=None):
+    """ the marginal products are proportional to the prices, with
+    output_price they are equal to the prices """
+    gradient = function.gradient(inputs)
+    ratios = [gradient[good] / prices[good] for good in inputs]
+    for ratio in ratios:
+        assert isclose(ratio, ratios[0], 1e-7), ratios
+    if output_price is not None:
+        assert isclose(ratios[0] * output_price, 1, 1e-7), ratios
+
+
+class Workshop(abcEconomics.Agent, Firm):
+    def init(self, prices):
+        self.prices = prices
+        self.create('money', 100)
+        self.pf = self.create_cobb_douglas('tool', 1, {'labor': 0.5, 'capital': 0.5})
+
+    def buy_and_produce(self):
+        inputs = self.pf.budget_demand(self['money'], self.prices)
+        self.destroy('money', cost(self.prices, inputs))
+        for good, quantity in inputs.items():
+            self.create(good, quantity)
+        return self.produce(self.pf, inputs, results=True)['tool']
+
+
+def main(processes, rounds):
+    firm = Firm()
+    household = Household()
+    prices = {'labor': 2.0, 'capital': 5.0, 'wood': 1.5}
+    functions = {'cobb_douglas': firm.create_cobb_douglas('widget', 1.5, {'labor': 0.3, 'capital': 0.6}),
+                 'ces': firm.create_ces('widget', 0.5, 2, {'labor': 0.25, 'capital': 0.25, 'wood': 0.5}),
+                 'ces_equal': firm.create_ces('widget', -0.5, 3),
+                 'leontief': firm.create_leontief('widget', {'labor': 2, 'capital': 1}),
+                 'utility': household.create_cobb_douglas_utility_function({'labor': 0.2, 'wood': 0.8})}
+
+    for kind, function in functions.items():
+        goods = function.goods or tuple(prices)
+        some_prices = {good: prices[good] for good in goods}
+        inputs = function.cost_minimizing_demand(7, some_prices)
+        assert sorted(inputs) == sorted(goods)
+        assert isclose(function.quantity(inputs), 7), kind
+        assert isclose(function.cost(7, some_prices), cost(some_prices, inputs)), kind
+        if kind != 'leontief':
+            assert_tangent(function, some_prices, inputs)
+        else:
+            assert inputs == {'labor': 3.5, 'capital': 7}
+
+        inputs = function.budget_demand(40, some_prices)
+        assert isclose(cost(some_prices, inputs), 40), kind
+        if kind != 'leontief':
+            assert_tangent(function, some_prices, inputs)
+        else:
+            assert isclose(inputs['labor'] * 2, inputs['capital'])
+
+        if kind == 'cobb_douglas':
+            inputs = function.profit_maximizing_demand(10, some_prices)
+            assert_tangent(function, some_prices, inputs, output_price=10)
+            profit = 10 * function.quantity(inputs) - cost(some_prices, inputs)
+            for good in inputs:
+                for step in (0.99, 1.01):
+                    other = dict(inputs)
+                    other[good] *= step
+                    assert 10 * function.quantity(other) - cost(some_prices, other) < profit
+        elif kind != 'utility':
+            try:
+                function.profit_maximizing_demand(10, some_prices)
+            except ValueError:
+                pass
+            else:
+                raise Exception('constant returns to scale have no profit maximizing demand')
+
+        if np is not None and function.goods is not None:
+            matrix = np.array([[some_prices[good] * (1 + row / 10) for good in goods] for row in range(4)])
+            budgets = np.array([10, 20, 30, 40.0])
+            demand = function.budget_demand(budgets, matrix)
+            demands = function.cost_minimizing_demand(3, matrix)
+            assert demand.shape == demands.shape == matrix.shape
+            for row in range(4):
+                row_prices = dict(zip(goods, matrix[row]))
+                expected = function.budget_demand(budgets[row], row_prices)
+                assert np.allclose(demand[row], [expected[good] for good in goods], rtol=1e-12)
+                expected = function.cost_minimizing_demand(3, row_prices)
+                assert np.allclose(demands[row], [expected[good] for good in goods], rtol=1e-12)
+            assert np.allclose(function.cost(3, matrix), (demands * matrix).sum(axis=1), rtol=1e-12)
+
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    workshops = sim.build_agents(Workshop, 'workshop', number=4, prices={'labor': 1, 'capital': 4})
+    for r in range(rounds):
+        sim.advance_round(r)
+        for tools in workshops.buy_and_produce():
+            # half of the money for each input: 50 ** 0.5 * 12.5 ** 0.5 = 25
+            assert isclose(tools, 25), tools
+        workshops.create('money', 100)
+    sim.finalize()
+    print('Test optimal demand:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
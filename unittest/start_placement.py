@@ -0,0 +1,66 @@
+import os
+import platform
+import abcEconomics
+
+
+class Partner(abcEconomics.Agent):
+    def init(self):
+        self.partner = ('partner', self.id ^ 1)
+
+    def talk(self):
+        self.send(self.partner, 'chat', self.id)
+
+    def listen(self):
+        assert self.get_messages('chat') == [self.id ^ 1]
+
+    def where(self):
+        return self.id, os.getpid()
+
+
+class Heavy(abcEconomics.Agent):
+    placement_cost = 10
+
+    def init(self):
+        pass
+
+    def where(self):
+        return self.id, os.getpid()
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(processes=processes)
+
+    partners = sim.build_agents(Partner, 'partner', 20, placement='communication')
+    heavies = sim.build_agents(Heavy, 'heavy', 2, placement='weighted')
+    lights = sim.build_agents(Partner, 'light', 20, placement='weighted')
+    hashed = sim.build_agents(Heavy, 'hashed', 6, placement='hash')
+
+    for r in range(rounds):
+        sim.advance_round(r)
+        partners.talk()
+        partners.listen()
+        if r == 1:
+            moves = sim.rebalance()
+            if processes > 1:
+                assert len(moves) == 10, moves
+
+    pids = dict(partners.where())
+    for id in range(0, 20, 2):
+        assert pids[id] == pids[id + 1], pids
+
+    if processes == 2:
+        assert len(set(pid for _, pid in heavies.where())) == 2
+        assert len(set(pid for _, pid in lights.where())) == 2
+        # the hash placement is the same in every run
+        assert [sim.scheduler.directory[('hashed', id)] for id in range(6)] == [1, 0, 1, 0, 1, 0]
+        assert len(list(hashed.where())) == 6
+
+    sim.finalize()
+    print('Test placement and rebalance:\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(processes=1, rounds=5)
+    if (platform.system() != 'Windows' and
+            platform.python_implementation() != 'PyPy'):
+        main(processes=2, rounds=5)
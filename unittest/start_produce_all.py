@@ -0,0 +1,86 @@
+import abcEconomics
+from abcEconomics import Firm, NotEnoughGoods
+
+
+def isclose(a, b):
+    return abs(a - b) < 1e-9 * max(1, abs(a), abs(b))
+
+
+class Factory(abcEconomics.Agent, Firm):
+    def init(self, kind):
+        self.create('labor', 2 + self.id)
+        self.create('capital', 3 + self.id % 4)
+        self.create('energy', 1 + self.id % 3)
+        self.create('money', 10)
+        multiplier = 1 + self.id / 10
+        if kind == 'cobb_douglas':
+            self.pf = self.create_cobb_douglas('widget', multiplier, {'labor': 0.3 + self.id / 100, 'capital': 0.5})
+        elif kind == 'ces':
+            self.pf = self.create_ces('widget', 0.5 + self.id / 100, multiplier, {'labor': 0.4, 'capital': 0.6})
+        elif kind == 'ces_equal':
+            self.pf = self.create_ces('widget', -0.5, multiplier)
+        elif kind == 'leontief':
+            self.pf = self.create_leontief('widget', {'labor': 1 + self.id, 'capital': 2})
+        else:
+            def pf(labor, capital):
+                return {'widget': labor + capital, 'capital': capital * 0.5}
+            self.pf = pf
+
+    def replenish(self):
+        self.create('labor', 2)
+        self.create('capital', 2)
+        self.create('energy', 1)
+
+    def produce_one(self, input_goods):
+        return self.produce(self.pf, input_goods, results=True)
+
+    def goods(self):
+        return {good: self[good] for good in ['labor', 'capital', 'energy', 'widget', 'money']}
+
+
+def main(processes, rounds):
+    for compact_inventory in (False, True):
+        kinds = ['cobb_douglas', 'ces', 'ces_equal', 'leontief', 'custom']
+        sim = abcEconomics.Simulation(name='unittest', processes=processes, compact_inventory=compact_inventory)
+        bulk = {kind: sim.build_agents(Factory, 'bulk_' + kind, number=6, kind=kind) for kind in kinds}
+        single = {kind: sim.build_agents(Factory, 'single_' + kind, number=6, kind=kind) for kind in kinds}
+        for r in range(rounds):
+            sim.advance_round(r)
+            for kind in kinds:
+                (bulk[kind] + single[kind]).replenish()
+                input_goods = ['labor', 'capital'] if r % 2 else {'labor': 1, 'capital': 1}
+                if kind == 'ces_equal' and not r % 2:
+                    input_goods = {'labor': 1, 'capital': 1, 'energy': 0.5}
+                expected = list(single[kind].produce_one(input_goods=input_goods))
+                results = bulk[kind].produce_all('pf', input_goods, results=True)
+                assert len(results) == len(expected)
+                for got, want in zip(sorted(sorted(result.items()) for result in results),
+                                     sorted(sorted(result.items()) for result in expected)):
+                    assert [good for good, _ in got] == [good for good, _ in want], (got, want)
+                    for (good, quantity), (_, expected_quantity) in zip(got, want):
+                        assert isclose(quantity, expected_quantity), (kind, good, quantity, expected_quantity)
+                bulk_goods = sorted(sorted(goods.items()) for goods in bulk[kind].goods())
+                single_goods = sorted(sorted(goods.items()) for goods in single[kind].goods())
+                for b, s in zip(bulk_goods, single_goods):
+                    for (good, quantity), (_, expected_quantity) in zip(b, s):
+                        assert isclose(quantity, expected_quantity), (kind, good, quantity, expected_quantity)
+                assert isclose(bulk[kind].total('widget'), single[kind].total('widget'))
+
+        before = sorted(sorted(goods.items()) for goods in bulk['cobb_douglas'].goods())
+        try:
+            bulk['cobb_douglas'].produce_all('pf', {'labor': 1000, 'capital': 1})
+        except NotEnoughGoods:
+            pass
+        else:
+            raise Exception('produce_all did not raise NotEnoughGoods')
+        assert sorted(sorted(goods.items()) for goods in bulk['cobb_douglas'].goods()) == before
+        sim.advance_round(rounds)
+        bulk['cobb_douglas'].replenish()
+        assert len(bulk['cobb_douglas'].produce_all('pf', {'labor': 1, 'capital': 1}, results=True)) == 6
+        sim.finalize()
+    print('Test produce_all:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,112 @@
+import pickle
+
+import abcEconomics
+from abcEconomics import Firm, Household
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def isclose(a, b, tolerance=1e-9):
+    return abs(a - b) < tolerance * max(1, abs(a), abs(b))
+
+
+class Maker(abcEconomics.Agent, Firm, Household):
+    def init(self):
+        self.create('labor', 10)
+        self.create('capital', 20)
+        self.create('bread', 10)
+        self.create('milk', 10)
+        self.pf = self.create_cobb_douglas('widget', 2, {'labor': 0.4, 'capital': 0.5})
+        self.uf = self.create_cobb_douglas_utility_function({'bread': 0.7, 'milk': 0.3})
+
+    def work(self):
+        self.create('labor', 2)
+        self.create('capital', 2)
+        return self.produce(self.pf, {'labor': 1, 'capital': 1}, results=True)
+
+    def eat(self):
+        self.create('bread', 1)
+        self.create('milk', 1)
+        return self.consume(self.uf, {'bread': 1, 'milk': 1})
+
+
+def numerical_gradient(function, goods, step=1e-6):
+    ret = {}
+    for good in goods:
+        up = dict(goods)
+        down = dict(goods)
+        up[good] += step
+        down[good] -= step
+        ret[good] = (function.quantity(up) - function.quantity(down)) / (2 * step)
+    return ret
+
+
+def main(processes, rounds):
+    firm = Firm()
+    household = Household()
+    goods = {'labor': 3.0, 'capital': 7.0, 'wood': 2.0}
+    functions = {
+        'cobb_douglas': (firm.create_cobb_douglas('widget', 1.5, {'labor': 0.3, 'capital': 0.6}),
+                         1.5 * 3 ** 0.3 * 7 ** 0.6),
+        'ces': (firm.create_ces('widget', 0.5, 2, {'labor': 0.25, 'capital': 0.25, 'wood': 0.5}),
+                2 * (0.25 * 3 ** 0.5 + 0.25 * 7 ** 0.5 + 0.5 * 2 ** 0.5) ** 2),
+        'ces_equal': (firm.create_ces('widget', -0.5, 3),
+                      3 * ((3 ** -0.5 + 7 ** -0.5 + 2 ** -0.5) / 3) ** -2),
+        'leontief': (firm.create_leontief('widget', {'labor': 2, 'capital': 1}), 6),
+        'utility': (household.create_cobb_douglas_utility_function({'labor': 0.2, 'wood': 0.8}),
+                    3 ** 0.2 * 2 ** 0.8)}
+
+    for kind, (function, expected) in functions.items():
+        if kind == 'utility':
+            assert isclose(function(**goods), expected), kind
+        else:
+            assert isclose(function(**goods)['widget'], expected), kind
+        assert isclose(function.quantity(goods), expected), kind
+        copy = pickle.loads(pickle.dumps(function))
+        assert isclose(copy.quantity(goods), expected), kind
+        assert copy._batch[0] == function._batch[0]
+
+        gradient = function.gradient(goods)
+        if kind == 'leontief':
+            assert gradient == {'labor': 2, 'capital': 0}, gradient
+        else:
+            for good, marginal in numerical_gradient(function, goods).items():
+                if good in gradient:
+                    assert isclose(gradient[good], marginal, 1e-5), (kind, good, gradient[good], marginal)
+                else:
+                    assert marginal == 0, (kind, good)
+
+        if np is not None:
+            sample = {good: np.array([quantity, quantity + 1, quantity * 2]) for good, quantity in goods.items()}
+            values = function.quantity(sample)
+            gradients = function.gradient(sample)
+            for i in range(3):
+                point = {good: float(quantities[i]) for good, quantities in sample.items()}
+                assert isclose(values[i], function.quantity(point)), kind
+                for good, marginal in function.gradient(point).items():
+                    assert isclose(gradients[good][i], marginal), kind
+            if function.goods is not None:
+                matrix = np.column_stack([sample[good] for good in function.goods])
+                assert np.allclose(function.quantity(matrix), values, rtol=1e-12), kind
+                assert np.allclose(function.gradient(matrix),
+                                   np.column_stack([gradients[good] for good in function.goods]), rtol=1e-12)
+
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    makers = sim.build_agents(Maker, 'maker', number=4)
+    for r in range(rounds):
+        sim.advance_round(r)
+        for result in makers.work():
+            assert result == {'widget': 2, 'labor': -1, 'capital': -1}, result
+        for utility in makers.eat():
+            assert isclose(utility, 1)
+        makers.produce_all(functions['cobb_douglas'][0], {'labor': 1, 'capital': 1})
+        assert isclose(makers.total('widget'), 4 * (r + 1) * (2 + 1.5))
+    sim.finalize()
+    print('Test production functions:\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
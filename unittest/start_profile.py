@@ -0,0 +1,64 @@
+import csv
+import os
+
+import abcEconomics
+
+
+class Talker(abcEconomics.Agent):
+    def init(self, num_talkers):
+        self.num_talkers = num_talkers
+        self.create('apple', 100)
+
+    def talk(self):
+        for other in range(self.num_talkers):
+            self.send(('talker', other), 'chat', 'hello %i' % self.id)
+        self.give(('talker', (self.id + 1) % self.num_talkers), 'apple', 1)
+
+    def listen(self):
+        assert len(self.get_messages('chat')) == self.num_talkers
+
+
+def read_csv(path):
+    with open(path) as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes, profile=True)
+    talkers = sim.build_agents(Talker, 'talker', number=4, num_talkers=4)
+    for r in range(rounds):
+        sim.advance_round(r)
+        talkers.talk()
+        talkers.listen()
+    sim.finalize()
+
+    rows = read_csv(os.path.join(sim.path, 'profile.csv'))
+    assert {row['round'] for row in rows} == {str(r) for r in range(rounds)}
+    assert {row['shard'] for row in rows} == {str(shard) for shard in range(processes)}
+    for r in range(rounds):
+        round_rows = [row for row in rows if row['round'] == str(r)]
+        for action in ('talker.talk', 'talker.listen'):
+            assert sum(int(row['count']) for row in round_rows if row['name'] == action) == 4
+        chat = [row for row in round_rows if row['category'] == 'topic' and row['name'] == 'chat']
+        assert sum(int(row['count']) for row in chat) == 16
+        frames = [row for row in round_rows if row['category'] == 'frame']
+        # one frame per post_messages to every other process, talk and give
+        assert sum(int(row['count']) for row in frames) == 2 * processes * (processes - 1)
+        assert (sum(int(row['bytes']) for row in frames) > 0) == (processes > 1)
+        phases = {row['name'] for row in round_rows if row['category'] == 'phase'}
+        assert {'execute', 'message_clearing', 'reject', 'post_messages'} <= phases, phases
+        assert all(float(row['seconds']) >= 0 for row in round_rows if row['category'] in ('action', 'phase'))
+
+    round_rows = read_csv(os.path.join(sim.path, 'profile_round.csv'))
+    assert [row['round'] for row in round_rows] == [str(r) for r in range(rounds)]
+    for row in round_rows:
+        assert float(row['imbalance']) >= 1
+        assert int(row['queue_depth']) >= 0
+        assert float(row['database_seconds']) >= 0
+        assert float(row['seconds']) >= float(row['busy_max'])
+    print('Test profile:\t\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,65 @@
+import pickle
+
+import abcEconomics
+from abcEconomics.agents.trader import Offer
+from abcEconomics.agents.messenger import Message
+from abcEconomics.contracts.contracting import Contract, HISTORY
+
+
+class Pen(abcEconomics.Agent):
+    def init(self, num_pens):
+        self.num_pens = num_pens
+        self.create('ink', 10)
+
+    def write(self):
+        self.send_envelope(('pen', (self.id + 1) % self.num_pens), 'letter', {'from': self.id})
+        self.sell(('pen', (self.id + 1) % self.num_pens), 'ink', 1, 0)
+
+    def read(self):
+        letters = self.get_messages('letter')
+        assert len(letters) == 1
+        assert letters[0].content == {'from': (self.id - 1) % self.num_pens}
+        assert letters[0].sender == ('pen', (self.id - 1) % self.num_pens)
+        for offer in self.get_offers('ink'):
+            assert not hasattr(offer, '__dict__')
+            self.accept(offer)
+
+
+def roundtrip(record):
+    return pickle.loads(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def main(processes, rounds):
+    offer = Offer(('firm', 1), ('household', 2), 'bread', 3, 1.5, 'money', True, 'new', -2, 7, 0, -2)
+    assert not hasattr(offer, '__dict__')
+    copy = roundtrip(offer)
+    for field in Offer.__slots__:
+        assert getattr(copy, field) == getattr(offer, field), field
+
+    message = roundtrip(Message(('firm', 1), ('household', 2), 'm', [1, 2]))
+    assert (message.sender, message.receiver, message.topic, message.content) == (('firm', 1), ('household', 2),
+                                                                                 'm', [1, 2])
+
+    contract = Contract('firm', 1, 'firm', 1, 'household', 2, 'labor', 5, 10, None, 3, 0)
+    for r in range(rounds):
+        contract.delivered.append(r)
+        contract.paid.append(r)
+    assert list(contract.paid) == list(range(rounds))[-HISTORY:]
+    copy = roundtrip(contract)
+    assert list(copy.delivered) == list(contract.delivered)
+    copy.paid.append(rounds)
+    assert len(copy.paid) == min(HISTORY, rounds + 1)
+
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    pens = sim.build_agents(Pen, 'pen', number=5, num_pens=5)
+    for r in range(rounds):
+        sim.advance_round(r)
+        pens.write()
+        pens.read()
+    sim.finalize()
+    print('Test slotted records:\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
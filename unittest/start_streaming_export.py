@@ -0,0 +1,74 @@
+import csv
+import os
+import time
+
+import abcEconomics
+
+
+class Writer(abcEconomics.Agent):
+    def init(self):
+        self.number = self.id
+
+    def write(self):
+        self.log('number', self.id)
+        if self.time >= 3:
+            self.log('late', self.time)
+
+
+def read_csv(path):
+    try:
+        with open(path) as csv_file:
+            return list(csv.DictReader(csv_file))
+    except FileNotFoundError:
+        return []
+
+
+def wait_for_round(path, round):
+    """ the rows of a completed round are written by the database thread """
+    for _ in range(1000):
+        rows = read_csv(path)
+        if any(row['round'] == str(round) for row in rows):
+            return rows
+        time.sleep(0.01)
+    raise AssertionError('round %i not in %s' % (round, path))
+
+
+def main(processes, rounds):
+    sim = abcEconomics.Simulation(name='unittest', processes=processes)
+    writers = sim.build_agents(Writer, 'writer', number=6)
+    panel = os.path.join(sim.path, 'panel_writer.csv')
+    headers = set()
+    for r in range(rounds):
+        sim.advance_round(r)
+        writers.write()
+        writers.agg_log(variables=['number'])
+        if r >= 1:
+            rows = wait_for_round(panel, r - 1)
+            assert not any(row['round'] == str(r) for row in rows)
+            assert len(rows) in (6 * r, 6 * (r + 1))
+            with open(panel) as csv_file:
+                headers.add(csv_file.readline())
+    # the new column 'late' does not rewrite the file while the simulation runs
+    assert len(headers) == 1, headers
+    sim.finalize()
+
+    rows = read_csv(panel)
+    assert len(rows) == 6 * rounds
+    assert [row['index'] for row in rows] == [str(i) for i in range(1, 6 * rounds + 1)]
+    for row in rows:
+        assert row['number'] == row['name'][len('writer'):]
+        assert row['late'] == ('' if int(row['round']) < 3 else row['round'])
+
+    aggregated = read_csv(os.path.join(sim.path, 'aggregated_writer.csv'))
+    assert [row['round'] for row in aggregated] == [str(r) for r in range(rounds)]
+    assert all(float(row['number_ttl']) == 15 for row in aggregated)
+
+    aggregate = read_csv(os.path.join(sim.path, 'aggregate_writer.csv'))
+    assert [row['round'] for row in aggregate] == [str(r) for r in range(rounds)]
+    assert all(float(row['number_mean']) == 2.5 for row in aggregate)
+    print('Test streaming export:\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)
@@ -0,0 +1,72 @@
+import csv
+import os
+import random
+import shutil
+import tempfile
+
+import abcEconomics
+
+
+class Farmer(abcEconomics.Agent):
+    def init(self, harvest):
+        self.harvest = harvest
+        self.luck = 0
+
+    def farm(self):
+        self.luck = random.random()
+        self.create('corn', self.harvest)
+
+    def get_luck(self):
+        return self.luck
+
+
+def model(parameters):
+    sim = abcEconomics.Simulation(name='sweep', random_seed=parameters['random_seed'],
+                                  path=parameters['path'])
+    farmers = sim.build_agents(Farmer, 'farmer', number=parameters['farmers'],
+                               harvest=parameters['harvest'])
+    for r in range(3):
+        sim.advance_round(r)
+        farmers.farm()
+        farmers.agg_log(goods=['corn'], variables=['luck'])
+    luck = sorted(farmers.get_luck())
+    sim.finalize()
+    return luck
+
+
+def main(processes, rounds):
+    directory = tempfile.mkdtemp()
+    try:
+        runs = abcEconomics.sweep(model, {'farmers': [2, 3], 'harvest': [1, 10]},
+                                  workers=processes, repetitions=2, random_seed=7,
+                                  path=os.path.join(directory, 'sweep'))
+        assert len(runs) == 8
+        assert [parameters['random_seed'] for parameters, _ in runs] == list(range(7, 15))
+        assert len({parameters['path'] for parameters, _ in runs}) == 8
+        assert runs[0][0]['farmers'] == 2 and runs[0][0]['harvest'] == 1
+        assert runs[0][1] != runs[1][1]
+
+        again = abcEconomics.sweep(model, [{'farmers': 2, 'harvest': 1, 'random_seed': 7}],
+                                   workers=processes, path=os.path.join(directory, 'again'))
+        assert again[0][1] == runs[0][1]
+
+        repeated = abcEconomics.sweep(model, [{'farmers': 2, 'harvest': 1, 'random_seed': 7}],
+                                      workers=processes, repetitions=2, path=os.path.join(directory, 'repeated'))
+        assert [parameters['random_seed'] for parameters, _ in repeated] == [7, 8]
+        assert repeated[0][1] == runs[0][1] and repeated[1][1] == runs[1][1]
+
+        with open(os.path.join(directory, 'sweep', 'aggregate_farmer.csv')) as table:
+            rows = list(csv.DictReader(table))
+        assert len(rows) == 8 * 3
+        for row in rows:
+            parameters = runs[int(row['run'])][0]
+            assert int(row['farmers']) == parameters['farmers']
+            assert float(row['corn_ttl']) == parameters['farmers'] * parameters['harvest'] * (int(row['round']) + 1)
+    finally:
+        shutil.rmtree(directory)
+    print('Test sweep:\t\t\t\t\t\tOK')
+
+
+if __name__ == '__main__':
+    main(1, 5)
+    main(2, 5)